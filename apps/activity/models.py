@@ -411,6 +411,29 @@ class ActivityManager(models.Manager):
         return self.create_for_video('video-added', video,
                                      user=video.user, created=video.created)
 
+    def create_for_videos_added(self, videos):
+        """Create records for a batch of videos from Video.add_many()
+
+        This creates the same records as create_for_video_added(), with bulk
+        inserts.  For team videos it also creates the video-moved-to-team
+        record that we normally create when the TeamVideo is saved.
+        """
+        records = []
+        for video in videos:
+            team_video = video.get_team_video()
+            team_id = team_video.team_id if team_video else None
+            if team_video is not None:
+                records.append(self.model(
+                    type='video-moved-to-team', video=video, team_id=team_id,
+                    video_language_code=video.primary_audio_language_code,
+                    user_id=team_video.added_by_id, created=dates.now(),
+                    private_to_team=True))
+            records.append(self.model(
+                type='video-added', video=video, team_id=team_id,
+                video_language_code=video.primary_audio_language_code,
+                user_id=video.user_id, created=video.created))
+        self.bulk_create(records)
+
     def create_for_comment(self, video, comment, language_code=''):
         return self.create_for_video(
             'comment-added', video, user=comment.user,
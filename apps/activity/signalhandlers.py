@@ -31,6 +31,10 @@ import videos.signals
 def on_video_added(sender, **kwargs):
     ActivityRecord.objects.create_for_video_added(sender)
 
+@receiver(videos.signals.videos_added)
+def on_videos_added(sender, videos, **kwargs):
+    ActivityRecord.objects.create_for_videos_added(videos)
+
 @receiver(videos.signals.language_changed)
 def on_language_changed(sender, **wargs):
     ActivityRecord.objects.filter(video=sender).update(
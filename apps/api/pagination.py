@@ -17,23 +17,139 @@
 
 """Implement pagination.
 
-This module has a bunch of code to overrides the default paginate_queryset()
-method to use offset/limit based pagination instead of page based pagination.
+We support 2 pagination modes:
 
-This will get much simpler  once we switch to django-rest-framework 3.1 which
-has built-in support for this.
+    - offset/limit based pagination.  This is the default mode.
+    - keyset pagination.  Clients opt-in to this by passing a cursor query
+      param (it can be empty for the first page).  We page through the
+      results based on the (ordering field, id) of the last object on the
+      page, so fetching a page stays fast no matter how deep into the
+      listing we are.  We also skip calculating total_count unless the
+      client asks for it with count=true.
 """
 
 from collections import OrderedDict
+import base64
+import json
 
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import QuerySet
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class AmaraPagination(pagination.LimitOffsetPagination):
     default_limit = 20
     max_limit = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param in request.query_params and
+                isinstance(queryset, QuerySet)):
+            return self.paginate_queryset_keyset(queryset, request)
+        self.cursor_mode = False
+        return super(AmaraPagination, self).paginate_queryset(
+            queryset, request, view)
+
+    def paginate_queryset_keyset(self, queryset, request):
+        self.cursor_mode = True
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.next_cursor = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+        else:
+            self.count = None
+        if not queryset.query.can_filter():
+            # The queryset is already sliced, just return the first page.
+            return list(queryset[:self.limit])
+
+        field, descending = self.get_keyset_ordering(queryset)
+        if descending:
+            queryset = queryset.order_by('-' + field.name, '-pk')
+        else:
+            queryset = queryset.order_by(field.name, 'pk')
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            value, pk = self.decode_cursor(cursor, field)
+            if descending:
+                queryset = queryset.filter(
+                    Q(**{field.name + '__lt': value}) |
+                    Q(**{field.name: value, 'pk__lt': pk}))
+            else:
+                queryset = queryset.filter(
+                    Q(**{field.name + '__gt': value}) |
+                    Q(**{field.name: value, 'pk__gt': pk}))
+
+        results = list(queryset[:self.limit + 1])
+        if len(results) > self.limit:
+            results = results[:self.limit]
+            self.next_cursor = self.encode_cursor(results[-1], field)
+        return results
+
+    def get_keyset_ordering(self, queryset):
+        """Get the field to use for keyset pagination.
+
+        We use the first field of the queryset ordering, as long as it's a
+        field on the model itself.  Otherwise, we fall back to ordering by
+        id.
+
+        Returns: (field, descending) tuple
+        """
+        opts = queryset.model._meta
+        if queryset.query.order_by:
+            ordering = queryset.query.order_by
+        elif queryset.query.default_ordering:
+            ordering = opts.ordering
+        else:
+            ordering = []
+        if ordering:
+            name = ordering[0]
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            if name != 'pk' and '__' not in name:
+                try:
+                    return opts.get_field(name), descending
+                except FieldDoesNotExist:
+                    pass
+            return opts.pk, descending
+        return opts.pk, False
+
+    def encode_cursor(self, obj, field):
+        data = [field.value_to_string(obj), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(data))
+
+    def decode_cursor(self, cursor, field):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(str(cursor)))
+            return field.to_python(value), int(pk)
+        except StandardError:
+            raise NotFound('Invalid cursor')
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super(AmaraPagination, self).get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.next_cursor)
 
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response(OrderedDict([
+                ('meta', OrderedDict([
+                    ('previous', None),
+                    ('next', self.get_next_link()),
+                    ('limit', self.limit),
+                    ('total_count', self.count),
+                ])),
+                ('objects', data),
+            ]))
         return Response(OrderedDict([
             ('meta', OrderedDict([
                 ('previous', self.get_previous_link()),
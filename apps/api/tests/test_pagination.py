@@ -0,0 +1,94 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along
+# with this program.  If not, see http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+from datetime import datetime
+import urlparse
+
+from django.test import TestCase
+from nose.tools import *
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import AmaraPagination
+from utils.factories import *
+from videos.models import Video
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        # Make videos with some duplicate created values, to test that we
+        # handle ties in the ordering field
+        self.videos = []
+        for i in range(7):
+            video = VideoFactory()
+            video.created = datetime(2016, 1, 1 + i // 2, 12, 0, 0)
+            Video.objects.filter(id=video.id).update(created=video.created)
+            self.videos.append(video)
+
+    def get_page(self, queryset, **params):
+        request = Request(APIRequestFactory().get('/api/videos/', params))
+        paginator = AmaraPagination()
+        results = paginator.paginate_queryset(queryset, request)
+        response = paginator.get_paginated_response(
+            [v.id for v in results])
+        return response.data
+
+    def get_all_pages(self, queryset, **params):
+        params['cursor'] = ''
+        params['limit'] = 3
+        all_ids = []
+        while True:
+            data = self.get_page(queryset, **params)
+            all_ids.extend(data['objects'])
+            assert_true(len(data['objects']) <= 3)
+            if data['meta']['next'] is None:
+                return all_ids
+            query = urlparse.parse_qs(
+                urlparse.urlparse(data['meta']['next']).query)
+            params['cursor'] = query['cursor'][0]
+
+    def test_walk_pages(self):
+        assert_equal(self.get_all_pages(Video.objects.all()),
+                     [v.id for v in self.videos])
+
+    def test_walk_pages_with_ordering(self):
+        qs = Video.objects.order_by('-created')
+        assert_equal(self.get_all_pages(qs),
+                     [v.id for v in sorted(self.videos,
+                                           key=lambda v: (v.created, v.id),
+                                           reverse=True)])
+
+    def test_meta(self):
+        data = self.get_page(Video.objects.all(), cursor='', limit=3)
+        assert_equal(data['meta']['previous'], None)
+        assert_equal(data['meta']['limit'], 3)
+        assert_equal(data['meta']['total_count'], None)
+        assert_not_in('offset', data['meta'])
+        data = self.get_page(Video.objects.all(), cursor='', limit=3,
+                             count='true')
+        assert_equal(data['meta']['total_count'], 7)
+
+    def test_invalid_cursor(self):
+        with assert_raises(NotFound):
+            self.get_page(Video.objects.all(), cursor='invalid')
+
+    def test_offset_mode_is_the_default(self):
+        data = self.get_page(Video.objects.order_by('id'), limit=3, offset=3)
+        assert_equal(data['objects'], [v.id for v in self.videos[3:6]])
+        assert_equal(data['meta']['offset'], 3)
+        assert_equal(data['meta']['total_count'], 7)
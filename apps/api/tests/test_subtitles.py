@@ -532,6 +532,23 @@ class SubtitlesViewTest(TestCase):
         assert_equal(response.content,
                      babelsubs.to(self.version.get_subtitles(), 'dfxp'))
 
+    def test_raw_format_etag(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/srt')
+        etag = '"{}-srt"'.format(self.version.id)
+        assert_equal(response['ETag'], etag)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/srt',
+                                   HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        assert_equal(response.content, '')
+
+    def test_raw_format_uses_cache(self):
+        with mock.patch('babelsubs.to', wraps=babelsubs.to) as mock_to:
+            self.client.get(self.url, HTTP_ACCEPT='text/srt')
+            response = self.client.get(self.url, HTTP_ACCEPT='text/srt')
+        assert_equal(mock_to.call_count, 1)
+        assert_equal(response.content,
+                     babelsubs.to(self.version.get_subtitles(), 'srt'))
+
     def run_get_object(self, **query_params):
         view = SubtitlesView()
         view.kwargs = {
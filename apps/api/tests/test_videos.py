@@ -393,6 +393,52 @@ class VideoSerializerTest(TestCase):
         })
         assert_true(result.get_team_video().project.is_default_project)
 
+class VideoListSerializerTest(TestCase):
+    def setUp(self):
+        self.serializer_context = {
+            'request': APIRequestFactory().get("/mock-url/"),
+            'user': UserFactory(),
+        }
+
+    def make_videos(self, count):
+        team = TeamFactory()
+        project = ProjectFactory(team=team)
+        videos = []
+        for i in range(count):
+            if i % 3 == 0:
+                video = VideoFactory()
+            else:
+                video = TeamVideoFactory(team=team, project=project).video
+            VideoURLFactory(video=video)
+            pipeline.add_subtitles(video, 'en', SubtitleSetFactory())
+            pipeline.add_subtitles(video, 'fr', SubtitleSetFactory())
+            videos.append(video)
+        return [test_utils.reload_obj(v) for v in videos]
+
+    def check_query_count(self, video_count):
+        videos = self.make_videos(video_count)
+        serializer = VideoSerializer(videos, many=True,
+                                     context=self.serializer_context)
+        # We should use 4 queries: TeamVideo, VideoUrl, SubtitleLanguage,
+        # and bulk_has_public_version()
+        with self.assertNumQueries(4):
+            data = serializer.data
+        assert_equal(len(data), video_count)
+
+    def test_query_count(self):
+        # the query count shouldn't depend on the number of videos
+        self.check_query_count(3)
+        self.check_query_count(10)
+
+    def test_data(self):
+        videos = self.make_videos(3)
+        serializer = VideoSerializer(videos, many=True,
+                                     context=self.serializer_context)
+        for video, video_data in zip(videos, serializer.data):
+            single_serializer = VideoSerializer(
+                test_utils.reload_obj(video), context=self.serializer_context)
+            assert_equal(video_data, single_serializer.data)
+
 class VideoSerializerTeamChangeTest(TestCase):
     def setUp(self):
         self.team = TeamFactory(slug='team')
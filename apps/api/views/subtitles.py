@@ -300,6 +300,7 @@ from subtitles.exceptions import ActionError
 from subtitles.permissions import user_can_access_subtitles_format
 from subtitles.types import SubtitleFormatList
 import babelsubs
+import subtitles.cache
 from babelsubs.storage import SubtitleSet
 from utils.subtitles import load_subtitles
 import videos.tasks
@@ -507,9 +508,14 @@ class SubtitleLanguageViewSet(mixins.CreateModelMixin,
         }
 
 class SubtitleRenderer(renderers.BaseRenderer):
-    """Render SubtitleSets using babelsubs."""
+    """Render SubtitleSets using babelsubs.
+
+    If passed a SubtitleVersion, we use the rendered subtitles cache.
+    """
     def render(self, data, media_type=None, renderer_context=None):
-        if isinstance(data, SubtitleSet):
+        if isinstance(data, SubtitleVersion):
+            return subtitles.cache.get_rendered_subtitles(data, self.format)
+        elif isinstance(data, SubtitleSet):
             return babelsubs.to(data, self.format)
         else:
             # Fall back to JSON renderer for other responses.  This handles
@@ -752,8 +758,9 @@ class SubtitlesView(generics.CreateAPIView):
         # If we're rendering the subtitles directly, then we skip creating a
         # serializer and return the subtitles instead
         if isinstance(request.accepted_renderer, SubtitleRenderer):
-            if user_can_access_subtitles_format(request.user, request.accepted_renderer.format):
-                return Response(version.get_subtitles())
+            format = request.accepted_renderer.format
+            if user_can_access_subtitles_format(request.user, format):
+                return self.rendered_subtitles_response(version, format)
             else:
                 raise PermissionDenied()
         serializer = self.get_serializer(version)
@@ -762,6 +769,17 @@ class SubtitlesView(generics.CreateAPIView):
         else:
             raise PermissionDenied()
 
+    def rendered_subtitles_response(self, version, format):
+        # Versions never change once they're created, so we can use the
+        # version id and format as an ETag
+        etag = subtitles.cache.rendered_subtitles_etag(version, format)
+        if etag in self.request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(version)
+        response['ETag'] = etag
+        return response
+
     def get_object(self):
         video = self.get_video()
         workflow = workflows.get_workflow(video)
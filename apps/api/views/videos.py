@@ -215,7 +215,7 @@ from __future__ import absolute_import
 
 from django import http
 from django.db.models import Q
-from django.db.models.query import QuerySet
+from django.db.models.query import prefetch_related_objects
 from rest_framework import filters
 from rest_framework import generics
 from rest_framework import mixins
@@ -307,25 +307,44 @@ class ProjectSerializer(serializers.CharField):
             return team_video.project.slug
 
 class VideoListSerializer(serializers.ListSerializer):
-    def to_representation(self, qs):
+    def to_representation(self, videos):
         # Do some optimizations to reduce the number of queries before passing
         # the result to the default to_representation() method
+        videos = list(videos)
+        self.prefetch(videos)
+        return super(VideoListSerializer, self).to_representation(videos)
+
+    def prefetch(self, videos):
+        """Fetch the related data for a list of videos
+
+        This fetches team videos, video URLs, and subtitle languages for all
+        videos using a fixed number of queries, rather than a few queries for
+        each video.  The metadata is stored in the video row, so that doesn't
+        need any extra queries.
 
-        if isinstance(qs, QuerySet):
-            # Note: we have to use prefetch_related the teamvideo attributes,
-            # otherwise it will filter out non-team videos.  I think this is a
-            # django 1.4 bug.
-            qs = (qs.select_related('teamvideo')
-                  .prefetch_related('teamvideo__team', 'teamvideo__project',
-                                    'newsubtitlelanguage_set', 'videourl_set'))
+        Note: videos may be a page of results, rather than a QuerySet, so we
+        can't just use QuerySet.prefetch_related().
+        """
+        if not videos:
+            return
+        team_videos = dict(
+            (tv.video_id, tv) for tv in
+            TeamVideo.objects
+            .filter(video__in=videos)
+            .select_related('team', 'project'))
+        for video in videos:
+            team_video = team_videos.get(video.id)
+            if team_video is not None:
+                team_video.video = video
+            video._cached_teamvideo = team_video
+        prefetch_related_objects(videos, ['videourl_set',
+                                          'newsubtitlelanguage_set'])
         # run bulk_has_public_version(), otherwise we have a query for each
         # language of each video
-        videos = list(qs)
         all_languages = []
         for v in videos:
             all_languages.extend(v.all_subtitle_languages())
         SubtitleLanguage.bulk_has_public_version(all_languages)
-        return super(VideoListSerializer, self).to_representation(videos)
 
 class VideoSerializer(serializers.Serializer):
     # Note we could try to use ModelSerializer, but we are so far from the
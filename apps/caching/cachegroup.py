@@ -86,6 +86,33 @@ CacheGroup we will do a couple things:
 
 This speeds things up by reducing the number of round trips to memcached.
 
+The keys for each cache pattern are shared between processes.  Each process
+periodically merges the keys it's used into a copy stored in the cache (see
+:func:`sync_cache_pattern_memory`), and loads that copy at startup.  This
+means that freshly started processes can use get_many() on their first
+request.  Keys that haven't been used for ``CACHE_PATTERN_KEY_MAX_AGE``
+seconds are dropped.
+
+We also count where the values for each cache pattern were found and how many
+round trips we made (see :func:`get_cache_pattern_stats`).  Use the
+``cache_patterns`` management command to see the shared data.
+
+.. _cache-l1:
+
+Process-local cache
+^^^^^^^^^^^^^^^^^^^
+
+If ``CACHE_GROUP_L1_SIZE`` is set, we keep a small LRU cache inside each
+process, in front of memcached.  Values in it expire after
+``CACHE_GROUP_L1_TIMEOUT`` seconds.  We store both the version for each
+cache group and the values for each (version, key) pair.  This means
+that hot cache groups can be used without any round trips to memcached.
+
+Invalidating a cache group in another process will take up to
+``CACHE_GROUP_L1_TIMEOUT`` seconds to be seen.  Once the version expires
+from the local cache, we re-fetch it from memcached and the values stored
+for the old version are no longer used.
+
 Behind the scenes
 ^^^^^^^^^^^^^^^^^
 
@@ -158,14 +185,19 @@ attribute to your class definition.
 
 .. autoclass:: CacheGroup
 .. autoclass:: ModelCacheManager
+.. autofunction:: get_cache_pattern_stats
+.. autofunction:: sync_cache_pattern_memory
 """
 from __future__ import absolute_import
 import collections
+import copy
+import time
 
 from django.conf import settings
 from django.core.cache import cache
 
 from utils import codes
+from utils.lrucache import LRUCache
 
 def get_commit_id():
     return settings.LAST_COMMIT_GUID
@@ -178,11 +210,17 @@ class _CacheWrapper(object):
         - remembers previously fetched values and avoids fetching them again
         - handles prefetching keys for a cache pattern
     """
-    def __init__(self, prefix):
+    def __init__(self, prefix, stats=None):
         self.prefix = prefix
+        self.stats = stats
         self._cache_data = {}
 
+    def _count_round_trip(self):
+        if self.stats is not None:
+            self.stats['round_trips'] += 1
+
     def get(self, key):
+        self._count_round_trip()
         value = cache.get(self._prefix_key(key))
         self._cache_data[key] = value
         return value
@@ -194,6 +232,7 @@ class _CacheWrapper(object):
         return dict((key, self._cache_data.get(key)) for key in keys)
 
     def _run_get_many(self, keys):
+        self._count_round_trip()
         result = cache.get_many([self._prefix_key(key) for key in keys])
         for key in keys:
             self._cache_data[key] = result.get(self._prefix_key(key))
@@ -213,6 +252,133 @@ class _CacheWrapper(object):
 
 # map cache pattern IDs to the keys we've seen used
 _cache_pattern_memory = collections.defaultdict(set)
+# map cache pattern IDs to dicts that map keys to the last time we used them.
+# These get merged into the shared memory on the next sync.
+_cache_pattern_key_times = collections.defaultdict(dict)
+# map cache pattern IDs to counters of where we found values
+_cache_pattern_stats = collections.defaultdict(collections.Counter)
+# _cache_pattern_stats as of our last sync
+_synced_cache_pattern_stats = collections.defaultdict(collections.Counter)
+_next_sync_time = None
+# process-local cache in front of memcached (see cache-l1)
+_l1_cache = LRUCache(settings.CACHE_GROUP_L1_SIZE,
+                     ttl=settings.CACHE_GROUP_L1_TIMEOUT)
+
+SHARED_PATTERN_LIST_KEY = 'cache-pattern-memory:patterns'
+
+def _shared_memory_key(cache_pattern):
+    return 'cache-pattern-memory:{0}'.format(cache_pattern)
+
+def get_cache_pattern_stats():
+    """Get cache statistics for each cache pattern
+
+    Returns:
+        dict mapping cache pattern IDs to dicts with these keys:
+            - l1_hits: values found in the process-local cache
+            - hits: values found in memcached
+            - misses: values not found
+            - hit_rate: ratio of hits (from either cache) to lookups
+            - groups: number of cache groups that fetched values
+            - round_trips: number of fetches from memcached
+    """
+    return dict((cache_pattern, _calc_stats(counter))
+                for cache_pattern, counter in _cache_pattern_stats.items())
+
+def _calc_stats(counter):
+    total = counter['l1_hits'] + counter['hits'] + counter['misses']
+    hits = counter['l1_hits'] + counter['hits']
+    return {
+        'l1_hits': counter['l1_hits'],
+        'hits': counter['hits'],
+        'misses': counter['misses'],
+        'hit_rate': float(hits) / total if total else 0.0,
+        'groups': counter['groups'],
+        'round_trips': counter['round_trips'],
+    }
+
+def get_shared_cache_pattern_memory():
+    """Get the cache pattern data shared between processes
+
+    Returns:
+        dict mapping cache pattern IDs to dicts with these keys:
+            - keys: dict mapping cache keys to the last time they were used
+            - stats: dict of stats in the same format as
+              get_cache_pattern_stats(), added up for all processes
+    """
+    patterns = cache.get(SHARED_PATTERN_LIST_KEY) or []
+    shared_data = cache.get_many([_shared_memory_key(p) for p in patterns])
+    rv = {}
+    for cache_pattern in patterns:
+        data = shared_data.get(_shared_memory_key(cache_pattern))
+        if data is not None:
+            rv[cache_pattern] = {
+                'keys': data['keys'],
+                'stats': _calc_stats(collections.Counter(data['counts'])),
+            }
+    return rv
+
+def load_cache_pattern_memory():
+    """Load the shared cache pattern memory into this process
+
+    This is called at startup.
+    """
+    for cache_pattern, data in get_shared_cache_pattern_memory().items():
+        _cache_pattern_memory[cache_pattern].update(data['keys'])
+
+def sync_cache_pattern_memory():
+    """Merge our cache pattern memory with the shared copy
+
+    We merge the keys we've used and our stats into the shared copy, drop
+    keys that haven't been used recently, then update our memory with the
+    result.  This is called every CACHE_PATTERN_SYNC_INTERVAL seconds.
+
+    The merge is a read-modify-write, so if 2 processes sync at the same time,
+    one of their updates may be lost.  That's okay, since the keys will be
+    merged again on the next sync.
+    """
+    now = time.time()
+    max_age = settings.CACHE_PATTERN_KEY_MAX_AGE
+    patterns = cache.get(SHARED_PATTERN_LIST_KEY) or []
+    patterns = set(patterns).union(_cache_pattern_key_times)
+    shared_data = cache.get_many([_shared_memory_key(p) for p in patterns])
+    to_store = {}
+    for cache_pattern in patterns:
+        data = shared_data.get(_shared_memory_key(cache_pattern))
+        if data is None:
+            data = {'keys': {}, 'counts': {}}
+        key_times = data['keys']
+        for key, last_used in _cache_pattern_key_times.pop(cache_pattern,
+                                                           {}).items():
+            key_times[key] = max(last_used, key_times.get(key, 0))
+        key_times = dict((key, last_used)
+                         for key, last_used in key_times.items()
+                         if last_used >= now - max_age)
+        if not key_times:
+            continue
+        counts = collections.Counter(data['counts'])
+        counts.update(_cache_pattern_stats[cache_pattern] -
+                      _synced_cache_pattern_stats[cache_pattern])
+        _synced_cache_pattern_stats[cache_pattern] = collections.Counter(
+            _cache_pattern_stats[cache_pattern])
+        to_store[_shared_memory_key(cache_pattern)] = {
+            'keys': key_times,
+            'counts': dict(counts),
+        }
+        _cache_pattern_memory[cache_pattern] = set(key_times)
+    cache.set_many(to_store, max_age)
+    cache.set(SHARED_PATTERN_LIST_KEY,
+              sorted(key.split(':', 1)[1] for key in to_store), max_age)
+
+def _maybe_sync_cache_pattern_memory(now):
+    global _next_sync_time
+    interval = settings.CACHE_PATTERN_SYNC_INTERVAL
+    if interval is None:
+        return
+    if _next_sync_time is None:
+        _next_sync_time = now + interval
+    elif now >= _next_sync_time:
+        _next_sync_time = now + interval
+        sync_cache_pattern_memory()
 
 class CacheGroup(object):
     """Manage a group of cached values
@@ -235,7 +401,9 @@ class CacheGroup(object):
 
     def __init__(self, prefix, cache_pattern=None, invalidate_on_deploy=True):
         self.prefix = prefix
-        self.cache_wrapper = _CacheWrapper(prefix)
+        self.use_l1 = _l1_cache.max_size > 0
+        self.cache_wrapper = _CacheWrapper(
+            prefix, _cache_pattern_stats[cache_pattern])
         if cache_pattern:
             # copy the values from _cache_pattern_memory now.  It's going to
             # change as we fetch keys and for sanity sake we should not care
@@ -256,15 +424,23 @@ class CacheGroup(object):
         """Invalidate all values in this CacheGroup."""
         self.current_version = codes.make_code()
         self.cache_wrapper.set(self.version_key, self.current_version)
+        self._l1_set_version()
 
     def ensure_version(self):
         if self.current_version is not None:
             return
+        version = self._l1_get_version()
+        if version is not None:
+            # Don't re-set the L1 entry here, that would push back its expiry
+            # and we would never see invalidations from other processes.
+            self.current_version = version
+            return
         version = self.cache_wrapper.get(self.version_key)
         if version is None:
             self.invalidate()
         else:
             self.current_version = version
+            self._l1_set_version()
 
     def get(self, key):
         """Get a value from the cache
@@ -283,33 +459,99 @@ class CacheGroup(object):
         If there is no value set for our version key, we set it now.
         """
         if self.cache_pattern:
-            _cache_pattern_memory[self.cache_pattern].update(keys)
-        keys_to_fetch = set(keys)
+            self._remember_keys(keys)
         if self.current_version is None:
-            keys_to_fetch.add(self.version_key)
+            _cache_pattern_stats[self.cache_pattern]['groups'] += 1
+        keys_to_fetch = set(keys)
         if self._cache_pattern_keys:
             keys_to_fetch.update(self._cache_pattern_keys)
             self._cache_pattern_keys = None
-        get_many_result = self.cache_wrapper.get_many(keys_to_fetch)
+        if self.current_version is None:
+            self.current_version = self._l1_get_version()
+        l1_result = self._l1_get_many(keys_to_fetch)
+        keys_to_fetch.difference_update(l1_result)
+        if self.current_version is None:
+            keys_to_fetch.add(self.version_key)
+        if keys_to_fetch:
+            get_many_result = self.cache_wrapper.get_many(keys_to_fetch)
+        else:
+            get_many_result = {}
         # first of all, handle the version.
         if self.current_version is None:
             if get_many_result[self.version_key] is None:
                 self.invalidate()
+                _cache_pattern_stats[self.cache_pattern]['misses'] += len(keys)
                 return {}
             else:
                 self.current_version = get_many_result[self.version_key]
-        result = {}
-        for key in keys:
-            cache_value = get_many_result.get(key)
+                self._l1_set_version()
+        # store the values we fetched in the L1 cache, including values for
+        # the cache pattern keys
+        fetched_values = {}
+        for key, cache_value in get_many_result.items():
+            if key == self.version_key:
+                continue
             version, value = self._unpack_cache_value(cache_value)
             if version == self.current_version:
-                result[key] = value
+                fetched_values[key] = value
+        self._l1_set_many(fetched_values)
+
+        result = {}
+        stats = collections.Counter()
+        for key in keys:
+            if key in l1_result:
+                result[key] = l1_result[key]
+                stats['l1_hits'] += 1
+            elif key in fetched_values:
+                result[key] = fetched_values[key]
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+        _cache_pattern_stats[self.cache_pattern].update(stats)
+        return result
+
+    def _remember_keys(self, keys):
+        _cache_pattern_memory[self.cache_pattern].update(keys)
+        now = time.time()
+        key_times = _cache_pattern_key_times[self.cache_pattern]
+        for key in keys:
+            key_times[key] = now
+        _maybe_sync_cache_pattern_memory(now)
+
+    def _l1_get_version(self):
+        if not self.use_l1:
+            return None
+        return _l1_cache.get((self.prefix, self.version_key))
+
+    def _l1_set_version(self):
+        if self.use_l1:
+            _l1_cache.set((self.prefix, self.version_key),
+                          self.current_version)
+
+    def _l1_get_many(self, keys):
+        if not self.use_l1 or self.current_version is None:
+            return {}
+        result = {}
+        for key in keys:
+            value = _l1_cache.get((self.prefix, self.current_version, key))
+            if value is not None:
+                # copy the value so that callers can't change it for other
+                # requests
+                result[key] = copy.deepcopy(value)
         return result
 
+    def _l1_set_many(self, values):
+        if not self.use_l1:
+            return
+        for key, value in values.items():
+            _l1_cache.set((self.prefix, self.current_version, key),
+                          copy.deepcopy(value))
+
     def set(self, key, value, timeout=None):
         """Set a value in the cache """
         self.ensure_version()
         self.cache_wrapper.set(key, self._pack_cache_value(value), timeout)
+        self._l1_set_many({key: value})
 
     def set_many(self, values, timeout=None):
         """Set multiple values in the cache """
@@ -319,6 +561,7 @@ class CacheGroup(object):
             for key, value in values.items()
         )
         self.cache_wrapper.set_many(values_to_set, timeout)
+        self._l1_set_many(values)
 
     def get_or_calc(self, key, work_func, *args, **kwargs):
         """Shortcut for the typical cache usage pattern
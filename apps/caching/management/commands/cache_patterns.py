@@ -0,0 +1,64 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+
+from caching.cachegroup import (get_shared_cache_pattern_memory,
+                                sync_cache_pattern_memory)
+
+class Command(BaseCommand):
+    help = "Show the cache pattern keys and stats shared by all processes"
+    option_list = BaseCommand.option_list + (
+        make_option('-k', '--keys', dest='keys', action='store_true',
+                    default=False,
+                    help='List the keys for each pattern'),
+        make_option('-s', '--sync', dest='sync', action='store_true',
+                    default=False,
+                    help='Merge our data into the shared copy first.  '
+                    'This also drops keys that are too old.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['sync']:
+            sync_cache_pattern_memory()
+        shared_memory = get_shared_cache_pattern_memory()
+        if not shared_memory:
+            self.stdout.write('No cache pattern data stored\n')
+            return
+        now = time.time()
+        for cache_pattern in sorted(shared_memory):
+            data = shared_memory[cache_pattern]
+            stats = data['stats']
+            if stats['groups']:
+                round_trips_per_group = (float(stats['round_trips']) /
+                                         stats['groups'])
+            else:
+                round_trips_per_group = 0.0
+            self.stdout.write(
+                '{0}: {1} keys, {2} groups, {3} round trips '
+                '({4:.2f} per group), hit rate: {5:.1%}\n'.format(
+                    cache_pattern, len(data['keys']), stats['groups'],
+                    stats['round_trips'], round_trips_per_group,
+                    stats['hit_rate']))
+            if options['keys']:
+                for key, last_used in sorted(data['keys'].items()):
+                    self.stdout.write('    {0} (used {1:.0f}s ago)\n'.format(
+                        key, now - last_used))
@@ -17,6 +17,7 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from __future__ import absolute_import
+import time
 
 from django.contrib.auth.models import User
 from django.core.cache import cache
@@ -26,8 +27,15 @@ from nose.tools import *
 import mock
 
 from caching.cachegroup import (CacheGroup, _cache_pattern_memory,
-                                ModelCacheManager)
+                                _cache_pattern_key_times,
+                                _cache_pattern_stats,
+                                _synced_cache_pattern_stats,
+                                ModelCacheManager, get_cache_pattern_stats,
+                                get_shared_cache_pattern_memory,
+                                load_cache_pattern_memory,
+                                sync_cache_pattern_memory)
 from utils import test_utils
+from utils.lrucache import LRUCache
 from utils.factories import *
 from videos.models import Video
 
@@ -240,6 +248,157 @@ class CachePatternTest(TestCase):
         assert_equal(cache_group.cache_wrapper.get_many.call_args,
                      mock.call(set(['a', 'b', 'c', cache_group.version_key])))
 
+class CachePatternStatsTest(TestCase):
+    def tearDown(self):
+        _cache_pattern_memory.clear()
+        _cache_pattern_stats.clear()
+
+    def test_stats(self):
+        make_cache_group(cache_pattern='foo').set('a', 'value')
+        cache_group = make_cache_group(cache_pattern='foo')
+        cache_group.get_many(['a', 'b'])
+        cache_group.get('a')
+        stats = get_cache_pattern_stats()['foo']
+        assert_equal(stats['hits'], 2)
+        assert_equal(stats['misses'], 1)
+        assert_equal(stats['l1_hits'], 0)
+        assert_equal(stats['hit_rate'], 2.0 / 3)
+
+class L1CacheTest(TestCase):
+    def setUp(self):
+        self.l1_cache = LRUCache(100, ttl=5)
+        patcher = mock.patch('caching.cachegroup._l1_cache', self.l1_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        _cache_pattern_memory.clear()
+        _cache_pattern_stats.clear()
+
+    def test_get_skips_memcached(self):
+        make_cache_group().set('key', 'value')
+        cache_group = make_cache_group()
+        with mock.patch('caching.cachegroup.cache') as mock_cache:
+            assert_equal(cache_group.get('key'), 'value')
+        assert_equal(mock_cache.get_many.call_count, 0)
+
+    def test_values_fetched_from_memcached_are_stored(self):
+        make_cache_group().set('key', 'value')
+        self.l1_cache.clear()
+        assert_equal(make_cache_group().get('key'), 'value')
+        with mock.patch('caching.cachegroup.cache') as mock_cache:
+            assert_equal(make_cache_group().get('key'), 'value')
+        assert_equal(mock_cache.get_many.call_count, 0)
+
+    def test_invalidate(self):
+        make_cache_group().set('key', 'value')
+        make_cache_group().invalidate()
+        assert_equal(make_cache_group().get('key'), None)
+
+    def test_invalidate_from_other_process(self):
+        # Simulate another process changing the version in memcached.  We
+        # should use the stale value until the version expires from the L1
+        # cache.
+        make_cache_group().set('key', 'value')
+        version_key = 'cache-group-prefix:{0}'.format(
+            make_cache_group().version_key)
+        cache.set(version_key, 'new-version')
+        assert_equal(make_cache_group().get('key'), 'value')
+        self.l1_cache.delete(('cache-group-prefix',
+                              make_cache_group().version_key))
+        assert_equal(make_cache_group().get('key'), None)
+
+    def test_l1_version_expires(self):
+        # Using the version from the L1 cache shouldn't extend its expiry,
+        # otherwise a busy process would never see the version change in
+        # memcached.
+        make_cache_group().set('key', 'value')
+        version_key = 'cache-group-prefix:{0}'.format(
+            make_cache_group().version_key)
+        cache.set(version_key, 'new-version')
+        with mock.patch('utils.lrucache.time') as mock_time:
+            start = time.time()
+            for offset in (1, 2, 3, 4):
+                mock_time.time.return_value = start + offset
+                cache_group = make_cache_group()
+                cache_group.ensure_version()
+                assert_not_equal(cache_group.current_version, 'new-version')
+            mock_time.time.return_value = start + 6
+            cache_group = make_cache_group()
+            cache_group.ensure_version()
+            assert_equal(cache_group.current_version, 'new-version')
+
+    def test_values_are_copied(self):
+        make_cache_group().set('key', {'a': 1})
+        make_cache_group().get('key')['a'] = 2
+        assert_equal(make_cache_group().get('key'), {'a': 1})
+
+    def test_stats(self):
+        make_cache_group(cache_pattern='foo').set('a', 'value')
+        make_cache_group(cache_pattern='foo').get_many(['a', 'b'])
+        stats = get_cache_pattern_stats()['foo']
+        assert_equal(stats['l1_hits'], 1)
+        assert_equal(stats['hits'], 0)
+        assert_equal(stats['misses'], 1)
+
+class SharedCachePatternMemoryTest(TestCase):
+    def tearDown(self):
+        _cache_pattern_memory.clear()
+        _cache_pattern_key_times.clear()
+        _cache_pattern_stats.clear()
+        _synced_cache_pattern_stats.clear()
+
+    def simulate_new_process(self):
+        _cache_pattern_memory.clear()
+        _cache_pattern_key_times.clear()
+        _cache_pattern_stats.clear()
+        _synced_cache_pattern_stats.clear()
+
+    def test_sync_and_load(self):
+        cache_group = make_cache_group(cache_pattern='foo')
+        cache_group.get_many(['a', 'b'])
+        sync_cache_pattern_memory()
+        self.simulate_new_process()
+        load_cache_pattern_memory()
+        assert_items_equal(_cache_pattern_memory['foo'], ['a', 'b'])
+
+    def test_merge_keys_from_other_processes(self):
+        make_cache_group(cache_pattern='foo').get('a')
+        sync_cache_pattern_memory()
+        self.simulate_new_process()
+        make_cache_group(cache_pattern='foo').get('b')
+        sync_cache_pattern_memory()
+        assert_items_equal(_cache_pattern_memory['foo'], ['a', 'b'])
+        assert_items_equal(get_shared_cache_pattern_memory()['foo']['keys'],
+                           ['a', 'b'])
+
+    @mock.patch('time.time')
+    def test_old_keys_age_out(self, mock_time):
+        mock_time.return_value = 1000
+        make_cache_group(cache_pattern='foo').get('a')
+        sync_cache_pattern_memory()
+        max_age = 60 * 60
+        mock_time.return_value = 1000 + max_age + 1
+        make_cache_group(cache_pattern='foo').get('b')
+        with self.settings(CACHE_PATTERN_KEY_MAX_AGE=max_age):
+            sync_cache_pattern_memory()
+        assert_items_equal(_cache_pattern_memory['foo'], ['b'])
+        assert_items_equal(get_shared_cache_pattern_memory()['foo']['keys'],
+                           ['b'])
+
+    def test_stats(self):
+        make_cache_group(cache_pattern='foo').get_many(['a', 'b'])
+        sync_cache_pattern_memory()
+        # syncing again shouldn't double count our stats
+        sync_cache_pattern_memory()
+        self.simulate_new_process()
+        make_cache_group(cache_pattern='foo').get_many(['a', 'b'])
+        sync_cache_pattern_memory()
+        stats = get_shared_cache_pattern_memory()['foo']['stats']
+        assert_equal(stats['groups'], 2)
+        assert_equal(stats['misses'], 4)
+        assert_equal(stats['round_trips'], 2)
+
 class ModelCachingTest(TestCase):
     def test_model_to_tuple(self):
         video = VideoFactory()
@@ -66,3 +66,26 @@ def on_video_url_added(sender, video, **kwargs):
         tasks.add_amara_credit.delay(video_url.pk)
     if subfetch.should_fetch_subs(video_url):
         tasks.fetch_subs.delay(video_url.pk)
+
+@receiver(videos.signals.videos_added)
+def on_videos_added(sender, videos, video_urls, **kwargs):
+    # The videos in a batch usually share the same team/user and channel, so
+    # remember the lookups rather than repeating them for each video.
+    accounts = {}
+    fetch_subs = {}
+    for video, video_url in zip(videos, video_urls):
+        video_url.fix_owner_username()
+        team_video = video.get_team_video()
+        account_key = (video_url.type, video_url.owner_username,
+                       team_video.team_id if team_video else None,
+                       video.user_id)
+        if account_key not in accounts:
+            accounts[account_key] = get_sync_account(video, video_url)
+        if credit.should_add_credit_to_video_url(video_url,
+                                                 accounts[account_key]):
+            tasks.add_amara_credit.delay(video_url.pk)
+        fetch_subs_key = (video_url.type, video_url.owner_username)
+        if fetch_subs_key not in fetch_subs:
+            fetch_subs[fetch_subs_key] = subfetch.should_fetch_subs(video_url)
+        if fetch_subs[fetch_subs_key]:
+            tasks.fetch_subs.delay(video_url.pk)
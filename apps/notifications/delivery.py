@@ -0,0 +1,227 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""notifications.delivery -- Send HTTP notifications to team endpoints
+
+Requests go through a requests Session for each host, so connections to
+partner endpoints are kept alive and reused by the process.  Every request
+uses the NOTIFICATION_CONNECT_TIMEOUT and NOTIFICATION_READ_TIMEOUT settings,
+so a slow endpoint can't tie up a celery worker.
+
+Notifications that fail because of a network error or a 5xx response are
+retried with exponential backoff.  send_due_notifications() claims a batch
+of the notifications to retry and groups them by endpoint.  Each group is
+sent in order, over the endpoint's session, and several endpoints are handled
+in parallel.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+import logging
+import threading
+import urlparse
+
+from django.conf import settings
+from requests.auth import HTTPBasicAuth
+import requests
+
+from utils import dates
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_delivery_pool = None
+
+def get_session(url):
+    """Get the keep-alive session to use for a URL
+
+    Each process has one session per (scheme, host) pair.
+    """
+    parsed = urlparse.urlparse(url)
+    key = (parsed.scheme, parsed.netloc)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = requests.Session()
+        return _sessions[key]
+
+def get_timeout():
+    return (settings.NOTIFICATION_CONNECT_TIMEOUT,
+            settings.NOTIFICATION_READ_TIMEOUT)
+
+def post(url, data, headers=None, auth=None, **kwargs):
+    """POST to a URL using the pooled session and our timeouts."""
+    return get_session(url).post(url, data=data, headers=headers, auth=auth,
+                                 timeout=get_timeout(), **kwargs)
+
+def send_notification(notification, headers, auth_username, auth_password):
+    """Send a TeamNotification and record the outcome on it."""
+    outcome = _post_notification(notification, headers, auth_username,
+                                 auth_password)
+    _record_outcome(notification, outcome)
+
+def _post_notification(notification, headers, auth_username, auth_password):
+    """POST a TeamNotification
+
+    This doesn't touch the database, so it's safe to call from the delivery
+    threads.
+
+    Returns:
+        (response_status, error_message, should_retry) tuple
+    """
+    if auth_username:
+        auth = HTTPBasicAuth(auth_username, auth_password)
+    else:
+        auth = None
+    headers = dict(headers)
+    headers['Content-type'] = 'application/json'
+    try:
+        response = post(notification.url, notification.data, headers, auth)
+    except requests.ConnectionError:
+        return None, "Connection error", True
+    except requests.Timeout:
+        return None, "Request timeout", True
+    except requests.TooManyRedirects:
+        return None, "Too many redirects", False
+    if response.status_code != 200:
+        return (response.status_code,
+                'Response status: {}'.format(response.status_code),
+                response.status_code >= 500)
+    return response.status_code, None, False
+
+def _record_outcome(notification, outcome):
+    response_status, error_message, should_retry = outcome
+    notification.attempts += 1
+    notification.response_status = response_status
+    notification.error_message = error_message
+    if (should_retry and
+            notification.attempts < settings.NOTIFICATION_MAX_ATTEMPTS):
+        delay = (settings.NOTIFICATION_RETRY_DELAY *
+                 2 ** (notification.attempts - 1))
+        notification.next_attempt = dates.now() + timedelta(seconds=delay)
+    else:
+        notification.next_attempt = None
+    notification.save()
+
+def _get_delivery_pool():
+    global _delivery_pool
+    if _delivery_pool is None:
+        _delivery_pool = ThreadPool(settings.NOTIFICATION_DELIVERY_THREADS)
+    return _delivery_pool
+
+def _post_group(group):
+    """Send a group of notifications for a single endpoint, in order.
+
+    We stop at the first network error, since the rest would most likely
+    fail the same way.  Notifications that we don't get to are left for the
+    next run.
+
+    Args:
+        group: list of (notification, headers, auth_username, auth_password)
+            tuples
+
+    Returns:
+        list of outcomes for the notifications that we tried to send
+    """
+    outcomes = []
+    for args in group:
+        outcome = _post_notification(*args)
+        outcomes.append(outcome)
+        if outcome[0] is None and outcome[2]:
+            break
+    return outcomes
+
+def _claim_due_notifications(now):
+    """Claim up to NOTIFICATION_RETRY_BATCH_SIZE notifications to retry
+
+    The retry task runs every minute, but a run can last much longer than
+    that.  To stop overlapping runs from sending the same notifications, we
+    push next_attempt forward by NOTIFICATION_CLAIM_TIMEOUT for each
+    notification that we claim.  _record_outcome() sets the real value after
+    we try to send it.  If the worker dies first, the notification gets
+    retried once the claim expires.
+
+    Returns:
+        list of claimed TeamNotifications, ordered by team and number
+    """
+    from notifications.models import TeamNotification
+
+    due = (TeamNotification.objects
+           .filter(next_attempt__lte=now)
+           .order_by('team', 'number')
+           .values_list('id', 'next_attempt'))
+    due = due[:settings.NOTIFICATION_RETRY_BATCH_SIZE]
+    claimed_until = now + timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+    claimed_ids = []
+    for notification_id, next_attempt in due:
+        # Only update the row if next_attempt hasn't changed.  If it has,
+        # another run claimed the notification first.
+        if (TeamNotification.objects
+                .filter(id=notification_id, next_attempt=next_attempt)
+                .update(next_attempt=claimed_until)):
+            claimed_ids.append(notification_id)
+    if not claimed_ids:
+        return []
+    return list(TeamNotification.objects
+                .filter(id__in=claimed_ids)
+                .order_by('team', 'number'))
+
+def send_due_notifications():
+    """Retry sending the notifications whose next_attempt has passed."""
+    from notifications.models import TeamNotification, TeamNotificationSettings
+
+    now = dates.now()
+    due = _claim_due_notifications(now)
+    if not due:
+        return
+    notification_settings = dict(
+        (s.team_id, s) for s in TeamNotificationSettings.objects.filter(
+            team__in=set(n.team_id for n in due)))
+
+    groups = OrderedDict()
+    for notification in due:
+        team_settings = notification_settings.get(notification.team_id)
+        if team_settings is None:
+            # The team stopped using notifications, give up on this one
+            notification.next_attempt = None
+            notification.save()
+            continue
+        groups.setdefault(notification.url, []).append(
+            (notification, team_settings.get_headers(),
+             team_settings.auth_username, team_settings.auth_password))
+    groups = groups.values()
+
+    if len(groups) > 1 and settings.NOTIFICATION_DELIVERY_THREADS > 1:
+        results = _get_delivery_pool().map(_post_group, groups)
+    else:
+        results = [_post_group(group) for group in groups]
+    # Record the results from this thread, so that the delivery threads
+    # never need a database connection.
+    unsent_ids = []
+    for group, outcomes in zip(groups, results):
+        for (notification, _, _, _), outcome in zip(group, outcomes):
+            _record_outcome(notification, outcome)
+        unsent_ids.extend(notification.id
+                          for (notification, _, _, _)
+                          in group[len(outcomes):])
+    if unsent_ids:
+        # Release the claim on the notifications that we didn't get to, so
+        # that the next run picks them up.
+        TeamNotification.objects.filter(id__in=unsent_ids).update(
+            next_attempt=now)
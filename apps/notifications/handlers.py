@@ -16,13 +16,11 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-import json
 import logging
-from requests.auth import HTTPBasicAuth
 
 from celery.task import task
+from notifications import delivery
 from notifications.models import TeamNotificationSettings, TeamNotification
-import requests
 
 logger = logging.getLogger(__name__)
 
@@ -97,7 +95,8 @@ def do_http_post(team_id, url, data, headers, auth_username, auth_password):
 
     This function also handles creating the TeamNotification object associated
     with the request.  It operates inside a task so that the network call
-    doesn't block the web app process.
+    doesn't block the web app process.  If the request fails, the
+    retry_failed_notifications task will try it again later.
 
     Args:
         team_id: PK of the Team this notification is for
@@ -109,33 +108,13 @@ def do_http_post(team_id, url, data, headers, auth_username, auth_password):
         auth_username: authentication to send with the request
         auth_password: authentication to send with the request
     """
-    if auth_username:
-        auth = HTTPBasicAuth(auth_username, auth_password)
-    else:
-        auth = None
     notification = TeamNotification.create_new(team_id, url, data)
-    post_data = data.copy()
-    post_data['number'] = notification.number
-    headers.update({
-        'Content-type': 'application/json',
-    })
-    status_code = None
-    error_message = None
-    try:
-        response = requests.post(url, data=json.dumps(post_data),
-                                 headers=headers, auth=auth)
-    except requests.ConnectionError:
-        notification.error_message = "Connection error"
-    except requests.Timeout:
-        notification.error_message = "Request timeout"
-    except requests.TooManyRedirects:
-        notification.error_message = "Too many redirects"
-    else:
-        notification.response_status = response.status_code
-        if response.status_code != 200:
-            notification.error_message = 'Response status: {}'.format(
-                response.status_code)
-    notification.save()
+    delivery.send_notification(notification, headers, auth_username,
+                               auth_password)
+
+@task
+def retry_failed_notifications():
+    delivery.send_due_notifications()
 
 # maps type strings to NotificationHandlerBase subclasses
 _registry = {}
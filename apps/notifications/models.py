@@ -62,6 +62,11 @@ class TeamNotification(models.Model):
     timestamp = models.DateTimeField()
     response_status = models.IntegerField(null=True, blank=True)
     error_message = models.CharField(max_length=256, null=True, blank=True)
+    # number of times we've tried to send the notification
+    attempts = models.IntegerField(default=0)
+    # when to retry sending a failed notification.  None if we've given up
+    # or don't need to.
+    next_attempt = models.DateTimeField(null=True, blank=True, db_index=True)
 
     @classmethod
     def create_new(cls, team, url, data):
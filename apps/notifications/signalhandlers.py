@@ -22,10 +22,12 @@ from django.db.models.signals import post_save, pre_delete
 from auth.models import CustomUser as User
 from notifications.handlers import (call_event_handler,
                                     call_event_handler_for_video)
+from notifications.models import TeamNotificationSettings
 from teams.models import TeamVideo, TeamMember
 import auth.signals
 import subtitles.signals
 import teams.signals
+import videos.signals
 
 @receiver(post_save, sender=TeamVideo)
 def on_team_video_save(sender, instance, created, **kwargs):
@@ -33,6 +35,19 @@ def on_team_video_save(sender, instance, created, **kwargs):
         call_event_handler(instance.team, 'on_video_added', instance.video,
                            None)
 
+@receiver(videos.signals.videos_added)
+def on_videos_added(sender, videos, **kwargs):
+    # Video.add_many() creates TeamVideos without sending post_save
+    team_videos = [video.get_team_video() for video in videos]
+    teams = dict((tv.team_id, tv.team) for tv in team_videos if tv)
+    for team in teams.values():
+        if TeamNotificationSettings.lookup(team) is None:
+            continue
+        for team_video in team_videos:
+            if team_video and team_video.team_id == team.id:
+                call_event_handler(team, 'on_video_added', team_video.video,
+                                   None)
+
 @receiver(pre_delete, sender=TeamVideo)
 def on_team_video_delete(sender, instance, **kwargs):
     call_event_handler(instance.team, 'on_video_removed', instance.video, None)
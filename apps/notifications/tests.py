@@ -17,14 +17,19 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from contextlib import contextmanager
+from datetime import timedelta
 from django.test import TestCase
+from django.test.utils import override_settings
 from nose.tools import *
-from requests.auth import HTTPBasicAuth
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+import BaseHTTPServer
+import SocketServer
+import base64
 import json
 import mock
+import threading
+import time
 
-from notifications import handlers
+from notifications import delivery, handlers
 from notifications.models import TeamNotificationSettings, TeamNotification
 from subtitles import pipeline
 from teams.models import TeamMember
@@ -251,73 +256,260 @@ class TestSendNotification(TestCase):
                                settings.get_headers(), settings.auth_username,
                                settings.auth_password))
 
+class StubServer(object):
+    """Local HTTP server to test sending notifications against
+
+    Attributes:
+        requests: list of (path, headers, body, client_port) tuples for each
+            request received
+        status_codes: status codes to respond with.  Each request pops a
+            code off the front of the list.  Once it's empty we respond with
+            200.  For 302 responses, we redirect back to the same path.
+        delay: seconds to wait before responding
+    """
+    def __init__(self):
+        self.requests = []
+        self.status_codes = []
+        self.delay = 0
+        stub = self
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(
+                    int(self.headers.get('Content-Length', 0)))
+                stub.requests.append((self.path, self.headers, body,
+                                      self.client_address[1]))
+                time.sleep(stub.delay)
+                if stub.status_codes:
+                    status_code = stub.status_codes.pop(0)
+                else:
+                    status_code = 200
+                self.send_response(status_code)
+                if status_code == 302:
+                    self.send_header('Location', self.path)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            # requests follows redirects with GET
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path='/'):
+        return 'http://127.0.0.1:{}{}'.format(self.server.server_port, path)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        # Don't let later tests reuse connections to this server
+        delivery._sessions.clear()
+
 class TestDoHTTPPost(TestCase):
     def setUp(self):
         self.team = TeamFactory()
         self.data = {'foo': 'bar'}
-        self.url = 'http://example.com/notifications/'
+        self.server = StubServer()
+        self.url = self.server.url('/notifications/')
         handlers.do_http_post.run_original_for_test()
         self.now = dates.now.freeze()
 
-    def check_notification(self, status_code, error_message=None):
+    def tearDown(self):
+        self.server.stop()
+
+    def check_notification(self, status_code, error_message=None,
+                           next_attempt=None):
         notification = TeamNotification.objects.get(team=self.team)
         assert_equal(notification.team, self.team)
         assert_equal(notification.url, self.url)
         assert_equal(notification.timestamp, self.now)
         assert_equal(notification.response_status, status_code)
         assert_equal(notification.error_message, error_message)
+        assert_equal(notification.next_attempt, next_attempt)
         self.check_notification_data(notification)
+        return notification
 
     def check_notification_data(self, notification):
         correct_data = self.data.copy()
         correct_data['number'] = notification.number
         assert_equal(json.loads(notification.data), correct_data)
 
-    def calc_post_data(self):
-        post_data = self.data.copy()
-        post_data['number'] = TeamNotification.next_number_for_team(self.team)
-        return json.dumps(post_data)
+    def do_http_post(self, headers=None, auth_username='',
+                     auth_password=''):
+        handlers.do_http_post(self.team.id, self.url, self.data,
+                              headers or {}, auth_username, auth_password)
 
     def test_http_request(self):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={
-                'Content-type': 'application/json',
-                'extra-header': '123',
-            },
-            auth=HTTPBasicAuth('alice', '1234'),
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data,
-                                  {'extra-header': '123'}, 'alice', '1234')
-        self.check_notification(200)
+        self.do_http_post({'extra-header': '123'}, 'alice', '1234')
+        notification = self.check_notification(200)
+        assert_equal(len(self.server.requests), 1)
+        path, headers, body, port = self.server.requests[0]
+        assert_equal(path, '/notifications/')
+        assert_equal(headers['Content-type'], 'application/json')
+        assert_equal(headers['extra-header'], '123')
+        assert_equal(headers['Authorization'],
+                     'Basic ' + base64.b64encode('alice:1234'))
+        assert_equal(json.loads(body), json.loads(notification.data))
+
+    def test_keep_alive(self):
+        # Multiple notifications should be sent over the same connection
+        self.do_http_post()
+        self.do_http_post()
+        assert_equal(len(self.server.requests), 2)
+        assert_equal(len(set(r[3] for r in self.server.requests)), 1)
 
+    @override_settings(NOTIFICATION_RETRY_DELAY=60)
     def test_status_code_error(self):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={'Content-type': 'application/json'},
-            status_code=500,
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data, {}, '', '')
-        self.check_notification(500, "Response status: 500")
-
-    def test_network_errors(self):
-        self.check_network_error(ConnectionError(), 'Connection error')
-        self.check_network_error(Timeout(), 'Request timeout')
-        self.check_network_error(TooManyRedirects(), 'Too many redirects')
-
-    def check_network_error(self, exception, error_message):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={'Content-type': 'application/json'},
-            error=exception,
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data, {}, '',
-                                  '')
-        self.check_notification(None, error_message)
-        TeamNotification.objects.all().delete()
+        self.server.status_codes = [500]
+        self.do_http_post()
+        self.check_notification(500, "Response status: 500",
+                                self.now + timedelta(seconds=60))
+
+    def test_client_error_is_not_retried(self):
+        self.server.status_codes = [400]
+        self.do_http_post()
+        self.check_notification(400, "Response status: 400")
+
+    @override_settings(NOTIFICATION_RETRY_DELAY=60)
+    def test_connection_error(self):
+        self.url = 'http://127.0.0.1:1/'
+        self.do_http_post()
+        self.check_notification(None, 'Connection error',
+                                self.now + timedelta(seconds=60))
+
+    @override_settings(NOTIFICATION_READ_TIMEOUT=0.1,
+                              NOTIFICATION_RETRY_DELAY=60)
+    def test_timeout(self):
+        self.server.delay = 0.5
+        self.do_http_post()
+        self.check_notification(None, 'Request timeout',
+                                self.now + timedelta(seconds=60))
+
+    def test_too_many_redirects(self):
+        self.server.status_codes = [302] * 50
+        self.do_http_post()
+        self.check_notification(None, 'Too many redirects')
+
+class TestRetryFailedNotifications(TestCase):
+    def setUp(self):
+        self.now = dates.now.freeze()
+        self.servers = [StubServer(), StubServer()]
+        self.teams = []
+        for server in self.servers:
+            team = TeamFactory()
+            TeamNotificationSettings.objects.create(
+                team=team, type='mock-type', url=server.url())
+            self.teams.append(team)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def make_failed_notification(self, team, attempts=1):
+        notification = TeamNotification.create_new(
+            team, TeamNotificationSettings.lookup(team).url, {'foo': 'bar'})
+        notification.attempts = attempts
+        notification.error_message = 'Connection error'
+        notification.next_attempt = self.now
+        notification.save()
+        return notification
+
+    def test_retry(self):
+        notifications = [
+            self.make_failed_notification(team)
+            for team in self.teams
+            for i in range(2)
+        ]
+        handlers.retry_failed_notifications()
+        for server in self.servers:
+            # each endpoint should get its notifications in order, over a
+            # single connection
+            assert_equal([json.loads(r[2])['number']
+                          for r in server.requests], [1, 2])
+            assert_equal(len(set(r[3] for r in server.requests)), 1)
+        for notification in notifications:
+            notification = reload_obj(notification)
+            assert_equal(notification.attempts, 2)
+            assert_equal(notification.response_status, 200)
+            assert_equal(notification.error_message, None)
+            assert_equal(notification.next_attempt, None)
+
+    @override_settings(NOTIFICATION_RETRY_DELAY=60)
+    def test_backoff(self):
+        self.servers[0].status_codes = [500]
+        notification = self.make_failed_notification(self.teams[0],
+                                                     attempts=2)
+        handlers.retry_failed_notifications()
+        notification = reload_obj(notification)
+        assert_equal(notification.attempts, 3)
+        assert_equal(notification.next_attempt,
+                     self.now + timedelta(seconds=240))
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=3)
+    def test_max_attempts(self):
+        self.servers[0].status_codes = [500]
+        notification = self.make_failed_notification(self.teams[0],
+                                                     attempts=2)
+        handlers.retry_failed_notifications()
+        notification = reload_obj(notification)
+        assert_equal(notification.attempts, 3)
+        assert_equal(notification.next_attempt, None)
+
+    @override_settings(NOTIFICATION_RETRY_BATCH_SIZE=3)
+    def test_batch_size(self):
+        notifications = [
+            self.make_failed_notification(self.teams[0])
+            for i in range(4)
+        ]
+        handlers.retry_failed_notifications()
+        assert_equal([json.loads(r[2])['number']
+                      for r in self.servers[0].requests], [1, 2, 3])
+        assert_equal(reload_obj(notifications[3]).next_attempt, self.now)
+
+    @override_settings(NOTIFICATION_DELIVERY_THREADS=1)
+    def test_overlapping_runs(self):
+        # Simulate a second run of the task starting while the first is
+        # sending.  It shouldn't send the notifications again.
+        notifications = [
+            self.make_failed_notification(team)
+            for team in self.teams
+        ]
+        post_notification = delivery._post_notification
+        def post_and_run_again(*args):
+            if mock_post_notification.call_count == 1:
+                delivery.send_due_notifications()
+            return post_notification(*args)
+        with mock.patch('notifications.delivery._post_notification',
+                        side_effect=post_and_run_again) as \
+                mock_post_notification:
+            handlers.retry_failed_notifications()
+        for server in self.servers:
+            assert_equal(len(server.requests), 1)
+        for notification in notifications:
+            assert_equal(reload_obj(notification).attempts, 2)
+
+    def test_release_unsent(self):
+        # After a connection error we skip the rest of the endpoint's
+        # notifications.  They should be due again for the next run.
+        notifications = [
+            self.make_failed_notification(self.teams[0])
+            for i in range(2)
+        ]
+        with mock.patch('notifications.delivery._post_notification') as \
+                mock_post_notification:
+            mock_post_notification.return_value = (
+                None, 'Connection error', True)
+            handlers.retry_failed_notifications()
+        assert_equal(mock_post_notification.call_count, 1)
+        notification = reload_obj(notifications[1])
+        assert_equal(notification.attempts, 1)
+        assert_equal(notification.next_attempt, self.now)
@@ -0,0 +1,168 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""search.backends -- Pluggable video search engines
+
+The SEARCH_BACKEND setting selects the backend class to use.  Backends
+implement the SearchBackend interface:
+
+    - search() returns the public videos that match a query, best matches
+      first.
+    - facets() counts the matching videos for each primary audio language,
+      completed subtitle language, and team.
+    - index_videos()/remove_videos() keep the backend up to date.  They get
+      called from search.signalhandlers whenever VideoIndex changes or a
+      video is deleted.
+
+Included backends:
+
+    - search.backends.fulltext.FulltextBackend: MySQL FULLTEXT search over
+      VideoIndex.text
+    - search.backends.invertedindex.InvertedIndexBackend: embedded on-disk
+      inverted index with BM25 ranking
+"""
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils.importlib import import_module
+
+from subtitles.models import CompletedSubtitleLanguage
+from utils.searching import get_terms
+from videos.models import Video
+
+_backend = None
+
+def get_backend():
+    """Get the SearchBackend instance for SEARCH_BACKEND."""
+    global _backend
+    if _backend is None or _backend.setting != settings.SEARCH_BACKEND:
+        module_name, class_name = settings.SEARCH_BACKEND.rsplit('.', 1)
+        backend_class = getattr(import_module(module_name), class_name)
+        _backend = backend_class()
+        _backend.setting = settings.SEARCH_BACKEND
+    return _backend
+
+def query_terms(query):
+    # only use terms with 3 or more chars.  Terms with less chars are not
+    # indexed, so they will never match anything.
+    return [t for t in get_terms(query) if len(t) > 2]
+
+class SearchBackend(object):
+    """Base class for search backends."""
+
+    def search(self, query, video_lang=None, langs=None, team_id=None):
+        """Search for public videos
+
+        Args:
+            query: search query string.  If it's empty, we match all public
+                videos.
+            video_lang: only match videos with this primary audio language
+            langs: only match videos with completed subtitles for this
+                language
+            team_id: only match videos in this team
+
+        Returns:
+            Video queryset or SearchResults object.  Either way it supports
+            count(), len(), slicing, and iteration, so it can be passed to
+            Paginator.
+        """
+        raise NotImplementedError()
+
+    def facets(self, query):
+        """Count the public videos that match a query for each facet value
+
+        Returns:
+            dict mapping 'video_lang', 'langs', and 'team_id' to lists of
+            (value, count) tuples, with the highest count first.
+        """
+        raise NotImplementedError()
+
+    def index_videos(self, videos, texts):
+        """Update the search data for videos
+
+        Args:
+            videos: list of Video objects
+            texts: list of index texts for the videos
+        """
+        pass
+
+    def remove_videos(self, video_ids):
+        """Remove videos from the search data."""
+        pass
+
+    def clear(self):
+        """Remove all videos from the search data."""
+        pass
+
+    def filter_queryset(self, qs, video_lang=None, langs=None, team_id=None):
+        if video_lang:
+            qs = qs.filter(primary_audio_language_code=video_lang)
+        if langs:
+            qs = qs.has_completed_language(langs)
+        if team_id is not None:
+            qs = qs.filter(teamvideo__team=team_id)
+        return qs
+
+    def queryset_facets(self, qs):
+        """Calculate facets for a video queryset using the database."""
+        return {
+            'video_lang': self._count(
+                qs.exclude(primary_audio_language_code=''),
+                'primary_audio_language_code'),
+            'langs': self._count(
+                CompletedSubtitleLanguage.objects.filter(video__in=qs),
+                'language_code'),
+            'team_id': self._count(qs.filter(teamvideo__isnull=False),
+                                   'teamvideo__team'),
+        }
+
+    def _count(self, qs, field):
+        counts = (qs.order_by().values_list(field)
+                  .annotate(count=Count(field)))
+        return sorted(counts, key=lambda (value, count): (-count, value))
+
+class SearchResults(object):
+    """Ranked list of videos returned by a search backend
+
+    This works enough like a queryset that we can use it with Paginator and
+    our templates.  We only fetch the videos for the slices that get used.
+
+    Backends can lag behind changes to the videos, so we re-check that the
+    videos are public when we fetch them and skip any that aren't.
+    """
+    def __init__(self, video_ids):
+        self.video_ids = video_ids
+
+    def count(self):
+        return len(self.video_ids)
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._fetch(self.video_ids[key])
+        return self._fetch([self.video_ids[key]])[0]
+
+    def _fetch(self, video_ids):
+        videos = Video.objects.public().in_bulk(video_ids)
+        return [videos[video_id] for video_id in video_ids
+                if video_id in videos]
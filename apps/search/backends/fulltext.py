@@ -0,0 +1,40 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""search.backends.fulltext -- MySQL FULLTEXT search backend
+
+This searches VideoIndex.text directly, so there's nothing to update.
+Results aren't ranked and the facets are calculated with GROUP BY queries
+over all matching videos, which can be slow for common terms.
+"""
+
+from search.backends import SearchBackend
+from videos.models import Video
+
+class FulltextBackend(SearchBackend):
+    def search(self, query, video_lang=None, langs=None, team_id=None):
+        qs = Video.objects.public()
+        if query:
+            qs = qs.search(query)
+        return self.filter_queryset(qs, video_lang, langs, team_id)
+
+    def facets(self, query):
+        qs = Video.objects.public()
+        if query:
+            qs = qs.search(query)
+        return self.queryset_facets(qs)
@@ -0,0 +1,93 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""search.backends.invertedindex -- Embedded inverted index search backend
+
+Videos are stored in a search.invertedindex.InvertedIndex in
+SEARCH_INDEX_DIR, split into SEARCH_INDEX_SHARDS shards.  Results are ranked
+with BM25 and the language/team filters and facets are handled by the index,
+without touching the database.
+
+The index is kept up to date by search.signalhandlers.  Use the
+rebuild_search_index command to fill it for the first time.
+
+Every process that serves searches needs to read SEARCH_INDEX_DIR and every
+celery worker that updates VideoIndex needs to write to it, so it should be
+on storage that's shared by all of them.
+"""
+
+from django.conf import settings
+
+from search.backends import SearchBackend, SearchResults, query_terms
+from search.invertedindex import Document, InvertedIndex, tokenize
+from subtitles.models import SubtitleLanguage
+from teams.models import TeamVideo
+from videos.models import Video
+
+class InvertedIndexBackend(SearchBackend):
+    def __init__(self):
+        self.index = InvertedIndex(settings.SEARCH_INDEX_DIR,
+                                   settings.SEARCH_INDEX_SHARDS)
+
+    def query_tokens(self, query):
+        tokens = []
+        # Quoted phrases get split into tokens like everything else.  We
+        # don't store positions, so we match them if all the words are
+        # present.
+        for term in query_terms(query):
+            tokens.extend(tokenize(term))
+        return tokens
+
+    def search(self, query, video_lang=None, langs=None, team_id=None):
+        if not query:
+            return self.filter_queryset(Video.objects.public(), video_lang,
+                                        langs, team_id)
+        results = self.index.search(self.query_tokens(query),
+                                    language=video_lang, has_language=langs,
+                                    team_id=team_id)
+        return SearchResults([video_id for video_id, score in results])
+
+    def facets(self, query):
+        if not query:
+            return self.queryset_facets(Video.objects.public())
+        facets = self.index.facets(self.query_tokens(query))
+        return {
+            'video_lang': facets['language'],
+            'langs': facets['languages'],
+            'team_id': facets['team_id'],
+        }
+
+    def index_videos(self, videos, texts):
+        video_ids = [video.id for video in videos]
+        team_ids = dict(TeamVideo.objects
+                        .filter(video__in=video_ids)
+                        .values_list('video_id', 'team_id'))
+        completed_languages = SubtitleLanguage.calc_completed_languages(
+            video_ids)
+        self.index.add_documents(
+            Document(video.id, text, public=video.is_public,
+                     language=video.primary_audio_language_code,
+                     languages=completed_languages[video.id],
+                     team_id=team_ids.get(video.id))
+            for video, text in zip(videos, texts))
+
+    def remove_videos(self, video_ids):
+        self.index.remove_documents(video_ids)
+
+    def clear(self):
+        self.index.clear()
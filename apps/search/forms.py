@@ -20,6 +20,8 @@ from django import forms
 from django.db.models import Count
 from django.utils.translation import ugettext_lazy as _
 
+from search.backends import get_backend
+from teams.models import Team
 from utils.translation import get_language_choices
 from videos.models import Video
 
@@ -56,6 +58,8 @@ class SearchForm(forms.Form):
                               help_text=_(u'Left blank for any language'), initial='')
     video_lang = forms.ChoiceField(choices=[], required=False, label=_(u'Video In'),
                               help_text=_(u'Left blank for any language'), initial='')
+    team = forms.ChoiceField(choices=[], required=False, label=_(u'Team'),
+                             initial='')
 
     def __init__(self, *args, **kwargs):
         super(SearchForm, self).__init__(*args, **kwargs)
@@ -63,17 +67,47 @@ class SearchForm(forms.Form):
         self.fields['video_lang'].choices = sorted_language_choices()
         self.fields['langs'].choices = sorted_language_choices()
 
+    def team_id(self):
+        try:
+            return int(self.data.get('team'))
+        except (TypeError, ValueError):
+            return None
+
     def queryset(self):
-        q = self.data.get('q')
-        video_lang = self.data.get('video_lang')
-        langs = self.data.get('langs')
+        return get_backend().search(self.data.get('q'),
+                                    video_lang=self.data.get('video_lang'),
+                                    langs=self.data.get('langs'),
+                                    team_id=self.team_id())
+
+    def facets(self):
+        return get_backend().facets(self.data.get('q'))
+
+    def add_facet_counts(self):
+        """Limit the filter choices to the facets for the query
 
-        qs = Video.objects.public()
-        if q:
-            qs = qs.search(q)
-        if video_lang:
-            qs = qs.filter(primary_audio_language_code=video_lang)
-        if langs:
-            qs = qs.has_completed_language(langs)
+        After this, the video_lang, langs, and team choices only contain the
+        values that match some videos, with the number of videos in the
+        labels.  This is what we show in the search sidebar.
 
-        return qs
+        Without a query the facets would count every public video, so we
+        keep the full language lists in that case.
+        """
+        if not self.data.get('q'):
+            return
+        facets = self.facets()
+        language_names = dict(get_language_choices(flat=True))
+        for name in ('video_lang', 'langs'):
+            self.fields[name].choices = [('', _('All Languages'))] + [
+                (code, u'{} ({})'.format(language_names.get(code, code),
+                                         count))
+                for code, count in facets[name]
+            ]
+        team_names = dict(Team.objects
+                          .filter(id__in=[t for t, c in facets['team_id']],
+                                  is_visible=True)
+                          .values_list('id', 'name'))
+        self.fields['team'].choices = [('', _('All Teams'))] + [
+            (unicode(team_id), u'{} ({})'.format(team_names[team_id], count))
+            for team_id, count in facets['team_id']
+            if team_id in team_names
+        ]
@@ -0,0 +1,407 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""search.invertedindex -- On-disk inverted index with BM25 scoring
+
+The index lives in a directory of SQLite files:
+
+    - docs.db stores one row per document: its length, the metadata that we
+      filter and facet on, and the list of terms that it contains.  We need
+      the term list to remove a document's old postings when it changes.
+    - shard-NN.db files store the posting lists.  Terms are assigned to
+      shards by hashing, so a query only touches the shards for its terms and
+      writers to different shards don't block each other.
+
+Documents are identified by an integer id and have this metadata:
+
+    - public: should the document be included in search results?
+    - language: the primary language of the document
+    - languages: list of other languages for the document
+    - team_id: team that the document belongs to, or None
+
+This module doesn't depend on django, the videos code maps videos to
+documents (see search.backends.invertedindex).
+
+Updates to a document aren't atomic across shards.  If a write fails
+halfway, a document can be left with some stale postings until it's indexed
+again.  InvertedIndex.clear() and re-adding all documents will always fix
+things.
+"""
+
+from collections import Counter, defaultdict
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Match the MySQL FULLTEXT defaults: shorter words aren't indexed and longer
+# ones are skipped
+MIN_TOKEN_LENGTH = 3
+MAX_TOKEN_LENGTH = 84
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# SQLite limits the number of variables in a query to 999
+SQL_CHUNK_SIZE = 500
+
+def tokenize(text):
+    """Split text into a list of index terms."""
+    return [t for t in TOKEN_RE.findall(text.lower())
+            if MIN_TOKEN_LENGTH <= len(t) <= MAX_TOKEN_LENGTH]
+
+def _chunks(items, size=SQL_CHUNK_SIZE):
+    items = list(items)
+    for i in xrange(0, len(items), size):
+        yield items[i:i+size]
+
+def _pack_terms(terms):
+    return buffer(zlib.compress(u'\n'.join(terms).encode('utf-8')))
+
+def _unpack_terms(data):
+    if not data:
+        return set()
+    return set(zlib.decompress(str(data)).decode('utf-8').split(u'\n'))
+
+class Document(object):
+    """Document to add to the index
+
+    Attributes:
+        id: integer document id
+        text: text to index
+        public: should this document be returned by searches?
+        language: primary language code
+        languages: list of other language codes
+        team_id: team id or None
+    """
+    def __init__(self, id, text, public=True, language='', languages=(),
+                 team_id=None):
+        self.id = id
+        self.text = text
+        self.public = public
+        self.language = language
+        self.languages = languages
+        self.team_id = team_id
+
+class InvertedIndex(object):
+    """Sharded inverted index stored in a directory
+
+    Args:
+        path: directory to store the index in.  It will be created if needed.
+        shard_count: number of shards for the posting lists.  This must stay
+            the same for the life of the index.
+    """
+
+    DOCS_SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS docs ('
+        ' id INTEGER PRIMARY KEY,'
+        ' length INTEGER NOT NULL,'
+        ' public INTEGER NOT NULL,'
+        ' language TEXT NOT NULL,'
+        ' team_id INTEGER,'
+        ' terms BLOB)',
+        'CREATE TABLE IF NOT EXISTS doc_languages ('
+        ' doc_id INTEGER NOT NULL,'
+        ' language TEXT NOT NULL,'
+        ' PRIMARY KEY (doc_id, language))',
+        'CREATE TABLE IF NOT EXISTS stats ('
+        ' id INTEGER PRIMARY KEY,'
+        ' doc_count INTEGER NOT NULL,'
+        ' total_length INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO stats VALUES (1, 0, 0)',
+    ]
+    SHARD_SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS postings ('
+        ' term TEXT NOT NULL,'
+        ' doc_id INTEGER NOT NULL,'
+        ' tf INTEGER NOT NULL,'
+        ' PRIMARY KEY (term, doc_id))',
+    ]
+    # How long to wait for other processes to release a lock on one of the
+    # files
+    LOCK_TIMEOUT = 30
+
+    def __init__(self, path, shard_count=16):
+        self.path = path
+        self.shard_count = shard_count
+        self.local = threading.local()
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def _connect(self, name, schema):
+        # sqlite connections can't be shared between threads, so we keep
+        # one per thread.
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = {}
+        if name not in connections:
+            conn = sqlite3.connect(os.path.join(self.path, name),
+                                   timeout=self.LOCK_TIMEOUT)
+            with conn:
+                for sql in schema:
+                    conn.execute(sql)
+            connections[name] = conn
+        return connections[name]
+
+    def _docs_db(self):
+        return self._connect('docs.db', self.DOCS_SCHEMA)
+
+    def _shard_db(self, shard):
+        return self._connect('shard-{:02d}.db'.format(shard),
+                             self.SHARD_SCHEMA)
+
+    def shard_for_term(self, term):
+        return zlib.crc32(term.encode('utf-8')) % self.shard_count
+
+    def close(self):
+        for conn in getattr(self.local, 'connections', {}).values():
+            conn.close()
+        self.local.connections = {}
+
+    def clear(self):
+        """Remove all documents from the index."""
+        with self._docs_db() as conn:
+            conn.execute('DELETE FROM docs')
+            conn.execute('DELETE FROM doc_languages')
+            conn.execute('UPDATE stats SET doc_count=0, total_length=0')
+        for shard in xrange(self.shard_count):
+            with self._shard_db(shard) as conn:
+                conn.execute('DELETE FROM postings')
+
+    def stats(self):
+        """Get (doc_count, total_length) for the index."""
+        return self._docs_db().execute(
+            'SELECT doc_count, total_length FROM stats').fetchone()
+
+    def _stored_docs(self, doc_ids):
+        """Get a dict mapping doc ids to (length, terms) for stored docs."""
+        conn = self._docs_db()
+        stored = {}
+        for chunk in _chunks(doc_ids):
+            cursor = conn.execute(
+                'SELECT id, length, terms FROM docs WHERE id IN ({})'.format(
+                    ','.join('?' * len(chunk))), chunk)
+            for doc_id, length, terms in cursor:
+                stored[doc_id] = (length, _unpack_terms(terms))
+        return stored
+
+    def add_documents(self, documents):
+        """Add documents to the index, replacing any existing versions."""
+        documents = list(documents)
+        if not documents:
+            return
+        stored = self._stored_docs(doc.id for doc in documents)
+        deletes = defaultdict(list)
+        upserts = defaultdict(list)
+        doc_rows = []
+        language_rows = []
+        doc_count_change = length_change = 0
+        for doc in documents:
+            tokens = tokenize(doc.text)
+            counts = Counter(tokens)
+            if doc.id in stored:
+                old_length, old_terms = stored[doc.id]
+                length_change -= old_length
+            else:
+                old_terms = set()
+                doc_count_change += 1
+            length_change += len(tokens)
+            for term in old_terms.difference(counts):
+                deletes[self.shard_for_term(term)].append((term, doc.id))
+            for term, tf in counts.iteritems():
+                upserts[self.shard_for_term(term)].append((term, doc.id, tf))
+            doc_rows.append((doc.id, len(tokens), int(doc.public),
+                             doc.language or '', doc.team_id,
+                             _pack_terms(counts)))
+            language_rows.extend((doc.id, language)
+                                 for language in set(doc.languages))
+        # Write the postings first.  If that fails then the docs table still
+        # lists the old terms, which means we can clean them up next time.
+        for shard in set(deletes).union(upserts):
+            with self._shard_db(shard) as conn:
+                conn.executemany(
+                    'DELETE FROM postings WHERE term=? AND doc_id=?',
+                    deletes[shard])
+                conn.executemany(
+                    'INSERT OR REPLACE INTO postings VALUES (?, ?, ?)',
+                    upserts[shard])
+        with self._docs_db() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?)',
+                doc_rows)
+            for chunk in _chunks(doc.id for doc in documents):
+                conn.execute(
+                    'DELETE FROM doc_languages WHERE doc_id IN ({})'.format(
+                        ','.join('?' * len(chunk))), chunk)
+            conn.executemany('INSERT INTO doc_languages VALUES (?, ?)',
+                             language_rows)
+            conn.execute('UPDATE stats SET doc_count=doc_count+?, '
+                         'total_length=total_length+?',
+                         (doc_count_change, length_change))
+
+    def remove_documents(self, doc_ids):
+        """Remove documents from the index."""
+        stored = self._stored_docs(doc_ids)
+        if not stored:
+            return
+        deletes = defaultdict(list)
+        for doc_id, (length, terms) in stored.iteritems():
+            for term in terms:
+                deletes[self.shard_for_term(term)].append((term, doc_id))
+        for shard, rows in deletes.iteritems():
+            with self._shard_db(shard) as conn:
+                conn.executemany(
+                    'DELETE FROM postings WHERE term=? AND doc_id=?', rows)
+        with self._docs_db() as conn:
+            for chunk in _chunks(stored):
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute('DELETE FROM docs WHERE id IN ({})'.format(
+                    placeholders), chunk)
+                conn.execute(
+                    'DELETE FROM doc_languages WHERE doc_id IN ({})'.format(
+                        placeholders), chunk)
+            conn.execute('UPDATE stats SET doc_count=doc_count-?, '
+                         'total_length=total_length-?',
+                         (len(stored),
+                          sum(length for length, terms in stored.values())))
+
+    def postings(self, term):
+        """Get the posting list for a term as a dict mapping doc ids to term
+        frequencies.
+        """
+        cursor = self._shard_db(self.shard_for_term(term)).execute(
+            'SELECT doc_id, tf FROM postings WHERE term=?', (term,))
+        return dict(cursor)
+
+    def search(self, terms, language=None, has_language=None, team_id=None):
+        """Search the index
+
+        Only public documents that contain all of the terms are matched.
+
+        Args:
+            terms: list of terms to search for.  These should already be
+                tokenized.
+            language: only match documents with this primary language
+            has_language: only match documents with this language in their
+                languages list
+            team_id: only match documents for this team
+
+        Returns:
+            list of (doc_id, score) tuples, sorted by score with the best
+            match first.
+        """
+        matches = self._match(terms)
+        if language:
+            matches = dict((doc_id, doc) for doc_id, doc in matches.items()
+                           if doc[1] == language)
+        if team_id is not None:
+            matches = dict((doc_id, doc) for doc_id, doc in matches.items()
+                           if doc[2] == team_id)
+        if has_language:
+            with_language = self._docs_with_language(matches, has_language)
+            matches = dict((doc_id, doc) for doc_id, doc in matches.items()
+                           if doc_id in with_language)
+        results = [(doc_id, doc[3]) for doc_id, doc in matches.iteritems()]
+        results.sort(key=lambda (doc_id, score): (-score, doc_id))
+        return results
+
+    def facets(self, terms):
+        """Count the public documents that match terms for each facet value
+
+        Returns:
+            dict mapping facet names ('language', 'languages', and 'team_id')
+            to lists of (value, count) tuples, sorted with the highest count
+            first.
+        """
+        matches = self._match(terms)
+        counts = {
+            'language': Counter(doc[1] for doc in matches.values()
+                                if doc[1]),
+            'team_id': Counter(doc[2] for doc in matches.values()
+                               if doc[2] is not None),
+            'languages': Counter(),
+        }
+        conn = self._docs_db()
+        for chunk in _chunks(matches):
+            cursor = conn.execute(
+                'SELECT language FROM doc_languages '
+                'WHERE doc_id IN ({})'.format(','.join('?' * len(chunk))),
+                chunk)
+            counts['languages'].update(row[0] for row in cursor)
+        return dict((name, counter.most_common())
+                    for name, counter in counts.items())
+
+    def _match(self, terms):
+        """Find the public documents that contain all terms
+
+        Returns:
+            dict mapping doc ids to (length, language, team_id, score) tuples
+        """
+        terms = set(terms)
+        if not terms:
+            return {}
+        postings = {}
+        for term in terms:
+            postings[term] = self.postings(term)
+            if not postings[term]:
+                return {}
+        # Intersect starting with the shortest posting list
+        ordered = sorted(postings.values(), key=len)
+        candidates = set(ordered[0])
+        for posting_list in ordered[1:]:
+            candidates.intersection_update(posting_list)
+            if not candidates:
+                return {}
+
+        doc_count, total_length = self.stats()
+        avg_length = float(total_length) / doc_count if doc_count else 1.0
+        idfs = dict((term, self._idf(doc_count, len(posting_list)))
+                    for term, posting_list in postings.items())
+
+        matches = {}
+        conn = self._docs_db()
+        for chunk in _chunks(candidates):
+            cursor = conn.execute(
+                'SELECT id, length, language, team_id FROM docs '
+                'WHERE public=1 AND id IN ({})'.format(
+                    ','.join('?' * len(chunk))), chunk)
+            for doc_id, length, language, team_id in cursor:
+                norm = K1 * (1 - B + B * length / avg_length)
+                score = 0.0
+                for term, posting_list in postings.items():
+                    tf = posting_list[doc_id]
+                    score += idfs[term] * tf * (K1 + 1) / (tf + norm)
+                matches[doc_id] = (length, language, team_id, score)
+        return matches
+
+    @staticmethod
+    def _idf(doc_count, doc_freq):
+        return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _docs_with_language(self, doc_ids, language):
+        conn = self._docs_db()
+        found = set()
+        for chunk in _chunks(doc_ids):
+            cursor = conn.execute(
+                'SELECT doc_id FROM doc_languages '
+                'WHERE language=? AND doc_id IN ({})'.format(
+                    ','.join('?' * len(chunk))), [language] + chunk)
+            found.update(row[0] for row in cursor)
+        return found
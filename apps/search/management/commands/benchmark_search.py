@@ -0,0 +1,107 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Compare query latency for the search backends.
+
+Runs the same queries through the MySQL FULLTEXT backend and the embedded
+inverted index backend.  Each query does what the search page does: count
+the results and fetch the first page.
+
+The inverted index needs to be built first (set SEARCH_BACKEND to
+search.backends.invertedindex.InvertedIndexBackend and run
+rebuild_search_index).
+"""
+
+from optparse import make_option
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.backends.fulltext import FulltextBackend
+from search.backends.invertedindex import InvertedIndexBackend
+from search.invertedindex import tokenize
+from videos.models import VideoIndex
+
+PAGE_SIZE = 20
+
+def sample_queries(count, seed=0):
+    """Make queries using words from random VideoIndex rows."""
+    rng = random.Random(seed)
+    max_id = VideoIndex.objects.order_by('-video').values_list(
+        'video_id', flat=True)[:1]
+    if not max_id:
+        return []
+    queries = []
+    attempts = 0
+    while len(queries) < count and attempts < count * 10:
+        attempts += 1
+        texts = (VideoIndex.objects
+                 .filter(video_id__gte=rng.randint(1, max_id[0]))
+                 .order_by('video')
+                 .values_list('text', flat=True)[:1])
+        if not texts:
+            continue
+        # only look at the start of the text, it can be huge
+        words = tokenize(texts[0][:10000])
+        if words:
+            queries.append(u' '.join(rng.sample(
+                words, min(len(words), rng.randint(1, 2)))))
+    return queries
+
+class Command(BaseCommand):
+    args = '[query ...]'
+    help = u'Benchmark search query latency for the search backends'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--count', '-c', dest='count', type='int', default=100,
+                    help='Number of queries to sample if none are given'),
+        make_option('--rounds', '-r', dest='rounds', type='int', default=3,
+                    help='Number of times to run each query'),
+    )
+
+    def handle(self, *args, **options):
+        queries = list(args) or sample_queries(options['count'])
+        if not queries:
+            self.stdout.write('no queries\n')
+            return
+        self.time_backend('fulltext', FulltextBackend(), queries,
+                          options['rounds'])
+        self.time_backend('inverted index', InvertedIndexBackend(), queries,
+                          options['rounds'])
+
+    def time_backend(self, label, backend, queries, rounds):
+        timings = []
+        for query in queries:
+            best = None
+            for i in xrange(rounds):
+                start = time.time()
+                results = backend.search(query)
+                results.count()
+                list(results[:PAGE_SIZE])
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+        timings.sort()
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))]
+        self.stdout.write(
+            '{}: {} queries, median {:.1f}ms, p95 {:.1f}ms, '
+            'max {:.1f}ms\n'.format(
+                label, len(timings), percentile(0.5) * 1000,
+                percentile(0.95) * 1000, timings[-1] * 1000))
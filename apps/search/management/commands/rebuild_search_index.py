@@ -0,0 +1,55 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from search.backends import get_backend
+from videos.models import Video, VideoIndex
+
+class Command(BaseCommand):
+    help = u'Rebuild the data for the search backend from VideoIndex'
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', dest='batch_size', type='int',
+                    default=100, help='Number of videos to index at once'),
+        make_option('--no-clear', dest='clear', action='store_false',
+                    default=True,
+                    help="Don't remove the existing data first"),
+    )
+
+    def handle(self, batch_size, clear, **options):
+        backend = get_backend()
+        if clear:
+            backend.clear()
+        last_id = -1
+        count = 0
+        while True:
+            texts = dict(VideoIndex.objects
+                         .filter(video_id__gt=last_id)
+                         .order_by('video')
+                         .values_list('video_id', 'text')[:batch_size])
+            if not texts:
+                break
+            videos = list(Video.objects.filter(id__in=texts))
+            backend.index_videos(videos, [texts[v.id] for v in videos])
+            last_id = max(texts)
+            count += len(texts)
+            self.stdout.write('indexed {} videos (last_id: {})\n'.format(
+                count, last_id))
+        self.stdout.write('done\n')
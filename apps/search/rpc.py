@@ -28,6 +28,7 @@ from videos.rpc import render_page
 class SearchApiClass(object):
     def search(self, rdata, user):
         form = SearchForm(rdata)
+        form.add_facet_counts()
         output = render_page(rdata.get('page', 1), form.queryset(), 20)
         output['sidebar'] = render_to_string('search/_sidebar.html', {
             'form': form,
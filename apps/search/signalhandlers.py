@@ -0,0 +1,52 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save
+
+from search.backends import get_backend
+from teams.models import TeamVideo
+from teams.signals import (video_moved_from_team_to_team,
+                           video_removed_from_team)
+from videos.models import Video, VideoIndex
+from videos.signals import (language_changed, public_changed,
+                            video_index_updated)
+
+@receiver(video_index_updated)
+def on_video_index_updated(sender, videos, texts, **kwargs):
+    get_backend().index_videos(videos, texts)
+
+@receiver(post_delete, sender=Video)
+def on_video_delete(sender, instance, **kwargs):
+    get_backend().remove_videos([instance.id])
+
+# These changes don't change the index text, but they do change the fields
+# that we filter search results on.
+@receiver(language_changed)
+@receiver(public_changed)
+@receiver(video_removed_from_team)
+def on_video_search_fields_changed(sender, **kwargs):
+    VideoIndex.schedule_update(sender.pk)
+
+@receiver(post_save, sender=TeamVideo)
+def on_team_video_save(sender, instance, **kwargs):
+    VideoIndex.schedule_update(instance.video_id)
+
+@receiver(video_moved_from_team_to_team)
+def on_video_moved_from_team_to_team(sender, video, **kwargs):
+    VideoIndex.schedule_update(video.pk)
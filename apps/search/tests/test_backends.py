@@ -0,0 +1,199 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from search.backends import SearchResults, get_backend
+from search.forms import SearchForm
+from search.rpc import SearchApiClass
+from utils.factories import *
+from utils.rpc import RpcMultiValueDict
+from videos.models import Video, VideoIndex
+
+class InvertedIndexBackendTest(TestCase):
+    def setUp(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        settings_override = self.settings(
+            SEARCH_BACKEND=('search.backends.invertedindex.'
+                            'InvertedIndexBackend'),
+            SEARCH_INDEX_DIR=index_dir,
+            SEARCH_INDEX_SHARDS=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # make sure we don't use a backend created by another test
+        patcher = mock.patch('search.backends._backend', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = get_backend()
+
+    def make_video(self, **kwargs):
+        video = VideoFactory(**kwargs)
+        VideoIndex.index_video(video)
+        return video
+
+    def search(self, query, **kwargs):
+        return list(self.backend.search(query, **kwargs))
+
+    def test_search(self):
+        video1 = self.make_video(title='Apples and oranges')
+        video2 = self.make_video(title='Oranges')
+        self.make_video(title='Bananas')
+        assert_equal(self.search('apples'), [video1])
+        assert_items_equal(self.search('oranges'), [video1, video2])
+        assert_equal(self.search('apples oranges'), [video1])
+        assert_equal(self.search('"apples and oranges"'), [video1])
+        assert_equal(self.search('pears'), [])
+
+    def test_ranking(self):
+        video1 = self.make_video(title='Apple pie',
+                                 description='How to bake a pie')
+        video2 = self.make_video(title='Apple',
+                                 description='Apple, apple, apple')
+        assert_equal(self.search('apple'), [video2, video1])
+
+    def test_private_videos(self):
+        video = self.make_video(title='Apple')
+        self.make_video(title='Apple', is_public=False)
+        assert_equal(self.search('apple'), [video])
+
+    def test_video_made_private(self):
+        video = self.make_video(title='Apple')
+        video.is_public = False
+        video.save()
+        assert_equal(self.search('apple'), [])
+
+    def test_private_videos_are_rechecked(self):
+        # If the index is behind, we should still skip private videos
+        video = self.make_video(title='Apple')
+        Video.objects.filter(id=video.id).update(is_public=False)
+        assert_equal(self.search('apple'), [])
+
+    def test_video_added_to_team(self):
+        video = self.make_video(title='Apple')
+        team = TeamFactory()
+        TeamVideoFactory(video=video, team=team)
+        assert_equal(self.search('apple', team_id=team.id), [video])
+
+    def test_video_moved_to_private_team(self):
+        video = self.make_video(title='Apple', team=TeamFactory())
+        private_team = TeamFactory(is_visible=False)
+        video.get_team_video().move_to(private_team)
+        assert_equal(self.search('apple'), [])
+        assert_equal(self.backend.facets('apple')['team_id'], [])
+
+    def test_filters(self):
+        team = TeamFactory()
+        video1 = self.make_video(title='Apple',
+                                 primary_audio_language_code='en',
+                                 team=team)
+        video2 = self.make_video(title='Apple',
+                                 primary_audio_language_code='fr')
+        make_version(video2, 'de')
+        make_version(video1, 'es', subtitles_complete=False)
+        VideoIndex.index_video(video1)
+        VideoIndex.index_video(video2)
+        assert_equal(self.search('apple', video_lang='en'), [video1])
+        assert_equal(self.search('apple', team_id=team.id), [video1])
+        assert_equal(self.search('apple', langs='de'), [video2])
+        assert_equal(self.search('apple', langs='es'), [])
+
+    def test_facets(self):
+        team = TeamFactory()
+        self.make_video(title='Apple', primary_audio_language_code='en',
+                        team=team)
+        self.make_video(title='Apple', primary_audio_language_code='en')
+        video = self.make_video(title='Apple',
+                                primary_audio_language_code='fr')
+        make_version(video, 'de')
+        VideoIndex.index_video(video)
+        assert_equal(self.backend.facets('apple'), {
+            'video_lang': [('en', 2), ('fr', 1)],
+            'langs': [('de', 1)],
+            'team_id': [(team.id, 1)],
+        })
+
+    def test_update(self):
+        video = self.make_video(title='Apple')
+        video.title = 'Orange'
+        video.save()
+        VideoIndex.index_video(video)
+        assert_equal(self.search('apple'), [])
+        assert_equal(self.search('orange'), [video])
+
+    def test_delete(self):
+        video = self.make_video(title='Apple')
+        video.delete()
+        assert_equal(self.search('apple'), [])
+
+    def test_add_many(self):
+        added, existing = Video.add_many(
+            ['http://example.com/apple.mp4', 'http://example.com/pear.mp4'],
+            UserFactory())
+        videos = dict((video_url.url, video) for video, video_url in added)
+        assert_equal(self.search('apple'),
+                     [videos['http://example.com/apple.mp4']])
+
+    def test_empty_query(self):
+        video = self.make_video(title='Apple')
+        self.make_video(title='Apple', is_public=False)
+        assert_equal(self.search(''), [video])
+
+    def test_rebuild_command(self):
+        video = self.make_video(title='Apple')
+        self.backend.clear()
+        assert_equal(self.search('apple'), [])
+        call_command('rebuild_search_index')
+        assert_equal(self.search('apple'), [video])
+
+    def test_search_form(self):
+        videos = [self.make_video(title='Apple') for i in range(3)]
+        results = SearchForm({'q': 'apple'}).queryset()
+        assert_is_instance(results, SearchResults)
+        page = Paginator(results, 2).page(2)
+        assert_equal(page.paginator.count, 3)
+        assert_equal(len(page.object_list), 1)
+        assert_in(page.object_list[0], videos)
+
+    def test_search_form_facets(self):
+        team = TeamFactory(name='Fruit Team')
+        team_video = self.make_video(title='Apple', team=team,
+                                     primary_audio_language_code='en')
+        self.make_video(title='Apple', primary_audio_language_code='fr')
+        form = SearchForm({'q': 'apple', 'team': str(team.id)})
+        form.add_facet_counts()
+        assert_equal([c[0] for c in form.fields['video_lang'].choices],
+                     ['', 'en', 'fr'])
+        assert_equal(form.fields['team'].choices[1:],
+                     [(unicode(team.id), u'Fruit Team (1)')])
+        assert_equal(list(form.queryset()), [team_video])
+
+    def test_search_rpc_sidebar(self):
+        team = TeamFactory(name='Fruit Team')
+        self.make_video(title='Apple', team=team)
+        output = SearchApiClass().search(RpcMultiValueDict({'q': 'apple'}),
+                                         UserFactory())
+        assert_in('Fruit Team (1)', output['sidebar'])
@@ -16,7 +16,18 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import copy
+import errno
+import logging
+import os
+
+from django.conf import settings
 from django.core.cache import cache
+import babelsubs
+
+from utils.lrucache import LRUCache
+
+logger = logging.getLogger(__name__)
 
 TIMEOUT = 60 * 60 * 24 * 5 # 5 days
 
@@ -38,3 +49,90 @@ def get_is_synced(language, public):
 def set_is_synced(language, public, value):
     cache_key = _lang_is_synced_id(language, public)
     cache.set(cache_key, value, TIMEOUT)
+
+# Process-local cache of parsed SubtitleSets, keyed by version id.
+# SubtitleVersions are immutable once saved, so we never need to invalidate
+# these.  Entries are (subtitle_set, size) tuples, where size is the length of
+# the DFXP that we parsed the set from.
+subtitle_set_cache = LRUCache(settings.SUBTITLE_SET_CACHE_SIZE,
+                              sizeof=lambda entry: entry[1])
+
+def get_subtitle_set(version_id):
+    """Get a parsed SubtitleSet from the process-local cache
+
+    Returns a copy of the cached SubtitleSet, so callers can alter it without
+    affecting the cache.  Returns None if nothing was cached.
+    """
+    entry = subtitle_set_cache.get(version_id)
+    if entry is None:
+        return None
+    return copy.deepcopy(entry[0])
+
+def set_subtitle_set(version_id, subtitle_set, size):
+    subtitle_set_cache.set(version_id, (copy.deepcopy(subtitle_set), size))
+
+def invalidate_subtitle_set(version_id):
+    subtitle_set_cache.delete(version_id)
+
+# Cache of rendered subtitle output, keyed by version id and format.  Like
+# parsed SubtitleSets, these never need to be invalidated.  We store them in
+# the django cache and, if SUBTITLE_RENDER_CACHE_DIR is set, on disk.
+
+def _rendered_subtitles_key(version_id, format):
+    return u"subtitles-rendered-%s-%s" % (version_id, format)
+
+def _rendered_subtitles_path(version_id, format):
+    return os.path.join(settings.SUBTITLE_RENDER_CACHE_DIR, str(version_id),
+                        format)
+
+def rendered_subtitles_etag(version, format):
+    """Get the ETag value to use for rendered subtitle output."""
+    return '"%s-%s"' % (version.id, format)
+
+def get_rendered_subtitles(version, format):
+    """Get subtitles rendered to a format, using the cache if possible."""
+    cache_key = _rendered_subtitles_key(version.id, format)
+    output = cache.get(cache_key)
+    if output is not None:
+        return output
+    if settings.SUBTITLE_RENDER_CACHE_DIR:
+        output = _read_rendered_subtitles_file(version.id, format)
+        if output is not None:
+            cache.set(cache_key, output, TIMEOUT)
+            return output
+    return render_subtitles(version, format)
+
+def render_subtitles(version, format):
+    """Render subtitles to a format and store the output in the cache."""
+    output = babelsubs.to(version.get_subtitles(), format)
+    cache.set(_rendered_subtitles_key(version.id, format), output, TIMEOUT)
+    if settings.SUBTITLE_RENDER_CACHE_DIR:
+        _write_rendered_subtitles_file(version.id, format, output)
+    return output
+
+def _read_rendered_subtitles_file(version_id, format):
+    try:
+        with open(_rendered_subtitles_path(version_id, format)) as f:
+            return f.read().decode('utf-8')
+    except IOError:
+        return None
+
+def _write_rendered_subtitles_file(version_id, format, output):
+    path = _rendered_subtitles_path(version_id, format)
+    try:
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        # write to a temp file, then rename it so that readers never see
+        # partial output
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            if isinstance(output, unicode):
+                output = output.encode('utf-8')
+            f.write(output)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        logger.warn("Error writing rendered subtitles to %s", path,
+                    exc_info=True)
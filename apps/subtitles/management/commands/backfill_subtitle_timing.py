@@ -0,0 +1,68 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from subtitles.models import SubtitleVersion
+from utils.compress import decompress_dfxp
+from utils.subtitles import iter_dfxp
+
+class Command(BaseCommand):
+    help = "Store the first/last subtitle timing for existing versions"
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', dest='batch_size', default=500,
+                    type='int', help='Number of versions to update at once'),
+        make_option('-s', '--start-id', dest='start_id', default=0,
+                    type='int', help='Start at this version id'),
+    )
+
+    def handle(self, *args, **options):
+        self.count = 0
+        last_id = options['start_id'] - 1
+        while True:
+            with transaction.commit_on_success():
+                last_id = self.update_batch(last_id, options['batch_size'])
+            if last_id is None:
+                break
+            self.stdout.write('{} versions updated (last_id: {})\n'.format(
+                self.count, last_id))
+        self.stdout.write('done\n')
+
+    def update_batch(self, last_id, batch_size):
+        qs = (SubtitleVersion.objects
+              .filter(id__gt=last_id, timing_duration__isnull=True)
+              .order_by('id')
+              .values_list('id', 'serialized_subtitles'))
+        rows = list(qs[:batch_size])
+        if not rows:
+            return None
+        for version_id, data in rows:
+            self.update_row(version_id, data)
+        return rows[-1][0]
+
+    def update_row(self, version_id, data):
+        version = SubtitleVersion(id=version_id)
+        version.set_timing(iter_dfxp(decompress_dfxp(data)))
+        (SubtitleVersion.objects.filter(id=version_id)
+         .update(first_timing=version.first_timing,
+                 last_timing=version.last_timing,
+                 timing_duration=version.timing_duration))
+        self.count += 1
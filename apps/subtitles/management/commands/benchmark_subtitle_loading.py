@@ -0,0 +1,64 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+
+from subtitles.models import SubtitleVersion
+
+class Command(BaseCommand):
+    help = "Compare the different ways of loading subtitles for versions"
+    args = '<version_id version_id ...>'
+    option_list = BaseCommand.option_list + (
+        make_option('-r', '--repeat', dest='repeat', default=10, type='int',
+                    help='Number of times to run each test'),
+        make_option('-f', '--first', dest='first', default=10, type='int',
+                    help='Number of subtitles for the "first N" tests'),
+    )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        first = options['first']
+        if args:
+            versions = SubtitleVersion.objects.filter(id__in=args)
+        else:
+            versions = (SubtitleVersion.objects
+                        .order_by('-subtitle_count')[:10])
+        for version in versions:
+            self.stdout.write('version {} ({} subtitles)\n'.format(
+                version.id, version.subtitle_count))
+            self.run_test('get_subtitles() (all)', version, lambda v: list(
+                v._parse_subtitles().subtitle_items()))
+            self.run_test('iter_subtitles() (all)', version, lambda v: list(
+                v.iter_subtitles()))
+            self.run_test('get_subtitles() (first {})'.format(first), version,
+                          lambda v: list(itertools.islice(
+                              v._parse_subtitles().subtitle_items(), first)))
+            self.run_test('iter_subtitles() (first {})'.format(first),
+                          version, lambda v: list(itertools.islice(
+                              v.iter_subtitles(), first)))
+
+    def run_test(self, name, version, func):
+        start_time = time.time()
+        for i in xrange(self.repeat):
+            func(version)
+        elapsed = (time.time() - start_time) / self.repeat
+        self.stdout.write('  {}: {:.2f}ms\n'.format(name, elapsed * 1000))
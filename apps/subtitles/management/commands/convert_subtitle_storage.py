@@ -0,0 +1,116 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from subtitles.models import SubtitleVersion
+from utils.compress import (compress, compress_dfxp, decompress_dfxp,
+                            is_compact)
+
+class Command(BaseCommand):
+    help = "Convert serialized_subtitles between storage formats"
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', dest='batch_size', default=200,
+                    type='int', help='Number of versions to convert at once'),
+        make_option('-f', '--format', dest='format', default='compact',
+                    help='Format to convert to (compact or legacy)'),
+        make_option('-s', '--start-id', dest='start_id', default=0,
+                    type='int', help='Start converting at this version id'),
+        make_option('-n', '--dry-run', dest='dry_run', action='store_true',
+                    default=False,
+                    help="Don't save anything, just print size and decode "
+                    "time stats"),
+    )
+
+    def handle(self, *args, **options):
+        if options['format'] not in ('compact', 'legacy'):
+            raise CommandError("Unknown format: {}".format(options['format']))
+        self.to_compact = options['format'] == 'compact'
+        self.dry_run = options['dry_run']
+        self.stats = {
+            'count': 0,
+            'converted': 0,
+            'old_size': 0,
+            'new_size': 0,
+            'old_decode_time': 0.0,
+            'new_decode_time': 0.0,
+        }
+        last_id = options['start_id'] - 1
+        while True:
+            with transaction.commit_on_success():
+                last_id = self.convert_batch(last_id, options['batch_size'])
+            if last_id is None:
+                break
+            self.print_stats(last_id)
+        self.stdout.write('done\n')
+
+    def convert_batch(self, last_id, batch_size):
+        qs = (SubtitleVersion.objects
+              .filter(id__gt=last_id)
+              .order_by('id')
+              .values_list('id', 'serialized_subtitles'))
+        rows = list(qs[:batch_size])
+        if not rows:
+            return None
+        for version_id, data in rows:
+            self.convert_row(version_id, data)
+        return rows[-1][0]
+
+    def convert_row(self, version_id, data):
+        self.stats['count'] += 1
+        if is_compact(data) == self.to_compact:
+            return
+        start_time = time.time()
+        dfxp = decompress_dfxp(data)
+        self.stats['old_decode_time'] += time.time() - start_time
+        if self.to_compact:
+            new_data = compress_dfxp(dfxp)
+        else:
+            new_data = compress(dfxp)
+        start_time = time.time()
+        round_tripped = decompress_dfxp(new_data)
+        self.stats['new_decode_time'] += time.time() - start_time
+        if round_tripped != dfxp:
+            self.stderr.write('round trip failed for version {}\n'.format(
+                version_id))
+            return
+        self.stats['old_size'] += len(data)
+        self.stats['new_size'] += len(new_data)
+        self.stats['converted'] += 1
+        if not self.dry_run:
+            (SubtitleVersion.objects.filter(id=version_id)
+             .update(serialized_subtitles=new_data))
+
+    def print_stats(self, last_id):
+        stats = self.stats
+        converted = max(stats['converted'], 1)
+        self.stdout.write(
+            '{count} versions checked, {converted} converted '
+            '(last_id: {last_id})\n'.format(last_id=last_id, **stats))
+        self.stdout.write(
+            '  size: {} -> {} bytes ({:.1f}%)\n'.format(
+                stats['old_size'], stats['new_size'],
+                100.0 * stats['new_size'] / max(stats['old_size'], 1)))
+        self.stdout.write(
+            '  avg decode time: {:.3f}ms -> {:.3f}ms\n'.format(
+                1000 * stats['old_decode_time'] / converted,
+                1000 * stats['new_decode_time'] / converted))
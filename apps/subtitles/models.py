@@ -23,10 +23,12 @@ import itertools
 import json
 import logging
 from datetime import datetime, date, timedelta
+from multiprocessing.pool import ThreadPool
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import query, Q
 from django.utils.translation import ugettext
 from django.utils.translation import ugettext_lazy as _
@@ -42,8 +44,8 @@ from babelsubs.generators.html import HTMLGenerator
 from babelsubs import load_from
 from subtitles import signals
 from utils import dates
-from utils.compress import compress, decompress
-from utils.subtitles import create_new_subtitles
+from utils.compress import compress, compress_dfxp, decompress_dfxp
+from utils.subtitles import calc_timing, create_new_subtitles, iter_dfxp
 from utils import translation
 from videos.behaviors import make_video_title
 
@@ -112,6 +114,94 @@ def print_graphviz(video_id):
     print '\n'.join(graphviz(video))
 
 
+def serialize_subtitles(dfxp):
+    """Serialize DFXP for the SubtitleVersion.serialized_subtitles field
+
+    The storage format is controlled by the SUBTITLE_STORAGE_FORMAT setting.
+    Either format can be read back by SubtitleVersion.get_subtitles().
+    """
+    if settings.SUBTITLE_STORAGE_FORMAT == 'compact':
+        return compress_dfxp(dfxp)
+    else:
+        return compress(dfxp)
+
+
+def load_subtitle_set(serialized_subtitles, language_code):
+    """Load a SubtitleSet from SubtitleVersion.serialized_subtitles
+
+    Returns a (subtitle_set, size) tuple, where size is the length of the
+    DFXP that we parsed.
+    """
+    dfxp = decompress_dfxp(serialized_subtitles)
+    subtitles = load_from(dfxp, type='dfxp').to_internal()
+    # force the subtitles to have the correct language code.  For a
+    # while we had a bug where we always set to to "en"
+    subtitles.set_language(language_code)
+    return subtitles, len(dfxp)
+
+_subtitle_load_pool = None
+def _get_subtitle_load_pool():
+    # Create the pool lazily, so that it's created after any forking that
+    # the web/celery workers do.
+    global _subtitle_load_pool
+    if _subtitle_load_pool is None:
+        _subtitle_load_pool = ThreadPool(settings.SUBTITLE_LOAD_THREADS)
+    return _subtitle_load_pool
+
+def _load_subtitle_set_from_args(args):
+    return load_subtitle_set(*args)
+
+def fetch_subtitle_sets(versions):
+    """Load the SubtitleSets for several versions at once.
+
+    This is faster than calling get_subtitles() on each version:
+      - If any versions were fetched without serialized_subtitles, we fetch
+        the data for all of them using 1 query.
+      - We parse the subtitles in parallel using a thread pool.  zlib and
+        lxml release the GIL while they work, so this uses multiple cores.
+
+    Each version's subtitle cache is also set, so calling get_subtitles()
+    afterwards won't re-parse anything.
+
+    Returns:
+        dict mapping version ids -> SubtitleSets
+    """
+    rv = {}
+    to_load = []
+    for version in versions:
+        if version._subtitles is None:
+            version._subtitles = cache.get_subtitle_set(version.id)
+        if version._subtitles is not None:
+            rv[version.id] = version._subtitles
+        else:
+            to_load.append(version)
+    if not to_load:
+        return rv
+
+    # Fetch serialized_subtitles for versions that were loaded with it
+    # deferred
+    deferred_ids = [v.id for v in to_load
+                    if 'serialized_subtitles' not in v.__dict__]
+    if deferred_ids:
+        serialized_map = dict(SubtitleVersion.objects
+                              .filter(id__in=deferred_ids)
+                              .values_list('id', 'serialized_subtitles'))
+        for version in to_load:
+            if version.id in serialized_map:
+                version.serialized_subtitles = serialized_map[version.id]
+
+    load_args = [(v.serialized_subtitles, v.language_code) for v in to_load]
+    if len(to_load) > 1 and settings.SUBTITLE_LOAD_THREADS > 1:
+        results = _get_subtitle_load_pool().map(_load_subtitle_set_from_args,
+                                                load_args)
+    else:
+        results = [load_subtitle_set(*args) for args in load_args]
+    for version, (subtitles, size) in zip(to_load, results):
+        cache.set_subtitle_set(version.id, subtitles, size)
+        version._subtitles = subtitles
+        rv[version.id] = subtitles
+    return rv
+
 # Lineage functions -----------------------------------------------------------
 def lineage_to_json(lineage):
     return json.dumps(lineage)
@@ -407,8 +497,8 @@ class SubtitleLanguage(models.Model):
         Returns:
             dict mapping video PKs to a list of language codes
         """
-        qs = (cls.objects
-              .filter(subtitles_complete=True, video_id__in=video_list)
+        qs = (CompletedSubtitleLanguage.objects
+              .filter(video_id__in=video_list)
               .values_list('video_id', 'language_code'))
         completed_languages = collections.defaultdict(list)
         for video_id, language in qs:
@@ -432,6 +522,16 @@ class SubtitleLanguage(models.Model):
         self._tip_cache = {}
         self._translation_source_version_cache = {}
         self._frozen = False
+        self._saved_completed_state = self._completed_state()
+
+    def _completed_state(self):
+        # Use __dict__ so that we don't load deferred fields.  If they're
+        # deferred, we get None, which makes save() always update the
+        # CompletedSubtitleLanguage row.
+        if self.pk is None:
+            return None
+        return (self.__dict__.get('subtitles_complete'),
+                self.__dict__.get('language_code'))
 
     # Writelocking
     @property
@@ -566,6 +666,10 @@ class SubtitleLanguage(models.Model):
             self.created = dates.now()
 
         super(SubtitleLanguage, self).save(*args, **kwargs)
+        completed_state = self._completed_state()
+        if completed_state != self._saved_completed_state:
+            CompletedSubtitleLanguage.update_for_language(self, creating)
+            self._saved_completed_state = completed_state
 
     def title_display(self):
         tip = self.get_tip()
@@ -1187,6 +1291,46 @@ LIMIT 1;""", (self.id, self.id))
 
         return False
 
+class CompletedSubtitleLanguage(models.Model):
+    """Lists the SubtitleLanguages with subtitles_complete set
+
+    VideoQueryset uses this for the completed language filters.  It's much
+    narrower than the SubtitleLanguage table and the unique index on (video,
+    language_code) covers the lookups, so the EXISTS subqueries are cheap
+    even for large video listings.
+
+    SubtitleLanguage.save() keeps the rows up to date and they get deleted
+    along with their SubtitleLanguage.
+    """
+    subtitle_language = models.OneToOneField(
+        SubtitleLanguage, primary_key=True, related_name='completed_row')
+    video = models.ForeignKey(Video, related_name='completed_languages')
+    language_code = models.CharField(max_length=16)
+
+    class Meta:
+        unique_together = [('video', 'language_code')]
+
+    @classmethod
+    def update_for_language(cls, subtitle_language, created=False):
+        if not created:
+            cls.objects.filter(subtitle_language=subtitle_language).delete()
+        if subtitle_language.subtitles_complete:
+            cls.objects.create(subtitle_language=subtitle_language,
+                               video_id=subtitle_language.video_id,
+                               language_code=subtitle_language.language_code)
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the table from the SubtitleLanguage table."""
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM subtitles_completedsubtitlelanguage')
+        cursor.execute(
+            'INSERT INTO subtitles_completedsubtitlelanguage '
+            '(subtitle_language_id, video_id, language_code) '
+            'SELECT id, video_id, language_code '
+            'FROM subtitles_subtitlelanguage '
+            'WHERE subtitles_complete=%s', [True])
+        transaction.commit_unless_managed()
 
 # SubtitleVersions ------------------------------------------------------------
 class SubtitleVersionManager(models.Manager):
@@ -1424,6 +1568,13 @@ class SubtitleVersion(models.Model):
     # Denormalized count of the number of subtitles this version contains, for
     # easier filtering later.
     subtitle_count = models.PositiveIntegerField(default=0)
+    # Denormalized times of the first and last subtitles, in milliseconds, and
+    # the difference between them.  These are used for billing, so that we
+    # don't need to parse the subtitles.  timing_duration is None for versions
+    # that haven't been backfilled yet.  Use get_timing() to read them.
+    first_timing = models.IntegerField(null=True, blank=True)
+    last_timing = models.IntegerField(null=True, blank=True)
+    timing_duration = models.IntegerField(null=True, blank=True)
 
     created = models.DateTimeField(editable=False)
 
@@ -1461,16 +1612,37 @@ class SubtitleVersion(models.Model):
         subtitles.
 
         """
-        # We cache the parsed subs for speed.
+        # We cache the parsed subs for speed.  First on the instance, then in
+        # a process-wide cache that's shared between requests.
         if self._subtitles == None:
-            self._subtitles = load_from(decompress(self.serialized_subtitles),
-                    type='dfxp').to_internal()
-            # force the subtitles to have the correct language code.  For a
-            # while we had a bug where we always set to to "en"
-            self._subtitles.set_language(self.language_code)
+            if self.id is not None:
+                self._subtitles = cache.get_subtitle_set(self.id)
+            if self._subtitles is None:
+                self._subtitles = self._parse_subtitles()
 
         return self._subtitles
 
+    def _parse_subtitles(self):
+        subtitles, size = load_subtitle_set(self.serialized_subtitles,
+                                            self.language_code)
+        if self.id is not None:
+            cache.set_subtitle_set(self.id, subtitles, size)
+        return subtitles
+
+    def iter_subtitles(self):
+        """Iterate through the subtitles for this version.
+
+        This is a lighter-weight alternative to get_subtitles() for callers
+        that only need the timing and plain text of the subtitles.  It parses
+        the stored DFXP incrementally rather than building a SubtitleSet, so
+        memory use doesn't grow with the number of subtitles and callers can
+        stop early.
+
+        Yields SubtitleItem tuples of (start_time, end_time, text, meta).  See
+        utils.subtitles.iter_dfxp() for details.
+        """
+        return iter_dfxp(decompress_dfxp(self.serialized_subtitles))
+
     def set_subtitles(self, subtitles):
         """Set the SubtitleSet for this version.
 
@@ -1499,12 +1671,46 @@ class SubtitleVersion(models.Model):
                                 % str(type(subtitles)))
 
         self.subtitle_count = len(subtitles)
-        self.serialized_subtitles = compress(subtitles.to_xml())
+        self.set_timing(subtitles)
+        self.serialized_subtitles = serialize_subtitles(subtitles.to_xml())
+        if self.id is not None:
+            cache.invalidate_subtitle_set(self.id)
 
         # We cache the parsed subs for speed.
         self._subtitles = subtitles
 
 
+    def set_timing(self, subtitles):
+        """Set the denormalized timing fields from a list of subtitles.
+
+        subtitles can be anything that utils.subtitles.calc_timing() accepts.
+        """
+        self.first_timing, self.last_timing = calc_timing(subtitles)
+        if self.first_timing is None:
+            self.timing_duration = 0
+        else:
+            self.timing_duration = self.last_timing - self.first_timing
+
+    def get_timing(self):
+        """Get the times of the first and last subtitles.
+
+        Returns:
+            (first_timing, last_timing) tuple, in milliseconds.  Both are None
+            if there are no synced subtitles.
+
+        The times are stored when the subtitles are set.  If this version was
+        created before that and hasn't been backfilled yet, we calculate them
+        now and store them.
+        """
+        if self.timing_duration is None:
+            self.set_timing(self.iter_subtitles())
+            if self.id is not None:
+                SubtitleVersion.objects.filter(id=self.id).update(
+                    first_timing=self.first_timing,
+                    last_timing=self.last_timing,
+                    timing_duration=self.timing_duration)
+        return self.first_timing, self.last_timing
+
     def get_lineage(self):
         # We cache the parsed lineage for speed.
         if self._lineage == None:
@@ -1626,8 +1832,9 @@ class SubtitleVersion(models.Model):
         return set(mapcat(_ancestors, self.parents.full()))
 
     def get_subtitle_count(self):
-        # TODO: babelsubs now supports len() on SubtitleSet instances
-        return len([s for s in self.get_subtitles().subtitle_items()])
+        if self._subtitles is not None:
+            return len(self._subtitles)
+        return sum(1 for item in self.iter_subtitles())
 
     def get_changes(self):
         """Return (time_change, text_change).
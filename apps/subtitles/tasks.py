@@ -0,0 +1,38 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import logging
+
+from celery.task import task
+
+from subtitles import cache
+from subtitles.models import SubtitleVersion
+
+logger = logging.getLogger(__name__)
+
+@task
+def precache_rendered_subtitles(version_id, formats):
+    """Render subtitles for a version and store them in the cache."""
+    try:
+        version = SubtitleVersion.objects.get(id=version_id)
+    except SubtitleVersion.DoesNotExist:
+        logger.warn("precache_rendered_subtitles: version %s deleted",
+                    version_id)
+        return
+    for format in formats:
+        cache.render_subtitles(version, format)
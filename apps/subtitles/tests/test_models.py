@@ -25,10 +25,13 @@ from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from django.test import TestCase
 from nose.tools import *
+import mock
 
 from babelsubs.storage import SubtitleSet
 
 from auth.models import CustomUser as User
+from subtitles import cache
+from subtitles import models
 from subtitles import pipeline
 from subtitles.models import SubtitleLanguage, SubtitleVersion
 from subtitles.tests.utils import (
@@ -525,6 +528,81 @@ class TestSubtitleVersion(TestCase):
         sv4 = refresh(sv4)
         self.assertEqual(200, sv4.subtitle_count)
 
+    def test_subtitle_set_cache(self):
+        sv = self.sl_en.add_version(subtitles=[(100, 200, "a")])
+        cache.subtitle_set_cache.clear()
+        # The first load should parse the subtitles, the second should use
+        # the cached SubtitleSet
+        with mock.patch('subtitles.models.load_from',
+                        wraps=models.load_from) as mock_load_from:
+            subtitles = refresh(sv).get_subtitles()
+            subtitles2 = refresh(sv).get_subtitles()
+        self.assertEqual(mock_load_from.call_count, 1)
+        self.assertEqual(subtitles, subtitles2)
+        self.assertEqual(cache.subtitle_set_cache.hits, 1)
+        self.assertEqual(cache.subtitle_set_cache.misses, 1)
+        # Changes to the returned SubtitleSet shouldn't affect the cache
+        subtitles.append_subtitle(300, 400, "b")
+        self.assertEqual(len(refresh(sv).get_subtitles()), 1)
+
+    def test_compact_storage_format(self):
+        subs = [(100, 200, "a"), (300, 400, "b")]
+        with mock.patch.object(models.settings, 'SUBTITLE_STORAGE_FORMAT',
+                               'compact'):
+            sv = self.sl_en.add_version(subtitles=subs)
+        self.assertTrue(sv.serialized_subtitles.startswith('!'))
+        cache.subtitle_set_cache.clear()
+        self.assertEqual(refresh(sv).get_subtitles(),
+                         SubtitleSet.from_list('en', subs))
+
+    def test_iter_subtitles(self):
+        subtitles = SubtitleSet('en')
+        subtitles.append_subtitle(100, 200, "a", new_paragraph=True)
+        subtitles.append_subtitle(300, 400, "b")
+        subtitles.append_subtitle(None, None, "c")
+        sv = refresh(self.sl_en.add_version(subtitles=subtitles))
+        items = list(sv.iter_subtitles())
+        self.assertEqual([item[:3] for item in items], [
+            (100, 200, "a"),
+            (300, 400, "b"),
+            (None, None, "c"),
+        ])
+        self.assertEqual(items[0].meta['new_paragraph'], True)
+        self.assertEqual(items[1].meta['new_paragraph'], False)
+        self.assertEqual(sv.get_subtitle_count(), 3)
+        # callers should be able to stop early
+        self.assertEqual(next(sv.iter_subtitles())[:3], (100, 200, "a"))
+
+    def test_timing(self):
+        subtitles = SubtitleSet('en')
+        subtitles.append_subtitle(None, None, "a")
+        subtitles.append_subtitle(1000, 2000, "b")
+        subtitles.append_subtitle(3000, None, "c")
+        subtitles.append_subtitle(None, None, "d")
+        sv = refresh(self.sl_en.add_version(subtitles=subtitles))
+        self.assertEqual((sv.first_timing, sv.last_timing,
+                          sv.timing_duration), (1000, 3000, 2000))
+        self.assertEqual(sv.get_timing(), (1000, 3000))
+
+    def test_timing_unsynced(self):
+        subtitles = SubtitleSet('en')
+        subtitles.append_subtitle(None, None, "a")
+        sv = refresh(self.sl_en.add_version(subtitles=subtitles))
+        self.assertEqual(sv.get_timing(), (None, None))
+        self.assertEqual(sv.timing_duration, 0)
+
+    def test_timing_backfill(self):
+        # For versions without the timing stored, get_timing() should
+        # calculate it and save it.
+        subtitles = SubtitleSet('en')
+        subtitles.append_subtitle(1000, 2000, "a")
+        subtitles.append_subtitle(3000, 4000, "b")
+        sv = self.sl_en.add_version(subtitles=subtitles)
+        SubtitleVersion.objects.filter(id=sv.id).update(
+            first_timing=None, last_timing=None, timing_duration=None)
+        self.assertEqual(refresh(sv).get_timing(), (1000, 4000))
+        self.assertEqual(refresh(sv).timing_duration, 3000)
+
     def test_sibling_set(self):
         def _assert_siblings(sv, *vns):
             siblings = sv.sibling_set.full().order_by('version_number')
@@ -2263,3 +2341,107 @@ class TestSubtitleMetadata(TestCase):
 
         self.assertEqual(version.get_approved_by(), None,
             "Versions should not inherit approved_by metadata.")
+
+class FetchSubtitleSetsTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.versions = [
+            pipeline.add_subtitles(self.video, language_code,
+                                   SubtitleSetFactory(num_subs=i+1))
+            for i, language_code in enumerate(['en', 'es', 'fr', 'de'])
+        ]
+        cache.subtitle_set_cache.clear()
+
+    def check_subtitle_sets(self, subtitle_sets):
+        assert_equal(set(subtitle_sets.keys()),
+                     set(v.id for v in self.versions))
+        for version in self.versions:
+            subtitles = subtitle_sets[version.id]
+            assert_equal(subtitles, refresh(version).get_subtitles())
+
+    def test_fetch(self):
+        versions = [refresh(v) for v in self.versions]
+        with self.assertNumQueries(0):
+            subtitle_sets = models.fetch_subtitle_sets(versions)
+        self.check_subtitle_sets(subtitle_sets)
+        # get_subtitles() should use the subtitles we fetched
+        with mock.patch('subtitles.models.load_from') as mock_load_from:
+            for version in versions:
+                assert_equal(version.get_subtitles(),
+                             subtitle_sets[version.id])
+        assert_equal(mock_load_from.call_count, 0)
+
+    def test_deferred_serialized_subtitles(self):
+        versions = list(SubtitleVersion.objects
+                        .filter(id__in=[v.id for v in self.versions])
+                        .defer('serialized_subtitles'))
+        # We should fetch the data for all versions with 1 query
+        with self.assertNumQueries(1):
+            subtitle_sets = models.fetch_subtitle_sets(versions)
+        self.check_subtitle_sets(subtitle_sets)
+
+    def test_single_thread(self):
+        versions = [refresh(v) for v in self.versions]
+        with mock.patch.object(models.settings, 'SUBTITLE_LOAD_THREADS', 1):
+            subtitle_sets = models.fetch_subtitle_sets(versions)
+        self.check_subtitle_sets(subtitle_sets)
+
+class CompletedSubtitleLanguageTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+
+    def completed_rows(self):
+        return list(models.CompletedSubtitleLanguage.objects
+                    .filter(video=self.video)
+                    .values_list('language_code', flat=True))
+
+    def test_create_complete(self):
+        SubtitleLanguage.objects.create(video=self.video, language_code='en',
+                                        subtitles_complete=True)
+        SubtitleLanguage.objects.create(video=self.video, language_code='fr')
+        assert_equal(self.completed_rows(), ['en'])
+
+    def test_subtitles_complete_change(self):
+        language = SubtitleLanguage.objects.create(video=self.video,
+                                                   language_code='en')
+        language = refresh(language)
+        language.subtitles_complete = True
+        language.save()
+        assert_equal(self.completed_rows(), ['en'])
+        language = refresh(language)
+        language.subtitles_complete = False
+        language.save()
+        assert_equal(self.completed_rows(), [])
+
+    def test_language_code_change(self):
+        language = SubtitleLanguage.objects.create(video=self.video,
+                                                   language_code='en',
+                                                   subtitles_complete=True)
+        language.language_code = 'fr'
+        language.save()
+        assert_equal(self.completed_rows(), ['fr'])
+
+    def test_skip_update_if_unchanged(self):
+        language = SubtitleLanguage.objects.create(video=self.video,
+                                                   language_code='en',
+                                                   subtitles_complete=True)
+        language = refresh(language)
+        with mock.patch.object(models.CompletedSubtitleLanguage,
+                               'update_for_language') as update:
+            language.save()
+        assert_equal(update.call_count, 0)
+
+    def test_delete(self):
+        language = SubtitleLanguage.objects.create(video=self.video,
+                                                   language_code='en',
+                                                   subtitles_complete=True)
+        language.delete()
+        assert_equal(self.completed_rows(), [])
+
+    def test_rebuild(self):
+        SubtitleLanguage.objects.create(video=self.video, language_code='en',
+                                        subtitles_complete=True)
+        SubtitleLanguage.objects.create(video=self.video, language_code='fr')
+        models.CompletedSubtitleLanguage.objects.all().delete()
+        models.CompletedSubtitleLanguage.rebuild()
+        assert_equal(self.completed_rows(), ['en'])
@@ -19,6 +19,11 @@
 from django.core.cache import cache
 
 TIMEOUT = 60 * 60 * 24 * 5 # 5 days
+# The member index gets invalidated from post_save/post_delete handlers, which
+# can run before the transaction commits.  If another process rebuilds the
+# index in that window, it caches the old memberships, so keep it for a short
+# time to limit how long that lasts.
+MEMBER_INDEX_TIMEOUT = 60 * 5 # 5 minutes
 
 CACHE_VERSION = 2
 
@@ -31,6 +36,9 @@ def _team_writable_langs_id(team):
 def _team_preferred_langs_id(team):
     return u"%s-preferred-langs" % team.pk
 
+def _team_member_index_id(team_id):
+    return u"%s-member-index" % team_id
+
 
 def invalidate_lang_preferences(team):
     cache.delete(_team_readable_langs_id(team), version=CACHE_VERSION)
@@ -65,3 +73,15 @@ def get_preferred_langs(team):
         cache.set(cache_key, value, TIMEOUT, version=CACHE_VERSION)
     return value
 
+def invalidate_member_index(team_id):
+    cache.delete(_team_member_index_id(team_id), version=CACHE_VERSION)
+
+def get_member_index(team):
+    cache_key = _team_member_index_id(team.pk)
+    value = cache.get(cache_key, version=CACHE_VERSION)
+    if value is None:
+        from teams.memberindex import MemberIndex
+        value = MemberIndex.build(team.pk)
+        cache.set(cache_key, value, MEMBER_INDEX_TIMEOUT,
+                  version=CACHE_VERSION)
+    return value
@@ -0,0 +1,34 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.management.base import BaseCommand
+
+from teams.models import Team, TeamLanguageCount
+
+class Command(BaseCommand):
+    args = '[team-slug ...]'
+    help = "Rebuild the TeamLanguageCount rows (for all teams by default)"
+
+    def handle(self, *args, **options):
+        teams = Team.objects.all().order_by('id')
+        if args:
+            teams = teams.filter(slug__in=args)
+        for team_id, slug in teams.values_list('id', 'slug'):
+            TeamLanguageCount.objects.update_counts(team_id)
+            self.stdout.write('{}\n'.format(slug))
+        self.stdout.write('done\n')
@@ -0,0 +1,120 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""teams.memberindex -- Compact index of a team's members and roles
+
+MemberIndex stores the membership data for an entire team in a few flat
+arrays, so that it can be cached as a single value and checked without any
+DB queries.  Even for teams with tens of thousands of members, the pickled
+index is small enough to fit in one cache entry.
+
+Members are stored sorted by user id and looked up with a binary search:
+
+    - user_ids: array of user ids
+    - roles: array of role codes, one byte per member
+    - narrowed: bitset that marks the members that have narrowings
+    - narrowings: maps user ids to (project_ids, languages) for the members
+      that have narrowings.  Narrowings are rare, so a dict works fine here.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from teams.permissions_const import ROLES_ORDER
+
+class MemberIndex(object):
+    def __init__(self, user_ids, roles, narrowed, narrowings):
+        self.user_ids = user_ids
+        self.roles = roles
+        self.narrowed = narrowed
+        self.narrowings = narrowings
+
+    @classmethod
+    def build(cls, team_id):
+        """Build a MemberIndex from the DB.
+
+        This uses 2 queries, no matter how many members the team has.
+        """
+        from teams.models import TeamMember, MembershipNarrowing
+
+        user_ids = array('l')
+        roles = array('B')
+        qs = (TeamMember.objects.filter(team=team_id)
+              .order_by('user_id')
+              .values_list('user_id', 'role'))
+        for user_id, role in qs:
+            user_ids.append(user_id)
+            roles.append(ROLES_ORDER.index(role))
+
+        narrowings = {}
+        qs = (MembershipNarrowing.objects.filter(member__team=team_id)
+              .values_list('member__user_id', 'project_id', 'language'))
+        for user_id, project_id, language in qs:
+            project_ids, languages = narrowings.setdefault(user_id, ([], []))
+            if project_id:
+                project_ids.append(project_id)
+            if language:
+                languages.append(language)
+        narrowings = dict((user_id, (tuple(p), tuple(l)))
+                          for user_id, (p, l) in narrowings.items())
+
+        index = cls(user_ids, roles, None, narrowings)
+        narrowed = bytearray((len(user_ids) + 7) // 8)
+        for user_id in narrowings:
+            pos = index._find(user_id)
+            if pos is not None:
+                narrowed[pos // 8] |= 1 << (pos % 8)
+        index.narrowed = narrowed
+        return index
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _find(self, user_id):
+        if user_id is None:
+            return None
+        pos = bisect_left(self.user_ids, user_id)
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return pos
+        else:
+            return None
+
+    def is_member(self, user_id):
+        return self._find(user_id) is not None
+
+    def get_role(self, user_id):
+        """Get a member's role or None if they aren't a member."""
+        pos = self._find(user_id)
+        if pos is None:
+            return None
+        return ROLES_ORDER[self.roles[pos]]
+
+    def has_narrowings(self, user_id):
+        pos = self._find(user_id)
+        if pos is None:
+            return False
+        return bool(self.narrowed[pos // 8] & (1 << (pos % 8)))
+
+    def get_narrowings(self, user_id):
+        """Get a member's narrowings
+
+        Returns: (project_ids, languages) tuple
+        """
+        if not self.has_narrowings(user_id):
+            return (), ()
+        return self.narrowings[user_id]
@@ -28,9 +28,9 @@ from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.core.files import File
-from django.db import connection
+from django.db import connection, transaction, IntegrityError
 from django.db import models
-from django.db.models import query, Q, Count, Sum
+from django.db.models import query, Q, Count, Sum, Max
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.http import Http404
 from django.template.loader import render_to_string
@@ -58,6 +58,7 @@ from teams.signals import (member_leave, api_subtitles_approved,
 from utils import DEFAULT_PROTOCOL
 from utils import translation
 from utils.amazon import S3EnabledImageField, S3EnabledFileField
+from utils.debounce import DebouncedUpdate
 from utils.panslugify import pan_slugify
 from utils.text import fmt
 from videos.models import Video, VideoUrl, SubtitleVersion, SubtitleLanguage
@@ -297,6 +298,7 @@ class Team(models.Model):
     def __init__(self, *args, **kwargs):
         models.Model.__init__(self, *args, **kwargs)
         self._member_cache = {}
+        self._member_index = None
 
     def save(self, *args, **kwargs):
         creating = self.pk is None
@@ -337,13 +339,42 @@ class Team(models.Model):
             users = self.users.all()
         return UserLanguage.objects.filter(user__in=users).values_list('language', flat=True)
 
-    def active_users(self, since=None, published=True):
-        sv = NewSubtitleVersion.objects.filter(video__in=self.videos.all())
+    def get_member_language_counts(self, members_joined_since=None):
+        """Count the members of the team that speak each language
+
+        Returns: list of (language_code, count) tuples
+        """
+        if members_joined_since:
+            users = self.members_since(members_joined_since)
+        else:
+            users = self.users.all()
+        return list(UserLanguage.objects.filter(user__in=users)
+                    .values_list('language')
+                    .annotate(Count('id'))
+                    .order_by())
+
+    def _active_versions(self, since, published):
+        sv = NewSubtitleVersion.objects.filter(video__teamvideo__team=self)
         if published:
             sv = sv.filter(Q(visibility_override='public') | Q(visibility='public'))
         if since:
             sv = sv.filter(created__gt=datetime.datetime.now() - datetime.timedelta(days=since))
-        return sv.exclude(author__username="anonymous").values_list('author', 'subtitle_language')
+        return sv.exclude(author__username="anonymous")
+
+    def active_users(self, since=None, published=True):
+        return (self._active_versions(since, published)
+                .values_list('author', 'subtitle_language'))
+
+    def get_top_contributors(self, since=None, published=True, limit=20):
+        """Find the users that contributed to the most subtitle languages
+
+        Returns: list of (user_id, language_count) tuples, ordered by
+        language_count descending.
+        """
+        return list(self._active_versions(since, published)
+                    .values_list('author')
+                    .annotate(count=Count('subtitle_language', distinct=True))
+                    .order_by('-count', 'author')[:limit])
 
     def get_default_message(self, name):
         return fmt(Setting.MESSAGE_DEFAULTS.get(name, ''), team=self)
@@ -475,15 +506,30 @@ class Team(models.Model):
 
         if user.id in self._member_cache:
             return self._member_cache[user.id]
-        try:
-            member = self.members.get(user_id=user.id)
-            member.team = self
-            member.user = user
-        except TeamMember.DoesNotExist:
+        if not self.get_member_index().is_member(user.id):
+            # Skip the query for non-members
             member = None
+        else:
+            try:
+                member = self.members.get(user_id=user.id)
+                member.team = self
+                member.user = user
+            except TeamMember.DoesNotExist:
+                member = None
         self._member_cache[user.id] = member
         return member
 
+    def get_member_index(self):
+        """Get a MemberIndex for this team
+
+        The index is stored in the cache and on this Team object, so checking
+        membership and roles with it costs at most one cache fetch.
+        """
+        if self._member_index is None:
+            from teams.cache import get_member_index
+            self._member_index = get_member_index(self)
+        return self._member_index
+
     def get_join_mode(self, user):
         """Figure out how the user can join the team.
 
@@ -516,17 +562,17 @@ class Team(models.Model):
         return None
 
     def user_is_member(self, user):
-        members = self.cache.get('members')
-        if members is None:
-            members = list(self.members.values_list('user_id', flat=True))
-            self.cache.set('members', members)
-        return user.id in members
+        return self.get_member_index().is_member(user.id)
 
     def uncache_member(self, user):
+        self.uncache_member_id(user.id)
+
+    def uncache_member_id(self, user_id):
         try:
-            del self._member_cache[user.id]
+            del self._member_cache[user_id]
         except KeyError:
             pass
+        self._member_index = None
 
     def user_is_admin(self, user):
         member = self.get_member(user)
@@ -565,10 +611,10 @@ class Team(models.Model):
         """
         if not user or not user.is_authenticated():
             return False
-        qs = self.members.filter(user=user)
+        member_role = self.get_member_index().get_role(user.id)
         if role:
-            qs = qs.filter(role=role)
-        return qs.exists()
+            return member_role == role
+        return member_role is not None
 
     def can_bulk_approve(self, user):
         return self.is_owner(user) or self.is_admin(user)
@@ -808,43 +854,48 @@ class Team(models.Model):
         """
         return TeamLanguagePreference.objects.get_readable(self)
 
-    def get_team_languages(self, since=None):
-        query_sl = NewSubtitleLanguage.objects.filter(video__in=self.videos.all())
-        new_languages = []
-        if since:
-            query_sl = query_sl.filter(id__in=NewSubtitleVersion.objects.filter(video__in=self.videos.all(),
-                                                                             created__gt=datetime.datetime.now() - datetime.timedelta(days=since)).order_by('subtitle_language').values_list('subtitle_language', flat=True).distinct())
-            new_languages = list(NewSubtitleLanguage.objects.filter(video__in=self.videos_since(since)).values_list('language_code', 'subtitles_complete'))
-        query_sl = query_sl.values_list('language_code', 'subtitles_complete')
-        languages = list(query_sl)
-
-        def first_member(x):
-            return x[0]
-        complete_languages = map(first_member, filter(lambda x: x[1], languages))
-        incomplete_languages = map(first_member, filter(lambda x: not x[1], languages))
-        new_languages = map(first_member, new_languages)
-        if since:
-            return (complete_languages, incomplete_languages, new_languages)
-        else:
-            return (complete_languages, incomplete_languages)
+    def get_team_language_stats(self, since=None):
+        """Count the subtitle languages for this team's videos
+
+        The counting is done with a GROUP BY in the DB, so this stays fast
+        for teams with a large number of videos.
+
+        Args:
+            since: only count languages that had a version added in the last
+                n days
+
+        Returns: list of (language_code, complete_count, total_count) tuples
+        """
+        if not since:
+            return [(c.language_code, c.complete_count, c.subtitle_count)
+                    for c in self.language_counts.filter(subtitle_count__gt=0)]
+        qs = NewSubtitleLanguage.objects.filter(video__teamvideo__team=self)
+        versions = NewSubtitleVersion.objects.filter(
+            video__teamvideo__team=self,
+            created__gt=(datetime.datetime.now() -
+                         datetime.timedelta(days=since)))
+        qs = qs.filter(id__in=versions.values('subtitle_language'))
+        qs = (qs.values_list('language_code')
+              .annotate(Sum('subtitles_complete'), Count('id'))
+              .order_by())
+        return [(lc, int(complete or 0), total)
+                for lc, complete, total in qs]
 
     def get_video_language_counts(self):
         """Count team videos for each langugage
 
         Returns: list of (language_code, count) tuples
         """
-        return list(self.videos
-                    .values_list('primary_audio_language_code')
-                    .annotate(Count("id"))
-                    .order_by())
+        return list(self.language_counts.filter(video_count__gt=0)
+                    .values_list('language_code', 'video_count'))
 
     def get_completed_language_counts(self):
-        from subtitles.models import SubtitleLanguage
-        qs = (SubtitleLanguage.objects
-              .filter(video__in=self.videos.all())
-              .values_list('language_code')
-              .annotate(Sum('subtitles_complete')))
-        return [(lc, int(count)) for lc, count in qs]
+        """Count completed subtitle languages for the team's videos
+
+        Returns: list of (language_code, count) tuples
+        """
+        return list(self.language_counts.filter(subtitle_count__gt=0)
+                    .values_list('language_code', 'complete_count'))
 
 # This needs to be constructed after the model definition since we need a
 # reference to the class itself.
@@ -1267,6 +1318,31 @@ def autocreate_tasks(team_video):
     if workflow.autocreate_translate and existing_subtitles:
         _create_translation_tasks(team_video)
 
+def autocreate_tasks_for_new_videos(team_videos):
+    """Bulk version of autocreate_tasks() for videos from Video.add_many()
+
+    The videos are brand new, so they don't have any subtitles or tasks yet.
+    The only thing to check is if the workflow wants a transcribe task.
+    """
+    workflows = defaultdict(list)
+    for workflow in (Workflow.objects
+                     .filter(team__in=set(tv.team_id for tv in team_videos))
+                     .select_related('project', 'team', 'team_video')):
+        workflows[workflow.team_id].append(workflow)
+    tasks = []
+    for team_video in team_videos:
+        if not workflows[team_video.team_id]:
+            # No workflows means the default one, which doesn't autocreate
+            continue
+        workflow = Workflow.get_for_project(team_video.project,
+                                            workflows[team_video.team_id])
+        if workflow.autocreate_subtitle:
+            tasks.append(Task(
+                team=team_video.team, team_video=team_video,
+                subtitle_version=None,
+                language=team_video.video.primary_audio_language_code or '',
+                type=Task.TYPE_IDS['Subtitle']))
+    Task.objects.bulk_create(tasks)
 
 def team_video_delete(sender, instance, **kwargs):
     """Perform necessary actions for when a TeamVideo is deleted.
@@ -1385,10 +1461,24 @@ class TeamMember(models.Model):
     def save(self, *args, **kwargs):
         super(TeamMember, self).save(*args, **kwargs)
         Team.cache.invalidate_by_pk(self.team_id)
+        self.uncache_on_team()
 
     def delete(self):
         super(TeamMember, self).delete()
         Team.cache.invalidate_by_pk(self.team_id)
+        self.uncache_on_team()
+
+    def uncache_on_team(self):
+        """Clear the membership data stored on our Team object
+
+        We only do this if the team is already loaded.  Fetching it just to
+        clear its caches would add a query to every membership change.  The
+        cached MemberIndex gets deleted by team_id in
+        teams.signalhandlers.
+        """
+        team = getattr(self, '_team_cache', None)
+        if team is not None:
+            team.uncache_member_id(self.user_id)
 
     def leave_team(self):
         member_leave.send(sender=self)
@@ -1546,10 +1636,12 @@ class MembershipNarrowing(models.Model):
 
         super(MembershipNarrowing, self).save(*args, **kwargs)
         Team.cache.invalidate_by_pk(self.member.team_id)
+        self.member.uncache_on_team()
 
     def delete(self):
         super(MembershipNarrowing, self).delete()
         Team.cache.invalidate_by_pk(self.member.team_id)
+        self.member.uncache_on_team()
 
 class TeamSubtitleNote(SubtitleNoteBase):
     team = models.ForeignKey(Team, related_name='+')
@@ -2968,6 +3060,134 @@ class TeamLanguagePreference(models.Model):
 
 post_save.connect(TeamLanguagePreference.objects.on_changed, TeamLanguagePreference)
 
+# TeamLanguageCount
+class TeamLanguageCountManager(models.Manager):
+    def update_counts(self, team_id, language_codes=None):
+        """Recalculate the counts for a team.
+
+        Args:
+            team_id: id of the team to update
+            language_codes: only update the rows for these languages.  If
+                None, then we rebuild all rows for the team.
+        """
+        videos = Video.objects.filter(teamvideo__team=team_id)
+        languages = NewSubtitleLanguage.objects.filter(
+            video__teamvideo__team=team_id)
+        versions = NewSubtitleVersion.objects.filter(
+            video__teamvideo__team=team_id)
+        existing = self.filter(team=team_id)
+        if language_codes is not None:
+            language_codes = set(language_codes)
+            if not language_codes:
+                return
+            videos = videos.filter(
+                primary_audio_language_code__in=language_codes)
+            languages = languages.filter(language_code__in=language_codes)
+            versions = versions.filter(language_code__in=language_codes)
+            existing = existing.filter(language_code__in=language_codes)
+
+        counts = {}
+        def get_counts(language_code):
+            if language_code not in counts:
+                counts[language_code] = TeamLanguageCount(
+                    team_id=team_id, language_code=language_code)
+            return counts[language_code]
+
+        for language_code, count in (videos
+                                     .values_list('primary_audio_language_code')
+                                     .annotate(Count('id')).order_by()):
+            get_counts(language_code).video_count = count
+        for language_code, complete, total in (
+                languages.values_list('language_code')
+                .annotate(Sum('subtitles_complete'), Count('id')).order_by()):
+            row = get_counts(language_code)
+            row.complete_count = int(complete or 0)
+            row.subtitle_count = total
+        for language_code, last_edit in (
+                versions.values_list('language_code')
+                .annotate(Max('created')).order_by()):
+            get_counts(language_code).last_edit = last_edit
+
+        try:
+            self._save_counts(existing, counts)
+        except IntegrityError:
+            # Another worker inserted some of the rows after we looked up the
+            # existing ones.  Try again, this time those rows will be updated.
+            self._save_counts(existing, counts)
+
+    def _save_counts(self, existing, counts):
+        with transaction.commit_on_success():
+            existing.exclude(language_code__in=counts.keys()).delete()
+            current = dict((row.language_code, row.id)
+                           for row in existing.only('id', 'language_code'))
+            new_rows = []
+            for language_code, row in counts.items():
+                if language_code in current:
+                    row.id = current[language_code]
+                    row.save()
+                else:
+                    new_rows.append(row)
+            self.bulk_create(new_rows)
+
+    _updates = DebouncedUpdate('team-language-count',
+                               'TEAM_LANGUAGE_COUNT_UPDATE_DELAY')
+
+    def schedule_update(self, team_id, language_codes=None):
+        """Schedule an update_counts() call for a team
+
+        Updates are debounced like VideoIndex.schedule_update().  Saving a
+        version sends several signals from inside the subtitle pipeline's
+        transaction, so the delay also gives that transaction time to commit
+        before we count.
+
+        Args:
+            team_id: id of the team to update
+            language_codes: If given, only these languages have changed.
+        """
+        self._updates.schedule(tasks.update_team_language_counts, team_id,
+                               language_codes)
+
+    def run_scheduled_update(self, team_id):
+        """Run an update scheduled with schedule_update()."""
+        language_codes = self._updates.get_pending(team_id)
+        if language_codes is None:
+            self.update_counts(team_id)
+        elif language_codes:
+            self.update_counts(team_id, language_codes)
+
+class TeamLanguageCount(models.Model):
+    """Rollup of the subtitle language counts for a team
+
+    There is a row for each language used by the team's videos.  Signal
+    handlers in teams.signalhandlers schedule update_counts() for the
+    affected rows when videos or subtitles change.  Use the
+    rebuild_team_language_counts command to rebuild the table from scratch.
+
+    Attributes:
+        video_count: number of team videos with this primary audio language
+        subtitle_count: number of subtitle languages for the team's videos
+        complete_count: number of those that are marked complete
+        last_edit: time of the most recent subtitle version
+    """
+    team = models.ForeignKey(Team, related_name='language_counts')
+    language_code = models.CharField(max_length=16)
+    video_count = models.PositiveIntegerField(default=0)
+    subtitle_count = models.PositiveIntegerField(default=0)
+    complete_count = models.PositiveIntegerField(default=0)
+    last_edit = models.DateTimeField(blank=True, null=True)
+
+    objects = TeamLanguageCountManager()
+
+    class Meta:
+        unique_together = ('team', 'language_code')
+
+    @property
+    def incomplete_count(self):
+        return self.subtitle_count - self.complete_count
+
+    def __unicode__(self):
+        return u"%s counts for team %s" % (self.language_code, self.team_id)
+
 
 # TeamNotificationSettings
 class TeamNotificationSettingManager(models.Manager):
@@ -3107,6 +3327,8 @@ class BillingReport(models.Model):
         (TYPE_APPROVAL, 'Professional services'),
         (TYPE_APPROVAL_FOR_USERS, 'On-demand translators'),
     )
+    # Number of approve tasks to fetch at once for TYPE_APPROVAL reports
+    APPROVAL_PAGE_SIZE = 1000
     teams = models.ManyToManyField(Team, related_name='billing_reports')
     start_date = models.DateField()
     end_date = models.DateField()
@@ -3147,29 +3369,69 @@ class BillingReport(models.Model):
             'Approver',
             'Date',
         )
-        rows = [header]
-        for approve_task in self._get_approved_tasks():
-            video = approve_task.team_video.video
-            project = approve_task.team_video.project.name if approve_task.team_video.project else 'none'
-            version = approve_task.new_subtitle_version
-            language = version.subtitle_language
-            subtitle_task = (Task.objects.complete_subtitle_or_translate()
-                             .filter(team_video=approve_task.team_video,
-                                     language=approve_task.language)
-                             .order_by('-completed'))[0]
-            rows.append((
-                approve_task.team.name,
-                video.title_display(),
-                video.video_id,
-                project,
-                approve_task.language,
-                get_minutes_for_version(version, False),
-                language.is_primary_audio_language(),
-                subtitle_task.type==Task.TYPE_IDS['Translate'],
-                unicode(approve_task.assignee),
-                self._report_date(approve_task.completed),
-            ))
-        return rows
+        yield header
+        for page in self._iter_approved_task_pages():
+            versions = (NewSubtitleVersion.objects
+                        .only('language_code', 'first_timing',
+                              'last_timing', 'timing_duration')
+                        .in_bulk([t.new_subtitle_version_id for t in page
+                                  if t.new_subtitle_version_id]))
+            translations = self._find_translations(page)
+            for approve_task in page:
+                video = approve_task.team_video.video
+                project = approve_task.team_video.project.name if approve_task.team_video.project else 'none'
+                version = versions[approve_task.new_subtitle_version_id]
+                yield (
+                    approve_task.team.name,
+                    video.title_display(),
+                    video.video_id,
+                    project,
+                    approve_task.language,
+                    get_minutes_for_version(version, False),
+                    video.primary_audio_language_code == version.language_code,
+                    translations.get((approve_task.team_video_id,
+                                      approve_task.language), False),
+                    unicode(approve_task.assignee),
+                    self._report_date(approve_task.completed),
+                )
+
+    def _iter_approved_task_pages(self):
+        """Iterate through the approved tasks, one page at a time
+
+        Each page is fetched with a single query that joins in the team,
+        video, project and approver.  Pages are fetched using keyset
+        pagination on the task id.
+        """
+        qs = (self._get_approved_tasks()
+              .select_related('team', 'team_video__video',
+                              'team_video__project', 'assignee')
+              .order_by('id'))
+        page = list(qs[:self.APPROVAL_PAGE_SIZE])
+        while page:
+            yield page
+            page = list(qs.filter(id__gt=page[-1].id)
+                        [:self.APPROVAL_PAGE_SIZE])
+
+    def _find_translations(self, approve_tasks):
+        """Check which approve tasks were for translations
+
+        We look at the latest completed subtitle/translate task for the same
+        team video and language.  The lookup is done with a single query for
+        all of approve_tasks.
+
+        Returns:
+            dict mapping (team_video_id, language_code) to True if the latest
+            task was a translate task, and False if it was a subtitle task.
+        """
+        qs = (Task.objects.complete_subtitle_or_translate()
+              .filter(team_video__in=set(t.team_video_id
+                                         for t in approve_tasks))
+              .order_by('completed')
+              .values_list('team_video', 'language', 'type'))
+        # Later tasks overwrite earlier ones, so we end up with the latest
+        return dict(((team_video_id, language_code),
+                     task_type == Task.TYPE_IDS['Translate'])
+                    for team_video_id, language_code, task_type in qs)
 
     def generate_rows_type_approval_for_users(self):
         header = (
@@ -3234,22 +3496,28 @@ class BillingReport(models.Model):
         return [header] + data_rows
 
     def generate_rows_type_billing_record(self):
-        rows = []
         for i,team in enumerate(self.teams.all()):
-            rows = rows + BillingRecord.objects.csv_report_for_team(team,
-                self.start_date, self.end_date, add_header=i == 0)
-        return rows
+            for row in BillingRecord.objects.csv_report_for_team(team,
+                self.start_date, self.end_date, add_header=i == 0):
+                yield row
 
-    def generate_rows(self):
+    def iter_rows(self):
+        """Iterate through the rows of the report
+
+        For billing record and approval reports, the rows are generated
+        lazily, which keeps memory usage bounded for large reports.
+        """
         if self.type == BillingReport.TYPE_BILLING_RECORD:
-            rows = self.generate_rows_type_billing_record()
+            return self.generate_rows_type_billing_record()
         elif self.type == BillingReport.TYPE_APPROVAL:
-            rows = self.generate_rows_type_approval()
+            return self.generate_rows_type_approval()
         elif self.type == BillingReport.TYPE_APPROVAL_FOR_USERS:
-            rows = self.generate_rows_type_approval_for_users()
+            return iter(self.generate_rows_type_approval_for_users())
         else:
             raise ValueError("Unknown type: %s" % self.type)
-        return rows
+
+    def generate_rows(self):
+        return list(self.iter_rows())
 
     def convert_unicode_to_utf8(self, rows):
         def _convert(value):
@@ -3257,7 +3525,7 @@ class BillingReport(models.Model):
                 return value.encode("utf-8")
             else:
                 return value
-        return [tuple(_convert(v) for v in row) for row in rows]
+        return (tuple(_convert(v) for v in row) for row in rows)
 
     def process(self):
         """
@@ -3266,16 +3534,19 @@ class BillingReport(models.Model):
         storage will take care of exporting it to s3.
         """
         try:
-            rows = self.generate_rows()
+            self.csv_file = self.make_csv_file(self.iter_rows())
         except StandardError:
             logger.error("Error generating billing report: (id: %s)", self.id)
             self.csv_file = None
-        else:
-            self.csv_file = self.make_csv_file(rows)
         self.processed = datetime.datetime.utcnow()
         self.save()
 
     def make_csv_file(self, rows):
+        """Write rows to a CSV file
+
+        Rows are written as they are generated, so rows can be an iterator
+        that never has the entire report in memory.
+        """
         rows = self.convert_unicode_to_utf8(rows)
         fn = '/tmp/bill-%s-teams-%s-%s-%s-%s.csv' % (
             self.teams.all().count(),
@@ -3296,22 +3567,61 @@ class BillingReport(models.Model):
         return self.end_date.strftime("%Y%m%d")
 
 class BillingReportGenerator(object):
+    """Generate the rows for a billing record report
+
+    Iterate over the generator to get the rows.  Records are fetched in
+    pages, ordered by video, so memory usage stays bounded no matter how many
+    records are in the report.
+    """
+
+    PAGE_SIZE = 1000
+
     def __init__(self, all_records, add_header=True):
-        if add_header:
-            self.rows = [self.header()]
-        else:
-            self.rows = []
-        all_records = list(all_records)
-        self.make_language_number_map(all_records)
-        self.make_languages_without_records(all_records)
-        for video, records in groupby(all_records, lambda r: r.video):
-            records = list(records)
-            if video:
-                for lang in self.languages_without_records.get(video.id, []):
-                    self.rows.append(
-                        self.make_row_for_lang_without_record(video, lang))
-            for r in records:
-                self.rows.append(self.make_row(video, r))
+        self.all_records = all_records
+        self.add_header = add_header
+
+    def __iter__(self):
+        if self.add_header:
+            yield self.header()
+        last_video_id = None
+        for records in self.iter_record_pages():
+            self.make_language_number_map(records)
+            self.make_languages_without_records(records, last_video_id)
+            for video, video_records in groupby(records, lambda r: r.video):
+                if video and video.id != last_video_id:
+                    for lang in self.languages_without_records.get(video.id, []):
+                        yield self.make_row_for_lang_without_record(video,
+                                                                    lang)
+                for r in video_records:
+                    yield self.make_row(video, r)
+                last_video_id = video and video.id
+
+    def iter_record_pages(self):
+        """Iterate through our records, one page at a time
+
+        Records for deleted videos come first, then the records for each
+        video.  We use keyset pagination, which avoids the cost of large
+        OFFSET values.
+        """
+        qs = self.all_records.select_related(
+            'video', 'project', 'team', 'user', 'new_subtitle_language')
+
+        deleted_video_qs = qs.filter(video__isnull=True).order_by('id')
+        page = list(deleted_video_qs[:self.PAGE_SIZE])
+        while page:
+            yield page
+            page = list(deleted_video_qs.filter(id__gt=page[-1].id)
+                        [:self.PAGE_SIZE])
+
+        video_qs = qs.filter(video__isnull=False).order_by('video', 'id')
+        page = list(video_qs[:self.PAGE_SIZE])
+        while page:
+            yield page
+            last_record = page[-1]
+            page = list(video_qs.filter(
+                Q(video__gt=last_record.video_id) |
+                Q(video=last_record.video_id, id__gt=last_record.id))
+                [:self.PAGE_SIZE])
 
     def header(self):
         return [
@@ -3344,21 +3654,31 @@ class BillingReportGenerator(object):
         ]
 
     def make_language_number_map(self, records):
+        """Calculate the language numbers for a page of records
+
+        The language number counts all records for the video, including ones
+        that aren't part of the report, so we need to query the DB for them.
+        """
         self.language_number_map = {}
-        videos = set(r.video for r in records)
-        video_counts = dict((v and v.id, 0) for v in videos)
+        video_ids = set(r.video_id for r in records if r.video_id)
         qs = (BillingRecord.objects
-              .filter(video__in=videos)
-              .order_by('created'))
-        for record in qs:
-            vid = record.video and record.video.id
-            video_counts[vid] += 1
-            self.language_number_map[record.id] = video_counts[vid]
-
-    def make_languages_without_records(self, records):
+              .filter(video__in=video_ids)
+              .order_by('video', 'created', 'id')
+              .values_list('video', 'id'))
+        for video_id, records in groupby(qs, lambda row: row[0]):
+            for i, (video_id, record_id) in enumerate(records):
+                self.language_number_map[record_id] = i + 1
+
+    def make_languages_without_records(self, records, skip_video_id=None):
+        """Find completed languages without records for a page of records
+
+        Args:
+            records: page of records
+            skip_video_id: video that was already handled in the last page
+        """
         self.languages_without_records = {}
-        videos = [r.video for r in records]
-        language_ids = [r.new_subtitle_language_id for r in records]
+        video_ids = set(r.video_id for r in records
+                        if r.video_id and r.video_id != skip_video_id)
         no_billing_record_where = """\
 NOT EXISTS (
     SELECT 1
@@ -3366,9 +3686,8 @@ NOT EXISTS (
     WHERE br.new_subtitle_language_id = subtitles_subtitlelanguage.id
 )"""
         qs = (NewSubtitleLanguage.objects
-              .filter(video__in=videos, subtitles_complete=True)
-              .exclude(id__in=language_ids).
-              extra(where=[no_billing_record_where]))
+              .filter(video__in=video_ids, subtitles_complete=True)
+              .extra(where=[no_billing_record_where]))
         for lang in qs:
             vid = lang.video_id
             if vid not in self.languages_without_records:
@@ -3397,9 +3716,12 @@ class BillingRecordManager(models.Manager):
         return self.filter(team=team, created__gte=start, created__lte=end)
 
     def csv_report_for_team(self, team, start, end, add_header=True):
+        """Get the rows for a team's billing report
+
+        Returns: iterator that yields rows
+        """
         all_records = self.data_for_team(team, start, end)
-        generator = BillingReportGenerator(all_records, add_header)
-        return generator.rows
+        return iter(BillingReportGenerator(all_records, add_header))
 
     def insert_records_for_translations(self, billing_record):
         """
@@ -3483,34 +3805,12 @@ class BillingRecordManager(models.Manager):
 def get_minutes_for_version(version, round_up_to_integer):
     """
     Return the number of minutes the subtitles specified in version
-    """
-    subs = version.get_subtitles()
 
-    if len(subs) == 0:
-        return 0
-
-    for sub in subs:
-        if sub.start_time is not None:
-            start_time = sub.start_time
-            break
-        # we shouldn't have an end time set without a start time, but handle
-        # it just in case
-        if sub.end_time is not None:
-            start_time = sub.end_time
-            break
-    else:
-        return 0
-
-    for sub in reversed(subs):
-        if sub.end_time is not None:
-            end_time = sub.end_time
-            break
-        # we shouldn't have an end time not set, but check for that just in
-        # case
-        if sub.start_time is not None:
-            end_time = sub.start_time
-            break
-    else:
+    This uses the timing stored on the version, so we don't need to parse the
+    subtitles.
+    """
+    start_time, end_time = version.get_timing()
+    if start_time is None:
         return 0
 
     duration_seconds =  (end_time - start_time) / 1000.0
@@ -26,14 +26,12 @@ from __future__ import absolute_import
 import functools
 import json
 import logging
-import pickle
 from collections import namedtuple, OrderedDict
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import redirect_to_login
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.core.urlresolvers import reverse
 from django.db.models import Q
@@ -52,7 +50,7 @@ from .bulk_actions import add_videos_from_csv
 from .exceptions import ApplicationInvalidException
 from .models import (Invite, Setting, Team, Project, TeamVideo,
                      TeamLanguagePreference, TeamMember, Application)
-from .statistics import compute_statistics
+from .statistics import get_statistics
 from activity.models import ActivityRecord
 from auth.models import CustomUser as User
 from messages import tasks as messages_tasks
@@ -746,13 +744,7 @@ def statistics(request, team, tab):
     if (tab == 'teamstats' and
         not permissions.can_view_stats_tab(team, request.user)):
         return HttpResponseForbidden("Not allowed")
-    cache_key = 'stats-' + team.slug + '-' + tab
-    cached_context = cache.get(cache_key)
-    if cached_context:
-        context = pickle.loads(cached_context)
-    else:
-        context = compute_statistics(team, stats_type=tab)
-        cache.set(cache_key, pickle.dumps(context), 60*60*24)
+    context = get_statistics(team, stats_type=tab)
     context['tab'] = tab
     context['team'] = team
     context['breadcrumbs'] = [
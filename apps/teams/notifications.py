@@ -16,7 +16,6 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-from httplib2 import Http
 from urllib import urlencode
 
 from django.conf import settings
@@ -26,6 +25,7 @@ from django.contrib.sites.models import Site
 from django.utils.translation import ugettext_lazy as _
 
 from localeurl.utils import universal_url
+from notifications import delivery
 from utils import send_templated_email
 from unilangs import LanguageCode
 from videos.models import Video
@@ -146,9 +146,10 @@ class BaseNotification(object):
             return  self.from_internal_lang(self.language.language_code)
 
     def send_http_request(self, url, basic_auth_username, basic_auth_password):
-        h = Http(disable_ssl_certificate_validation=True)
         if basic_auth_username and basic_auth_password:
-            h.add_credentials(basic_auth_username, basic_auth_password)
+            auth = (basic_auth_username, basic_auth_password)
+        else:
+            auth = None
 
         project = self.video.get_team_video().project.slug if self.video else None
         data = {
@@ -174,10 +175,11 @@ class BaseNotification(object):
         data = urlencode(data)
         url = "%s?%s" % (url , data)
         try:
-            resp, content = h.request(url, method="POST", body=data, headers={
+            resp = delivery.post(url, data, headers={
                 'referer': '%s://%s' % (DEFAULT_PROTOCOL, Site.objects.get_current().domain)
-            })
-            success = 200 <= resp.status < 400
+            }, auth=auth, verify=False)
+            content = resp.content
+            success = 200 <= resp.status_code < 400
             if success is False:
                 logger.error("Failed to notify team %s " % (self.team),
                      extra={
@@ -20,6 +20,7 @@ from collections import namedtuple
 
 from django.utils.translation import ugettext as _
 
+from subtitles.models import SubtitleLanguage
 from teams.models import Team, MembershipNarrowing, Workflow, TeamMember, Task
 from teams.permissions_const import (
     ROLES_ORDER, ROLE_OWNER, ROLE_CONTRIBUTOR, ROLE_ADMIN, ROLE_MANAGER,
@@ -95,23 +96,24 @@ def get_role_for_target(user, team, project=None, lang=None):
     `lang` should be a string (the language code).
 
     """
-    member = get_member(user, team)
-    role = get_role(member)
-    narrowings = get_narrowings(member)
+    # Use the team's MemberIndex, which avoids any DB queries once the
+    # index is fetched.
+    index = team.get_member_index()
+    role = index.get_role(user.id) or ROLE_OUTSIDER
 
     # If the user has no narrowings, just return their overall role.
-    if not narrowings:
+    if not index.has_narrowings(user.id):
         return role
 
     # Otherwise the narrowings must match the target.
-    project_narrowings = [n.project for n in narrowings if n.project]
-    lang_narrowings = [n.language for n in narrowings if n.language]
+    project_narrowings, lang_narrowings = index.get_narrowings(user.id)
 
     # The default project is the same as "no project".
     if project and project.is_default_project:
         project = None
 
-    if project_narrowings and project not in project_narrowings:
+    if project_narrowings and (project is None or
+                               project.id not in project_narrowings):
         return ROLE_CONTRIBUTOR
 
     if lang_narrowings and lang not in lang_narrowings:
@@ -625,11 +627,14 @@ def can_review(team_video, user, lang=None, allow_own=False):
         return True
 
     # Users usually cannot review their own subtitles.
-    if not hasattr(team_video, '_cached_version_for_review'):
-        team_video._cached_version_for_review = team_video.video.latest_version(
-            language_code=lang, public_only=False)
+    if not hasattr(team_video, '_cached_versions_for_review'):
+        team_video._cached_versions_for_review = {}
+    if lang not in team_video._cached_versions_for_review:
+        team_video._cached_versions_for_review[lang] = (
+            team_video.video.latest_version(language_code=lang,
+                                            public_only=False))
 
-    subtitle_version = team_video._cached_version_for_review
+    subtitle_version = team_video._cached_versions_for_review[lang]
 
     if lang and subtitle_version and subtitle_version.author_id == user.id:
         if can_review_own_subtitles(role, team_video):
@@ -871,7 +876,7 @@ def can_perform_task(user, task, allow_own=False):
     #
     # TODO: Remove this hack once we get the "origin" of versions in place.
     if task.get_type_display() in ['Review', 'Approve']:
-        if task.assignee == user:
+        if task.assignee_id is not None and task.assignee_id == user.id:
             return True
 
     return can_perform_task_for(user, task.type, task.team_video,
@@ -1032,3 +1037,178 @@ def can_create_team(user):
 def can_create_team_ui(user):
     # via website
     return user.has_perm('teams.add_team') and user.is_active
+
+# Bulk permission checks
+class PermissionContext(object):
+    """Caches the data that permission checks for a user need
+
+    Listing pages check permissions for every row and each row usually has
+    its own Team/TeamVideo instances, so the per-instance caches that
+    Team.get_member() and Workflow.get_for_team_video() use don't help much.
+    PermissionContext loads the data for a whole page of rows at once:
+
+        - The MemberIndex for each team
+        - The user's TeamMember for each team
+        - The Workflows for each team
+        - The versions that can_review() checks for review tasks
+
+    Once objects are primed, the regular permission functions (can_review(),
+    can_perform_task(), etc.) work without any extra queries for the user.
+    The check_*_tasks() methods are shortcuts that prime a list of tasks and
+    then run a check for each one.
+    """
+    def __init__(self, user):
+        self.user = user
+        # team_id -> MemberIndex
+        self._member_indexes = {}
+        # team_id -> TeamMember or None
+        self._members = {}
+        # team_id -> list of Workflows
+        self._workflows = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """Get the PermissionContext for a request, creating it if needed."""
+        if not hasattr(request, '_permission_context'):
+            request._permission_context = cls(request.user)
+        return request._permission_context
+
+    def get_member(self, team):
+        """Get the user's TeamMember for a team or None."""
+        self.prime_teams([team])
+        return team.get_member(self.user)
+
+    def prime_teams(self, teams):
+        """Load the membership data for a list of teams.
+
+        This fetches the MemberIndex at most once per team and the user's
+        TeamMember objects with 1 query, or none if the user isn't a member
+        of any new team.
+        """
+        teams = list(teams)
+        for team in teams:
+            if team.id not in self._member_indexes:
+                self._member_indexes[team.id] = team.get_member_index()
+            team._member_index = self._member_indexes[team.id]
+
+        if not self.user.is_authenticated():
+            return
+        teams_by_id = dict((team.id, team) for team in teams
+                           if team.id not in self._members)
+        if teams_by_id:
+            member_team_ids = [
+                team_id for team_id in teams_by_id
+                if self._member_indexes[team_id].is_member(self.user.id)
+            ]
+            for team_id in teams_by_id:
+                self._members[team_id] = None
+            if member_team_ids:
+                for member in TeamMember.objects.filter(
+                        user=self.user, team__in=member_team_ids):
+                    member.user = self.user
+                    member.team = teams_by_id[member.team_id]
+                    self._members[member.team_id] = member
+        for team in teams:
+            team._member_cache[self.user.id] = self._members[team.id]
+
+    def prime_team_videos(self, team_videos):
+        """Prime membership and workflow data for a list of TeamVideos
+
+        team_video.team and team_video.project should already be loaded (for
+        example with select_related()).
+        """
+        team_videos = list(team_videos)
+        self.prime_teams([tv.team for tv in team_videos])
+
+        missing = set(tv.team_id for tv in team_videos
+                      if tv.team_id not in self._workflows)
+        if missing:
+            for team_id in missing:
+                self._workflows[team_id] = []
+            workflow_qs = (Workflow.objects.filter(team__in=missing)
+                           .select_related('project', 'team', 'team_video'))
+            for workflow in workflow_qs:
+                self._workflows[workflow.team_id].append(workflow)
+
+        for team_video in team_videos:
+            if not hasattr(team_video, '_cached_workflow'):
+                team_video._cached_workflow = _pick_workflow(
+                    team_video, self._workflows[team_video.team_id])
+
+    def prime_tasks(self, tasks):
+        """Prime all data needed to check permissions for a list of tasks.
+
+        task.team, task.team_video, task.team_video.team and
+        task.team_video.project should already be loaded.
+        """
+        tasks = list(tasks)
+        self.prime_teams([task.team for task in tasks])
+        self.prime_team_videos([task.team_video for task in tasks])
+        self._prime_versions_for_review(
+            [task for task in tasks
+             if task.type == Task.TYPE_IDS['Review'] and task.language])
+
+    def _prime_versions_for_review(self, tasks):
+        tasks = [
+            task for task in tasks
+            if task.language not in getattr(task.team_video,
+                                             '_cached_versions_for_review', {})
+        ]
+        if not tasks:
+            return
+        languages = (SubtitleLanguage.objects
+                     .filter(video__in=set(t.team_video.video_id
+                                           for t in tasks),
+                             language_code__in=set(t.language for t in tasks))
+                     .fetch_and_join(private_tips=True))
+        tips = dict(((l.video_id, l.language_code), l.get_tip(public=False))
+                    for l in languages)
+        for task in tasks:
+            team_video = task.team_video
+            if not hasattr(team_video, '_cached_versions_for_review'):
+                team_video._cached_versions_for_review = {}
+            team_video._cached_versions_for_review[task.language] = tips.get(
+                (team_video.video_id, task.language))
+
+    def check_perform_tasks(self, tasks, allow_own=False):
+        """Check can_perform_task() for a list of tasks.
+
+        Returns: list of booleans, one for each task
+        """
+        self.prime_tasks(tasks)
+        return [bool(can_perform_task(self.user, task, allow_own))
+                for task in tasks]
+
+    def check_assign_tasks(self, tasks):
+        """Check can_assign_task() for a list of tasks."""
+        self.prime_tasks(tasks)
+        return [bool(can_assign_task(task, self.user)) for task in tasks]
+
+    def check_delete_tasks(self, tasks):
+        """Check can_delete_task() for a list of tasks."""
+        self.prime_tasks(tasks)
+        return [bool(can_delete_task(task, self.user)) for task in tasks]
+
+def _pick_workflow(team_video, workflows):
+    """Pick the workflow for a TeamVideo from its team's workflows
+
+    This matches Workflow.get_for_target(), but doesn't need to refetch the
+    TeamVideo when it falls back to the project workflow.
+    """
+    for workflow in workflows:
+        if workflow.team_video_id == team_video.id:
+            return workflow
+
+    project = team_video.project
+    if project and project.workflow_enabled:
+        for workflow in workflows:
+            if (workflow.project_id == project.id and
+                    not workflow.team_video_id):
+                return workflow
+
+    team = team_video.team
+    if team.workflow_enabled:
+        for workflow in workflows:
+            if not workflow.project_id and not workflow.team_video_id:
+                return workflow
+    return Workflow(team=team)
@@ -16,13 +16,18 @@
 # along with this program.  If not, see 
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+from collections import defaultdict
+
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 
 from auth.models import CustomUser as User
-from teams.models import TeamVideo, TeamMember, MembershipNarrowing
-from teams.signals import api_teamvideo_new
-from videos.signals import feed_imported
+from subtitles.models import SubtitleLanguage, SubtitleVersion
+from teams.cache import invalidate_member_index
+from teams.models import (TeamVideo, TeamMember, MembershipNarrowing,
+                          TeamLanguageCount, autocreate_tasks_for_new_videos)
+from teams.signals import api_teamvideo_new, video_moved_from_team_to_team
+from videos.signals import feed_imported, language_changed, videos_added
 
 @receiver(feed_imported)
 def on_feed_imported(signal, sender, new_videos, **kwargs):
@@ -34,11 +39,77 @@ def on_feed_imported(signal, sender, new_videos, **kwargs):
 @receiver(post_delete, sender=TeamMember)
 def on_team_member_change(sender, instance, **kwargs):
     User.cache.invalidate_by_pk(instance.user_id)
+    invalidate_member_index(instance.team_id)
 
 @receiver(post_save, sender=MembershipNarrowing)
 @receiver(post_delete, sender=MembershipNarrowing)
 def on_membership_narrowing_change(sender, instance, **kwargs):
     try:
         User.cache.invalidate_by_pk(instance.member.user_id)
+        invalidate_member_index(instance.member.team_id)
     except TeamMember.DoesNotExist:
         pass
+
+def _update_language_counts(video_id, language_codes, team_id=None):
+    if team_id is None:
+        team_ids = (TeamVideo.objects.filter(video=video_id)
+                    .values_list('team_id', flat=True))
+        if not team_ids:
+            return
+        team_id = team_ids[0]
+    TeamLanguageCount.objects.schedule_update(team_id, language_codes)
+
+@receiver(videos_added)
+def on_videos_added(sender, videos, **kwargs):
+    # Video.add_many() creates TeamVideos without sending post_save, so handle
+    # the things that on_team_video_save() and the TeamVideo post_save
+    # handlers in teams.models would do.
+    team_videos = [video.get_team_video() for video in videos]
+    team_videos = [tv for tv in team_videos if tv is not None]
+    if not team_videos:
+        return
+    autocreate_tasks_for_new_videos(team_videos)
+    language_codes = defaultdict(set)
+    for team_video in team_videos:
+        language_codes[team_video.team_id].add(
+            team_video.video.primary_audio_language_code)
+    for team_id, codes in language_codes.items():
+        TeamLanguageCount.objects.schedule_update(team_id, codes)
+
+@receiver(post_save, sender=SubtitleLanguage)
+@receiver(post_delete, sender=SubtitleLanguage)
+def on_subtitle_language_change(sender, instance, **kwargs):
+    _update_language_counts(instance.video_id, [instance.language_code])
+
+@receiver(post_save, sender=SubtitleVersion)
+def on_subtitle_version_save(sender, instance, created, **kwargs):
+    if created:
+        _update_language_counts(instance.video_id, [instance.language_code])
+
+@receiver(language_changed)
+def on_primary_audio_language_changed(sender, old_primary_audio_language_code,
+                                      **kwargs):
+    _update_language_counts(sender.id, [old_primary_audio_language_code,
+                                        sender.primary_audio_language_code])
+
+@receiver(post_save, sender=TeamVideo)
+def on_team_video_save(sender, instance, created, **kwargs):
+    if created:
+        language_codes = set(SubtitleLanguage.objects
+                             .filter(video=instance.video_id)
+                             .values_list('language_code', flat=True))
+        language_codes.add(instance.video.primary_audio_language_code)
+        _update_language_counts(instance.video_id, language_codes,
+                                instance.team_id)
+
+# When videos leave a team, the video and its languages may be getting deleted
+# as well, so we can't tell which rows to update.  Rebuild all of the team's
+# rows instead.
+@receiver(post_delete, sender=TeamVideo)
+def on_team_video_delete(sender, instance, **kwargs):
+    TeamLanguageCount.objects.schedule_update(instance.team_id)
+
+@receiver(video_moved_from_team_to_team)
+def on_team_video_moved(sender, old_team, destination_team, video, **kwargs):
+    TeamLanguageCount.objects.schedule_update(old_team.id)
+    TeamLanguageCount.objects.schedule_update(destination_team.id)
@@ -1,4 +1,8 @@
+import pickle
+
+from django.conf import settings
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from auth.models import CustomUser as User
 from utils.graphing import plot
@@ -7,6 +11,33 @@ from utils.translation import get_language_label
 from datetime import datetime
 from django.utils.timezone import utc
 
+STATS_TYPES = ('videosstats', 'teamstats')
+
+def statistics_cache_key(team, stats_type):
+    return 'stats-' + team.slug + '-' + stats_type
+
+def get_statistics(team, stats_type):
+    """Get the statistics for a team, using the cached value if present."""
+    cache_key = statistics_cache_key(team, stats_type)
+    cached_statistics = cache.get(cache_key)
+    if cached_statistics:
+        return pickle.loads(cached_statistics)
+    return update_statistics_cache(team, stats_type)
+
+def update_statistics_cache(team, stats_type):
+    """Compute the statistics for a team and store them in the cache."""
+    statistics = compute_statistics(team, stats_type)
+    cache.set(statistics_cache_key(team, stats_type), pickle.dumps(statistics),
+              settings.TEAM_STATS_CACHE_TIMEOUT)
+    return statistics
+
+def language_stats_graph_data(language_stats):
+    """Convert the output of Team.get_team_language_stats() for plot()"""
+    return [
+        (get_language_label(lc), total, "Published: %s, total edits:" % complete)
+        for lc, complete, total in language_stats
+    ]
+
 def compute_statistics(team, stats_type):
     """computes a bunch of statistics for the team, either at
     the video or member levels.
@@ -22,98 +53,63 @@ def compute_statistics(team, stats_type):
     summary_additional_recent = ''
     summary_table = ''
     if stats_type == 'videosstats':
-        (complete_languages, incomplete_languages) = team.get_team_languages()
-        languages = complete_languages + incomplete_languages
-        unique_languages = set(languages)
-        total = 0
-        numbers = []
         y_title = "Number of edited subtitles"
-        for l in unique_languages:
-            count_complete = complete_languages.count(l)
-            count_incomplete = incomplete_languages.count(l)
-            numbers.append((get_language_label(l), count_complete + count_incomplete, "Published: %s, total edits:" % count_complete))
-            total += count_complete + count_incomplete
+        language_stats = team.get_team_language_stats()
+        numbers = language_stats_graph_data(language_stats)
+        total = sum(count for lc, complete, count in language_stats)
         summary = 'Top languages (all time)'
         title = ""
         graph = plot(numbers, title=title, graph_type='HorizontalBar', labels=True, max_entries=20, y_title=y_title)
 
-        (complete_languages_recent, incomplete_languages_recent, new_languages) = team.get_team_languages(since=30)
-        languages_recent = complete_languages_recent + incomplete_languages_recent
-        unique_languages_recent = set(languages_recent)
+        language_stats_recent = team.get_team_language_stats(since=30)
+        numbers_recent = language_stats_graph_data(language_stats_recent)
+        total_recent = sum(count for lc, complete, count
+                           in language_stats_recent)
         summary_recent = "Top languages (past 30 days)"
-        numbers_recent = []
-        total_recent = 0
-        for l in unique_languages_recent:
-            count_complete_recent = complete_languages_recent.count(l)
-            count_incomplete_recent = incomplete_languages_recent.count(l)
-            numbers_recent.append((get_language_label(l), count_complete_recent + count_incomplete_recent, "Published: %s, total edits:" % count_complete_recent))
-            total_recent += count_complete_recent + count_incomplete_recent
         title_recent = ""
         graph_recent = plot(numbers_recent, title=title_recent, graph_type='HorizontalBar', labels=True, max_entries=20, y_title=y_title)
 
         summary_table = []
         summary_table.append([TableCell("", header=True), TableCell("all time", header=True), TableCell("past 30 days", header=True)])
         summary_table.append([TableCell("videos added", header=True), TableCell(str(team.videos_count)), TableCell(str(team.videos_count_since(30)))])
-        summary_table.append([TableCell("languages edited", header=True), TableCell(str(len(unique_languages))), TableCell(str(len(unique_languages_recent)))])
+        summary_table.append([TableCell("languages edited", header=True), TableCell(str(len(language_stats))), TableCell(str(len(language_stats_recent)))])
         summary_table.append([TableCell("subtitles edited", header=True), TableCell(str(total)), TableCell(str(total_recent))])
 
     elif stats_type == 'teamstats':
-        languages = list(team.languages())
-        unique_languages = set(languages)
+        language_counts = team.get_member_language_counts()
         summary = u'Members by language (all time)'
-        numbers = []
-        for l in unique_languages:
-            numbers.append((get_language_label(l), languages.count(l),
-                            get_language_label(l)))
+        numbers = [
+            (get_language_label(l), count, get_language_label(l))
+            for l, count in language_counts
+        ]
         title = ''
         graph = plot(numbers, graph_type='HorizontalBar', title=title, max_entries=25, labels=True, total_label="Members: ")
-        languages_recent = list(team.languages(members_joined_since=30))
-        unique_languages_recent = set(languages_recent)
+        language_counts_recent = team.get_member_language_counts(
+            members_joined_since=30)
         summary_recent = u'New members by language (past 30 days)'
-        numbers_recent = []
-        for l in unique_languages_recent:
-            numbers_recent.append(
-                (get_language_label(l),
-                 languages_recent.count(l),
-                 get_language_label(l),
-                 "%s://%s%s" % (DEFAULT_PROTOCOL, Site.objects.get_current().domain, reverse('teams:members', args=[], kwargs={'slug': team.slug}) + "?sort=-joined&lang=%s" % l))
-                )
+        members_url = "%s://%s%s" % (
+            DEFAULT_PROTOCOL, Site.objects.get_current().domain,
+            reverse('teams:members', args=[], kwargs={'slug': team.slug}))
+        numbers_recent = [
+            (get_language_label(l), count, get_language_label(l),
+             members_url + "?sort=-joined&lang=%s" % l)
+            for l, count in language_counts_recent
+        ]
         title_recent = ''
         graph_recent = plot(numbers_recent, graph_type='HorizontalBar', title=title_recent, max_entries=25, labels=True, xlinks=True, total_label="Members: ")
 
         summary_table = []
         summary_table.append([TableCell("", header=True), TableCell("all time", header=True), TableCell("past 30 days", header=True)])
         summary_table.append([TableCell("members joined", header=True), TableCell(str(team.members_count)), TableCell(str(team.members_count_since(30)))])
-        summary_table.append([TableCell("member languages", header=True), TableCell(str(len(unique_languages))), TableCell(str(len(unique_languages_recent)))])
-
-        active_users = {}
-        for sv in team.active_users():
-            if sv[0] in active_users:
-                active_users[sv[0]].add(sv[1])
-            else:
-                active_users[sv[0]] = set([sv[1]])
-
-        most_active_users = active_users.items()
-        most_active_users.sort(reverse=True, key=lambda x: len(x[1]))
-        if len(most_active_users) > 20:
-            most_active_users = most_active_users[:20]
-
-        active_users_recent = {}
-        for sv in team.active_users(since=30):
-            if sv[0] in active_users_recent:
-                active_users_recent[sv[0]].add(sv[1])
-            else:
-                active_users_recent[sv[0]] = set([sv[1]])
-
-        most_active_users_recent = active_users_recent.items()
-        most_active_users_recent.sort(reverse=True, key=lambda x: len(x[1]))
-        if len(most_active_users_recent) > 20:
-            most_active_users_recent = most_active_users_recent[:20]
+        summary_table.append([TableCell("member languages", header=True), TableCell(str(len(language_counts))), TableCell(str(len(language_counts_recent)))])
+
+        most_active_users = team.get_top_contributors()
+        most_active_users_recent = team.get_top_contributors(since=30)
 
         def displayable_user(user, users_details):
             user_details = users_details[user[0]]
             return ("%s %s (%s)" % (user_details[1], user_details[2], user_details[3]),
-                    len(user[1]),
+                    user[1],
                     "%s %s (%s)" % (user_details[1], user_details[2], user_details[3]),
                     "%s://%s%s" % (DEFAULT_PROTOCOL, Site.objects.get_current().domain, reverse("profiles:profile", kwargs={'user_id': str(user[0])}))
             )
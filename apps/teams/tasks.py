@@ -32,6 +32,12 @@ def invalidate_video_caches(team_id):
     for video_id in team.teamvideo_set.values_list('video__video_id', flat=True):
         invalidate_video_cache(video_id)
 
+@task()
+def update_team_language_counts(team_id):
+    """Run the TeamLanguageCount update scheduled for a team."""
+    from teams.models import TeamLanguageCount
+    TeamLanguageCount.objects.run_scheduled_update(team_id)
+
 @task()
 def invalidate_video_moderation_caches(team):
     """Invalidate the moderation status caches for all the given team's videos."""
@@ -171,6 +177,25 @@ def process_billing_report(billing_report_pk):
     report = BillingReport.objects.get(pk=billing_report_pk)
     report.process()
 
+@task()
+def precompute_team_statistics():
+    """Re-compute the statistics tabs for teams with lots of videos
+
+    This keeps the statistics cache warm for the teams where computing them
+    is the most expensive.
+    """
+    from django.db.models import Count
+    from teams.models import Team, TeamVideo
+    from teams.statistics import STATS_TYPES, update_statistics_cache
+    team_ids = [
+        team_id for team_id, count in
+        TeamVideo.objects.values_list('team').annotate(Count('id')).order_by()
+        if count >= settings.TEAM_STATS_PRECOMPUTE_MIN_VIDEOS
+    ]
+    for team in Team.objects.filter(id__in=team_ids):
+        for stats_type in STATS_TYPES:
+            update_statistics_cache(team, stats_type)
+
 @task()
 def add_team_videos(team_pk, user_pk, videos):
     from .permissions import can_add_videos_bulk
@@ -185,49 +210,85 @@ def add_team_videos(team_pk, user_pk, videos):
     num_successful_videos = 0
     messages = []
     if can_add_videos_bulk(user):
-        for video_item in videos:
+        projects = {}
+        # Messages for each video item, so that we can output them in order
+        item_messages = [[] for video_item in videos]
+        item_for_url = {}
+
+        def get_project(video_item):
+            if not video_item.get('project'):
+                return team.default_project
+            slug = pan_slugify(video_item['project'])
+            if slug not in projects:
+                projects[slug], created = Project.objects.get_or_create(
+                    team=team, slug=slug,
+                    defaults={'name': video_item['project']})
+            return projects[slug]
+
+        def setup_video_fields(video, video_url, video_item, messages):
+            video.is_public = team.is_visible
+            if video_item.get('title'):
+                video.title = video_item['title']
+            if video_item.get('description'):
+                video.description = video_item['description']
+            if video_item.get('language'):
+                language = video_item['language'].lower()
+                if language in LANGUAGE_CHOICES:
+                    video.primary_audio_language_code = language
+                else:
+                    messages.append(fmt(_(u"Badly formated language for %(url)s: %(language)s, ignoring it."), url=video_url, language=video_item['language']))
+            if video_item.get('duration') and not video.duration:
+                try:
+                    video.duration = int(video_item['duration'])
+                except:
+                    messages.append(fmt(_(u"Badly formated duration for %(url)s: %(duration)s, ignoring it."), url=video_url, duration=video_item['duration']))
+
+        def setup_video(video, video_url, team_video):
+            index = item_for_url[video_url.url]
+            setup_video_fields(video, video_url.url, videos[index],
+                               item_messages[index])
+            team_video.project = get_project(videos[index])
+
+        video_types = []
+        item_urls = []
+        for index, video_item in enumerate(videos):
             video_url = video_item['url']
             try:
                 video_type = video_type_registrar.video_type_for_url(video_url)
                 video_url = video_type.convert_to_video_url()
             except:
-                messages.append(fmt(_(u"Unknown video type: %(url)s\n"), url=video_url))
+                item_messages[index].append(fmt(_(u"Unknown video type: %(url)s\n"), url=video_url))
+                item_urls.append(None)
                 continue
-
-            def setup_video(video, video_url):
-                video.is_public = team.is_visible
-                if video_item.get('title'):
-                    video.title = video_item['title']
-                if video_item.get('description'):
-                    video.description = video_item['description']
-                if video_item.get('language'):
-                    language = video_item['language'].lower()
-                    if language in LANGUAGE_CHOICES:
-                        video.primary_audio_language_code = language
-                    else:
-                        messages.append(fmt(_(u"Badly formated language for %(url)s: %(language)s, ignoring it."), url=video_url, language=video_item['language']))
-                if video_item.get('duration') and not video.duration:
-                    try:
-                        video.duration = int(video_item['duration'])
-                    except:
-                        messages.append(fmt(_(u"Badly formated duration for %(url)s: %(duration)s, ignoring it."), url=video_url, duration=video_item['duration']))
-                if video_item.get('project'):
-                    project, created = Project.objects.get_or_create(team=team, slug=pan_slugify(video_item['project']), defaults={'name': video_item['project']})
-                else:
-                    project = team.default_project
-                team_video = TeamVideo.objects.create(video=video, team=team,
-                                                      project=project, added_by=user)
-
-            try:
-                video, video_url = Video.add(video_type, user, setup_video)
-            except Video.UrlAlreadyAdded, e:
-                if e.video.get_team_video() is not None:
-                    messages.append(fmt(_(u"Video is already part of a team: %(url)s\n"), url=video_url))
+            video_types.append(video_type)
+            item_urls.append(video_url)
+            item_for_url.setdefault(video_url, index)
+
+        added, existing = Video.add_many(video_types, user, setup_video,
+                                         team=team)
+        added_videos = dict((video_url.url, video)
+                            for video, video_url in added)
+        existing_video_urls = dict((video_url.url, video_url)
+                                   for video_url in existing)
+
+        for index, video_item in enumerate(videos):
+            video_url = item_urls[index]
+            if video_url is None:
+                continue
+            if (video_url in added_videos and
+                    item_for_url[video_url] == index):
+                video = added_videos[video_url]
+            else:
+                video = existing_video_urls[video_url].video
+                if video.get_team_video() is not None:
+                    item_messages[index].append(fmt(_(u"Video is already part of a team: %(url)s\n"), url=video_url))
                     continue
-                else:
-                    setup_video(e.video, e.video_url)
-                    e.video.save()
-                    video = e.video
+                setup_video_fields(video, video_url, video_item,
+                                   item_messages[index])
+                TeamVideo.objects.create(video=video, team=team,
+                                         project=get_project(video_item),
+                                         added_by=user)
+                video.save()
 
             if 'transcript' in video_item and len(video_item['transcript']) > 0 and video.primary_audio_language_code:
                 try:
@@ -240,8 +301,10 @@ def add_team_videos(team_pk, user_pk, videos):
                         raise Exception("Request not successful")
                 except Exception, e:
                     logger.error("Error while importing transcript file: {}".format(str(e)))
-                    messages.append(fmt(_(u"Invalid transcript file or language code for video %(url)s\n"), url=video_url))
+                    item_messages[index].append(fmt(_(u"Invalid transcript file or language code for video %(url)s\n"), url=video_url))
             num_successful_videos += 1
+        for messages_for_item in item_messages:
+            messages.extend(messages_for_item)
     else:
         messages.append(fmt(_(u'You are not authorized to perform such action\n')))
     messages.append(fmt(_(u"Number of videos added to team: %(num)i\n"), num=num_successful_videos))
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import itertools
 
 from django.test import TestCase
+import mock
 
 from teams.models import BillingRecord, BillingReport, Task
 from subtitles.pipeline import add_subtitles
@@ -165,6 +166,39 @@ class BillingRecordTest(TestCase):
         self.assertEquals(data[video.video_id, 'en']['Minutes'], 0)
         self.assertEquals(data[video.video_id, 'de']['Minutes'], 0)
 
+    def test_paging(self):
+        # Test a report that spans several pages of BillingRecords, with the
+        # records for a video split between pages
+        date_maker = DateMaker()
+        user = TeamMemberFactory(team=self.team).user
+        videos = []
+        for i in range(3):
+            video = VideoFactory(primary_audio_language_code='en')
+            TeamVideoFactory(team=self.team, video=video, added_by=user)
+            add_subtitles(video, 'en', make_subtitle_lines(4),
+                          created=date_maker.next_date(), complete=True)
+            for language_code in ['fr', 'de', 'es']:
+                self.add_subtitles(video, language_code,
+                                   make_subtitle_lines(4),
+                                   created=date_maker.next_date(),
+                                   complete=True)
+            videos.append(video)
+
+        with mock.patch('teams.models.BillingReportGenerator.PAGE_SIZE', 2):
+            data = self.get_report_data(self.team,
+                                        date_maker.start_date(),
+                                        date_maker.end_date())
+        self.assertEquals(len(data), 12)
+        for video in videos:
+            self.assertEquals(data[video.video_id, 'en']['Language number'],
+                              0)
+            self.assertEquals(data[video.video_id, 'fr']['Language number'],
+                              1)
+            self.assertEquals(data[video.video_id, 'de']['Language number'],
+                              2)
+            self.assertEquals(data[video.video_id, 'es']['Language number'],
+                              3)
+
     def test_minutes(self):
         date_maker = DateMaker()
         user = TeamMemberFactory(team=self.team).user
@@ -194,9 +228,9 @@ class ProcessReportTest(TestCase):
             type=BillingReport.TYPE_APPROVAL)
         self.report.teams.add(self.team)
 
-    @test_utils.patch_for_test("teams.models.BillingReport.generate_rows")
-    def test_success(self, mock_generate_rows):
-        mock_generate_rows.return_value = [
+    @test_utils.patch_for_test("teams.models.BillingReport.iter_rows")
+    def test_success(self, mock_iter_rows):
+        mock_iter_rows.return_value = [
             ('Foo', 'Bar'),
             ('foo value', 'bar value'),
         ]
@@ -204,9 +238,9 @@ class ProcessReportTest(TestCase):
         self.assertNotEquals(self.report.processed, None)
         self.assertNotEquals(self.report.csv_file, None)
 
-    @test_utils.patch_for_test("teams.models.BillingReport.generate_rows")
-    def test_error(self, mock_generate_rows):
-        mock_generate_rows.side_effect = ValueError()
+    @test_utils.patch_for_test("teams.models.BillingReport.iter_rows")
+    def test_error(self, mock_iter_rows):
+        mock_iter_rows.side_effect = ValueError()
         self.report.process()
         self.assertNotEquals(self.report.processed, None)
         self.assertEquals(self.report.csv_file, None)
@@ -376,6 +410,15 @@ class ApprovalTest(ApprovalTestBase):
         self.check_language_columns(report_data)
         self.check_minutes(report_data)
 
+    def test_paging(self):
+        with mock.patch.object(BillingReport, 'APPROVAL_PAGE_SIZE', 2):
+            report_data = self.get_report_data(self.date_maker.start_date(),
+                                               self.date_maker.end_date())
+        self.check_report_rows(report_data)
+        self.check_approver(report_data)
+        self.check_language_columns(report_data)
+        self.check_minutes(report_data)
+
 class ApprovalForUsersTest(ApprovalTestBase):
     def get_report_data(self, start_date, end_date):
         """Get report data in an easy to test way.
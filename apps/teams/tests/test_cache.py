@@ -19,10 +19,14 @@
 from __future__ import absolute_import
 
 from django.test import TestCase
+from nose.tools import *
+import mock
 
 from caching.tests.utils import assert_invalidates_model_cache
-from teams.models import MembershipNarrowing
+from teams import cache as team_cache
+from teams.models import MembershipNarrowing, TeamMember
 from utils.factories import *
+from utils.test_utils import reload_obj
 
 class TeamCacheInvalidationTest(TestCase):
     def setUp(self):
@@ -50,3 +54,87 @@ class TeamCacheInvalidationTest(TestCase):
             narrowing.save()
         with assert_invalidates_model_cache(self.team):
             narrowing.delete()
+
+class MemberIndexTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.admin = TeamMemberFactory(team=self.team,
+                                       role=TeamMember.ROLE_ADMIN)
+        self.contributor = TeamMemberFactory(
+            team=self.team, role=TeamMember.ROLE_CONTRIBUTOR)
+        self.narrowed = TeamMemberFactory(team=self.team,
+                                          role=TeamMember.ROLE_MANAGER)
+        self.project = ProjectFactory(team=self.team)
+        MembershipNarrowing.objects.create(member=self.narrowed,
+                                           project=self.project)
+        MembershipNarrowing.objects.create(member=self.narrowed,
+                                           language='fr')
+        self.outsider = UserFactory()
+
+    def test_lookups(self):
+        index = self.team.get_member_index()
+        assert_equal(index.get_role(self.admin.user_id),
+                     TeamMember.ROLE_ADMIN)
+        assert_equal(index.get_role(self.contributor.user_id),
+                     TeamMember.ROLE_CONTRIBUTOR)
+        assert_equal(index.get_role(self.outsider.id), None)
+        assert_true(index.is_member(self.narrowed.user_id))
+        assert_false(index.is_member(self.outsider.id))
+        assert_false(index.is_member(None))
+        assert_true(index.has_narrowings(self.narrowed.user_id))
+        assert_false(index.has_narrowings(self.admin.user_id))
+        assert_equal(index.get_narrowings(self.narrowed.user_id),
+                     ((self.project.id,), ('fr',)))
+        assert_equal(index.get_narrowings(self.admin.user_id), ((), ()))
+
+    def test_checks_dont_use_the_db(self):
+        self.team.get_member_index()
+        team = reload_obj(self.team)
+        with self.assertNumQueries(0):
+            assert_true(team.is_admin(self.admin.user))
+            assert_true(team.is_member(self.contributor.user))
+            assert_false(team.is_member(self.outsider))
+            assert_true(team.user_is_member(self.narrowed.user))
+            assert_equal(team.get_member(self.outsider), None)
+
+    def test_rebuilt_on_changes(self):
+        assert_false(self.team.is_member(self.outsider))
+        member = TeamMemberFactory(team=self.team, user=self.outsider,
+                                   role=TeamMember.ROLE_CONTRIBUTOR)
+        assert_true(reload_obj(self.team).is_contributor(self.outsider))
+        member.role = TeamMember.ROLE_MANAGER
+        member.save()
+        assert_true(reload_obj(self.team).is_manager(self.outsider))
+        # bulk deletes should also rebuild the index
+        self.team.members.filter(user=self.outsider).delete()
+        assert_false(reload_obj(self.team).is_member(self.outsider))
+        self.narrowed.narrowings.all().delete()
+        index = reload_obj(self.team).get_member_index()
+        assert_false(index.has_narrowings(self.narrowed.user_id))
+
+    def test_uncache_loaded_team(self):
+        assert_false(self.team.is_member(self.outsider))
+        TeamMemberFactory(team=self.team, user=self.outsider)
+        assert_true(self.team.is_member(self.outsider))
+
+    def test_save_doesnt_load_foreign_keys(self):
+        # Membership changes shouldn't fetch the team or user just to clear
+        # their caches
+        member = TeamMember.objects.get(id=self.contributor.id)
+        member.save()
+        narrowing = MembershipNarrowing.objects.get(member=self.narrowed,
+                                                    language='fr')
+        narrowing.save()
+        for obj in (member, narrowing.member):
+            assert_false(hasattr(obj, '_team_cache'))
+            assert_false(hasattr(obj, '_user_cache'))
+
+    def test_short_timeout(self):
+        # The index can be rebuilt before a membership change commits, so it
+        # shouldn't stay in the cache for long
+        with mock.patch('teams.cache.cache') as mock_cache:
+            mock_cache.get.return_value = None
+            self.team.get_member_index()
+        assert_equal(mock_cache.set.call_args[0][2],
+                     team_cache.MEMBER_INDEX_TIMEOUT)
+        assert_true(team_cache.MEMBER_INDEX_TIMEOUT < team_cache.TIMEOUT)
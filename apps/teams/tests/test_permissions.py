@@ -38,7 +38,8 @@ from teams.permissions import (
     can_create_task_translate, can_join_team, can_edit_video, can_approve,
     roles_user_can_invite, can_add_video_somewhere, can_assign_tasks,
     can_create_and_edit_translations, save_role, can_remove_video,
-    can_delete_team, can_delete_video, can_post_edit_subtitles
+    can_delete_team, can_delete_video, can_post_edit_subtitles,
+    can_perform_task, can_assign_task, PermissionContext
 )
 
 
@@ -1175,3 +1176,82 @@ class TestViews(BaseTestPermission):
         save_role(self.team, member, role, [], [], owner.user)
         self.team.uncache_member(member.user)
         self.assertEquals(self.team.get_member(member.user).role, role)
+
+class PermissionContextTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory(workflow_enabled=True,
+                                subtitle_policy=Team.SUBTITLE_IDS['Any team member'])
+        WorkflowFactory(team=self.team, review_allowed=10, approve_allowed=0)
+        self.subtitler = UserFactory()
+        self.member = UserFactory()
+        self.outsider = UserFactory()
+        TeamMemberFactory(team=self.team, user=self.subtitler,
+                          role=TeamMember.ROLE_CONTRIBUTOR)
+        TeamMemberFactory(team=self.team, user=self.member,
+                          role=TeamMember.ROLE_CONTRIBUTOR)
+        for i in range(4):
+            team_video = TeamVideoFactory(team=self.team)
+            TaskFactory(team=self.team, team_video=team_video, language='en')
+            TaskFactory.create_review(team_video, 'fr', self.subtitler)
+
+    def get_tasks(self, limit=None):
+        tasks = (Task.objects.filter(team=self.team, completed=None)
+                 .order_by('id')
+                 .select_related('team', 'team_video__team',
+                                 'team_video__project', 'team_video__video'))
+        return list(tasks[:limit])
+
+    def test_check_perform_tasks(self):
+        for user in (self.subtitler, self.member, self.outsider):
+            tasks = self.get_tasks()
+            self.assertEqual(
+                PermissionContext(user).check_perform_tasks(tasks),
+                [bool(can_perform_task(user, task))
+                 for task in self.get_tasks()])
+
+    def test_check_assign_tasks(self):
+        for user in (self.subtitler, self.member, self.outsider):
+            tasks = self.get_tasks()
+            self.assertEqual(
+                PermissionContext(user).check_assign_tasks(tasks),
+                [bool(can_assign_task(task, user))
+                 for task in self.get_tasks()])
+
+    def test_query_count_doesnt_grow_with_tasks(self):
+        # fetch the MemberIndex for the team, which gets stored in the cache
+        self.team.get_member_index()
+        # 1 query for the TeamMember, 1 for the workflows and 2 for the
+        # versions that can_review() checks
+        for limit in (2, None):
+            tasks = self.get_tasks(limit)
+            with self.assertNumQueries(4):
+                PermissionContext(self.member).check_perform_tasks(tasks)
+
+    def test_cached_for_the_request(self):
+        context = PermissionContext(self.member)
+        context.check_perform_tasks(self.get_tasks())
+        tasks = self.get_tasks()
+        # Everything needed for the new Task/Team instances is already loaded
+        # except the subtitle versions, which are stored on the TeamVideos
+        with self.assertNumQueries(2):
+            context.check_perform_tasks(tasks)
+
+    def test_get_member(self):
+        self.team.get_member_index()
+        context = PermissionContext(self.member)
+        with self.assertNumQueries(1):
+            member = context.get_member(self.team)
+        self.assertEqual(member.user, self.member)
+        # The member is shared with other instances of the team
+        other_team = Team.objects.get(id=self.team.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(context.get_member(other_team), member)
+            self.assertEqual(other_team.get_member(self.member), member)
+
+    def test_get_member_for_outsider(self):
+        self.team.get_member_index()
+        # The MemberIndex tells us the user isn't a member, so we can skip the
+        # TeamMember query
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                PermissionContext(self.outsider).get_member(self.team), None)
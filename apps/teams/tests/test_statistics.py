@@ -0,0 +1,204 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+
+from django.core.management import call_command
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from teams import statistics
+from teams import tasks
+from teams.models import TeamLanguageCount
+from utils.factories import *
+from utils.test_utils import patch_for_test
+
+class TeamStatisticsQueryTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.user1 = UserFactory(team=self.team, languages=['en', 'fr'])
+        self.user2 = UserFactory(team=self.team, languages=['en'])
+        self.video1 = VideoFactory(team=self.team)
+        self.video2 = VideoFactory(team=self.team)
+        # videos outside the team shouldn't be counted
+        make_version(VideoFactory(), 'en', author=self.user1)
+
+    def test_team_language_stats(self):
+        make_version(self.video1, 'en', author=self.user1)
+        make_version(self.video2, 'en', author=self.user1)
+        make_version(self.video1, 'fr', author=self.user1,
+                     subtitles_complete=False)
+        assert_items_equal(self.team.get_team_language_stats(), [
+            ('en', 2, 2),
+            ('fr', 0, 1),
+        ])
+        assert_items_equal(self.team.get_team_language_stats(since=30), [
+            ('en', 2, 2),
+            ('fr', 0, 1),
+        ])
+
+    def test_member_language_counts(self):
+        assert_items_equal(self.team.get_member_language_counts(), [
+            ('en', 2),
+            ('fr', 1),
+        ])
+
+    def test_top_contributors(self):
+        make_version(self.video1, 'en', author=self.user1)
+        make_version(self.video1, 'en', author=self.user1)
+        make_version(self.video1, 'fr', author=self.user1)
+        make_version(self.video2, 'de', author=self.user2)
+        assert_equal(self.team.get_top_contributors(), [
+            (self.user1.id, 2),
+            (self.user2.id, 1),
+        ])
+        assert_equal(self.team.get_top_contributors(limit=1), [
+            (self.user1.id, 2),
+        ])
+
+class TeamLanguageCountTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.video1 = VideoFactory(team=self.team,
+                                   primary_audio_language_code='en')
+        self.video2 = VideoFactory(team=self.team,
+                                   primary_audio_language_code='en')
+        self.video3 = VideoFactory(team=self.team,
+                                   primary_audio_language_code='fr')
+        make_version(self.video1, 'en')
+        make_version(self.video1, 'fr', subtitles_complete=False)
+        make_version(self.video2, 'en')
+
+    def check_counts(self, video_counts, completed_counts):
+        assert_items_equal(self.team.get_video_language_counts(),
+                           video_counts)
+        assert_items_equal(self.team.get_completed_language_counts(),
+                           completed_counts)
+
+    def test_counts(self):
+        self.check_counts([('en', 2), ('fr', 1)], [('en', 2), ('fr', 0)])
+
+    def test_subtitles_change(self):
+        make_version(self.video3, 'fr')
+        make_version(self.video3, 'de', subtitles_complete=False)
+        self.check_counts([('en', 2), ('fr', 1)],
+                          [('en', 2), ('fr', 1), ('de', 0)])
+
+    def test_primary_audio_language_change(self):
+        self.video2.primary_audio_language_code = 'fr'
+        self.video2.save()
+        self.check_counts([('en', 1), ('fr', 2)], [('en', 2), ('fr', 0)])
+
+    def test_video_leaves_team(self):
+        self.video1.get_team_video().remove(UserFactory())
+        self.check_counts([('en', 1), ('fr', 1)], [('en', 1)])
+
+    def test_video_moves_team(self):
+        other_team = TeamFactory()
+        self.video1.get_team_video().move_to(other_team)
+        self.check_counts([('en', 1), ('fr', 1)], [('en', 1)])
+        assert_items_equal(other_team.get_video_language_counts(),
+                           [('en', 1)])
+        assert_items_equal(other_team.get_completed_language_counts(),
+                           [('en', 1), ('fr', 0)])
+
+    def test_last_edit(self):
+        version = make_version(self.video2, 'en')
+        counts = TeamLanguageCount.objects.get(team=self.team,
+                                               language_code='en')
+        assert_equal(counts.last_edit, version.created)
+        assert_equal(counts.incomplete_count, 0)
+
+    def test_rebuild_command(self):
+        TeamLanguageCount.objects.all().delete()
+        TeamLanguageCount.objects.create(team=self.team, language_code='de',
+                                         video_count=5)
+        call_command('rebuild_team_language_counts')
+        self.check_counts([('en', 2), ('fr', 1)], [('en', 2), ('fr', 0)])
+
+    @patch_for_test('teams.models.TeamLanguageCountManager.update_counts')
+    def test_schedule_update(self, mock_update_counts):
+        # Use apply_async as a mock to stop the task from running right away
+        with mock.patch('teams.tasks.update_team_language_counts.apply_async')\
+                as mock_apply_async:
+            TeamLanguageCount.objects.schedule_update(self.team.id, ['en'])
+            TeamLanguageCount.objects.schedule_update(self.team.id,
+                                                      ['en', 'fr'])
+        # We should only schedule 1 update task for both changes
+        assert_equal(mock_apply_async.call_count, 1)
+        tasks.update_team_language_counts(self.team.id)
+        assert_equal(mock_update_counts.call_args,
+                     mock.call(self.team.id, set(['en', 'fr'])))
+
+    @patch_for_test('teams.models.TeamLanguageCountManager.update_counts')
+    def test_schedule_full_update(self, mock_update_counts):
+        with mock.patch('teams.tasks.update_team_language_counts.apply_async'):
+            TeamLanguageCount.objects.schedule_update(self.team.id, ['en'])
+            TeamLanguageCount.objects.schedule_update(self.team.id)
+        tasks.update_team_language_counts(self.team.id)
+        assert_equal(mock_update_counts.call_args, mock.call(self.team.id))
+
+    def test_concurrent_insert(self):
+        # Simulate another worker inserting the rows between the time we look
+        # up the existing rows and our insert.  We should update the rows
+        # rather than fail.
+        TeamLanguageCount.objects.all().delete()
+        bulk_create = TeamLanguageCount.objects.bulk_create
+        inserted = []
+        def bulk_create_race(rows):
+            if not inserted:
+                inserted.extend(
+                    TeamLanguageCount(team=self.team,
+                                      language_code=row.language_code)
+                    for row in rows)
+                bulk_create(inserted)
+            bulk_create(rows)
+        with mock.patch('teams.models.TeamLanguageCountManager.bulk_create',
+                        side_effect=bulk_create_race):
+            TeamLanguageCount.objects.update_counts(self.team.id)
+        self.check_counts([('en', 2), ('fr', 1)], [('en', 2), ('fr', 0)])
+
+class StatisticsCacheTest(TestCase):
+    @patch_for_test('teams.statistics.compute_statistics')
+    def setUp(self, mock_compute_statistics):
+        self.team = TeamFactory()
+        self.compute_statistics = mock_compute_statistics
+        self.compute_statistics.return_value = {'summary': 'test'}
+
+    def test_cache(self):
+        for i in range(2):
+            assert_equal(
+                statistics.get_statistics(self.team, 'videosstats'),
+                {'summary': 'test'})
+        assert_equal(self.compute_statistics.call_count, 1)
+
+    def test_precompute_task(self):
+        big_team = TeamFactory()
+        TeamVideoFactory(team=big_team)
+        TeamVideoFactory(team=big_team)
+        TeamVideoFactory(team=self.team)
+        with self.settings(TEAM_STATS_PRECOMPUTE_MIN_VIDEOS=2):
+            tasks.precompute_team_statistics.delay()
+        assert_items_equal(self.compute_statistics.call_args_list, [
+            mock.call(big_team, 'videosstats'),
+            mock.call(big_team, 'teamstats'),
+        ])
+        self.compute_statistics.reset_mock()
+        statistics.get_statistics(big_team, 'teamstats')
+        assert_equal(self.compute_statistics.call_count, 0)
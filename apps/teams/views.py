@@ -67,7 +67,8 @@ from teams.permissions import (
     roles_user_can_assign, can_join_team, can_edit_video, can_delete_tasks,
     can_perform_task, can_rename_team, can_change_team_settings,
     can_perform_task_for, can_delete_team, can_delete_video, can_remove_video,
-    can_move_videos, can_view_stats_tab, can_sort_by_primary_language
+    can_move_videos, can_view_stats_tab, can_sort_by_primary_language,
+    PermissionContext
 )
 from teams.signals import api_teamvideo_new
 from teams.tasks import (
@@ -86,7 +87,7 @@ from utils.text import fmt
 from utils.translation import (
     get_language_choices, get_language_choices_as_dicts, languages_with_labels, get_user_languages_from_request
 )
-from utils.chunkediter import chunkediter
+from utils.chunkediter import iter_chunks
 from videos.types import UPDATE_VERSION_ACTION
 from videos import metadata_manager
 from videos.models import VideoUrl, Video, VideoFeed
@@ -595,6 +596,8 @@ def detail(request, slug, project_slug=None, languages=None):
     extra_context['current_videos_count'] = qs.count()
 
     team_video_md_list, pagination_info = paginate(qs, per_page, request.GET.get('page'))
+    team_video_md_list = list(team_video_md_list)
+    _prime_team_video_permissions(request, team, team_video_md_list)
     extra_context.update(pagination_info)
     extra_context['team_video_md_list'] = team_video_md_list
     extra_context['team_workflows'] = list(
@@ -610,6 +613,20 @@ def detail(request, slug, project_slug=None, languages=None):
 
     return extra_context
 
+def _prime_team_video_permissions(request, team, videos):
+    """Setup the team videos on the detail page for permission checks
+
+    This lets us check permissions for each row without extra queries.
+    """
+    team_videos = [v.get_team_video() for v in videos]
+    team_videos = [tv for tv in team_videos if tv is not None]
+    projects = team.project_set.in_bulk(
+        set(tv.project_id for tv in team_videos))
+    for team_video in team_videos:
+        team_video.team = team
+        team_video.project = projects[team_video.project_id]
+    PermissionContext.for_request(request).prime_team_videos(team_videos)
+
 @render_to('teams/move_videos.html')
 def move_videos(request, slug, project_slug=None, languages=None):
     team = get_team_for_view(slug, request.user)
@@ -1423,6 +1440,19 @@ def _get_task_filters(request):
              'assignee': request.GET.get('assignee'),
              'q': request.GET.get('q'), }
 
+def _iter_performable_tasks(request, tasks, chunk_size):
+    """Iterate through the tasks in a queryset that the user can perform.
+
+    Tasks are fetched and checked chunk_size at a time.
+    """
+    permissions = PermissionContext.for_request(request)
+    for chunk in iter_chunks(tasks, chunk_size):
+        chunk = list(chunk)
+        allowed = permissions.check_perform_tasks(chunk)
+        for task, can_perform in zip(chunk, allowed):
+            if can_perform:
+                yield task
+
 @render_to('teams/dashboard.html')
 def old_dashboard(request, team):
     user = request.user if request.user.is_authenticated() else None
@@ -1471,13 +1501,10 @@ def old_dashboard(request, team):
                                          project, filters,
                                          user))
 
-        tasks = tasks.select_related('team_video', 'team_video__team',
+        tasks = tasks.select_related('team', 'team_video', 'team_video__team',
                                      'team_video__project', 'team_video__video')
 
-        for task in chunkediter(tasks, 100):
-            if not can_perform_task(user, task):
-                continue
-
+        for task in _iter_performable_tasks(request, tasks, 100):
             task_vid = task.team_video
 
             if not task_vid in videos:
@@ -1596,6 +1623,7 @@ def team_tasks(request, slug, project_slug=None):
             'new_subtitle_version__subtitle_language',
             'new_subtitle_version__author'))
     tasks.sort(key=lambda t: task_ids.index(t.pk))
+    PermissionContext.for_request(request).prime_tasks(tasks)
 
     if filters.get('team_video'):
         filters['team_video'] = TeamVideo.objects.get(pk=filters['team_video'])
@@ -22,28 +22,44 @@ from .parser import FeedParser
 
 class VideoImporter(object):
     """Import videos from a feed URL."""
-    def __init__(self, url, user, team):
+    def __init__(self, url, user, team, etag=None, modified=None,
+                 last_link=''):
         """Create a VideoImporter
 
         :param url: feed url
         :param user: User to creates videos for
         :param team: Team to create videos for
+        :param etag: ETag from the last time we fetched the feed
+        :param modified: Last-Modified value from the last time we fetched
+            the feed
+        :param last_link: link of the latest entry the last time we fetched
+            the feed.  We only parse entries newer than this one.
         """
         self.url = url
         self.user = user
         self.team = team
+        self.etag = etag
+        self.modified = modified
         self.checked_entries = 0
-        self.last_link = ''
+        self.last_link = last_link
+        self.not_modified = False
 
     def import_videos(self, import_next=False):
         self._created_videos = []
-        feed_parser = FeedParser(self.url)
+        feed_parser = FeedParser(self.url, self.etag, self.modified)
+        if feed_parser.not_modified:
+            self.not_modified = True
+            del self._created_videos
+            return []
+        self.etag = feed_parser.etag
+        self.modified = feed_parser.modified
+        previous_link = self.last_link
         # the link at the top of the feed should be the latest link
         try:
             self.last_link = feed_parser.feed.entries[0]['link']
         except (IndexError, KeyError):
             pass
-        self._create_videos(feed_parser)
+        self._create_videos(feed_parser, since=previous_link)
         if import_next and 'youtube' in self.url:
             self._import_extra_links_from_youtube(feed_parser)
         rv = self._created_videos
@@ -66,40 +82,27 @@ class VideoImporter(object):
             self._create_videos(feed_parser)
             next_urls = self._next_urls(feed_parser)
 
-    def _create_videos(self, feed_parser):
-        from videos.models import VideoUrl
-
-        items = list(feed_parser.items(ignore_error=True))
+    def _create_videos(self, feed_parser, since=None):
+        from videos.models import Video
 
-        urls = [
-            vt.convert_to_video_url()
-            for vt, info, entry in items
-            if vt is not None
-        ]
-        existing_urls = set(VideoUrl.objects
-                            .filter(url__in=urls)
-                            .values_list('url', flat=True))
+        items = list(feed_parser.items(since=since, ignore_error=True))
+        self.checked_entries += len(items)
 
+        video_types = []
+        info_for_url = {}
         for vt, info, entry in items:
-            if vt and vt.convert_to_video_url() not in existing_urls:
-                self._create_video(vt, info, entry)
-            self.checked_entries += 1
-
-    def _create_video(self, video_type, info, entry):
-        from videos.models import Video
-        from teams.models import TeamVideo
+            if vt is not None:
+                video_types.append(vt)
+                info_for_url.setdefault(vt.convert_to_video_url(), info)
 
-        def setup_video(video, video_url):
-            for name, value in info.items():
+        def setup_video(video, video_url, team_video):
+            for name, value in info_for_url[video_url.url].items():
                 setattr(video, name, value)
-            if self.team:
-                tv = TeamVideo.objects.create(
-                    video=video, team=self.team, added_by=self.user,
-                    description=video.description)
-        try:
-            video, video_url = Video.add(video_type, self.user, setup_video)
-            self._created_videos.append(video)
-        except Video.UrlAlreadyAdded, e:
-            # This shouldn't happen since we filtered out existing items
-            # already, but catch the exception anyways
-            pass
+            if team_video is not None:
+                team_video.description = video.description
+
+        # Create all the videos at once.  URLs that we've already added get
+        # skipped.
+        added, existing = Video.add_many(video_types, self.user, setup_video,
+                                         team=self.team)
+        self._created_videos.extend(video for video, video_url in added)
@@ -41,15 +41,35 @@ class FeedParser(object):
     See videos.tests.TestFeedParser for details.
     """
 
-    def __init__(self, feed_url):
+    def __init__(self, feed_url, etag=None, modified=None):
+        """Create a FeedParser
+
+        If etag or modified is given, we send a conditional GET for the feed.
+        Use not_modified to check if the server said the feed is unchanged.
+        """
         self.feed_url = feed_url
-        self.feed = feedparser.parse(feed_url)
+        self.feed = feedparser.parse(feed_url, etag=etag, modified=modified)
         self.parser = None
 
+    @property
+    def not_modified(self):
+        return self.feed.get('status') == 304
+
+    @property
+    def etag(self):
+        return self.feed.get('etag')
+
+    @property
+    def modified(self):
+        return self.feed.get('modified')
+
     def items(self, reverse=False, until=False, since=False, ignore_error=False):
         """
         Iterator witch parse every entry and return VideoType instance if possible and
         additional info. Iterate entries from the most old to the newest
+
+        If since is given, only entries after the entry with that link get
+        parsed.  If until is given, we stop before the entry with that link.
         """
 
         if reverse:
@@ -58,9 +78,9 @@ class FeedParser(object):
             entries = self.feed['entries'][::-1]
 
         if since or until:
-            links = [entry.link for entry in entries]
+            links = [entry.get('link') for entry in entries]
 
-            since_index = self._get_index(links, since, default=0)
+            since_index = self._get_index(links, since, default=-1)
             last_index = self._get_index(links, until, default=len(links))
 
             entries = entries[since_index+1:last_index]
@@ -0,0 +1,155 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Time the completed language filters for video listings.
+
+Compares the VideoQueryset filters, which use the narrow
+CompletedSubtitleLanguage table, with the old subqueries on the
+SubtitleLanguage table.  Each test counts the matching videos and fetches
+the first page, like the team videos page does.
+
+Use --fixture-size to first add that many synthetic videos with random
+complete and incomplete languages.  Only do this on a throwaway database.
+"""
+
+from optparse import make_option
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from subtitles.models import CompletedSubtitleLanguage, SubtitleLanguage
+from utils import dates
+from videos.models import Video
+
+PAGE_SIZE = 50
+FIXTURE_LANGUAGES = ['en', 'es', 'fr', 'de', 'pt-br', 'ar', 'ja', 'zh-cn',
+                     'ru', 'it']
+FIXTURE_CHUNK_SIZE = 1000
+
+LEGACY_SQL = {
+    'has': """EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
+              WHERE sl.video_id=videos_video.id AND
+              sl.language_code=%s AND sl.subtitles_complete)""",
+    'missing': """NOT EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
+                  WHERE sl.video_id=videos_video.id AND
+                  sl.language_code=%s AND sl.subtitles_complete)""",
+    'any': """EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
+              WHERE sl.video_id=videos_video.id AND
+              sl.subtitles_complete)""",
+    'none': """NOT EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
+               WHERE sl.video_id=videos_video.id AND
+               sl.subtitles_complete)""",
+}
+LEGACY_NUM_COMPLETED_SQL = """(SELECT COUNT(*) FROM subtitles_subtitlelanguage sl
+                              WHERE sl.video_id=videos_video.id AND
+                              sl.subtitles_complete)"""
+
+def random_video_id(rng):
+    return ''.join(rng.choice(string.ascii_letters + string.digits)
+                   for i in xrange(12))
+
+@transaction.commit_on_success
+def create_fixture_chunk(rng, count):
+    now = dates.now()
+    video_ids = [random_video_id(rng) for i in xrange(count)]
+    Video.objects.bulk_create([
+        Video(video_id=video_id, title=u'Benchmark video {}'.format(video_id),
+              created=now)
+        for video_id in video_ids
+    ])
+    languages = []
+    for pk in Video.objects.filter(video_id__in=video_ids).values_list(
+            'id', flat=True):
+        for language_code in rng.sample(FIXTURE_LANGUAGES,
+                                        rng.randint(0, 4)):
+            languages.append(SubtitleLanguage(
+                video_id=pk, language_code=language_code, created=now,
+                subtitles_complete=rng.random() < 0.7))
+    SubtitleLanguage.objects.bulk_create(languages)
+
+def create_fixture(size, seed=0):
+    rng = random.Random(seed)
+    for start in xrange(0, size, FIXTURE_CHUNK_SIZE):
+        create_fixture_chunk(rng, min(FIXTURE_CHUNK_SIZE, size - start))
+    # bulk_create() skips SubtitleLanguage.save(), so fill in the
+    # CompletedSubtitleLanguage rows in one go.
+    with transaction.commit_on_success():
+        CompletedSubtitleLanguage.rebuild()
+
+class Command(BaseCommand):
+    help = u'Benchmark the completed language filters for video listings'
+    args = '[language_code ...]'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--fixture-size', '-f', dest='fixture_size', type='int',
+                    default=0, help='Number of synthetic videos to create'),
+        make_option('--rounds', '-r', dest='rounds', type='int', default=3,
+                    help='Number of times to run each test'),
+    )
+
+    def handle(self, *args, **options):
+        self.rounds = options['rounds']
+        if options['fixture_size']:
+            self.stdout.write('creating {} videos\n'.format(
+                options['fixture_size']))
+            create_fixture(options['fixture_size'])
+        language_codes = args or ['en', 'fr']
+        qs = Video.objects.all()
+
+        for language_code in language_codes:
+            self.compare(
+                'has {}'.format(language_code),
+                qs.extra(where=[LEGACY_SQL['has']], params=[language_code]),
+                qs.has_completed_language(language_code))
+            self.compare(
+                'missing {}'.format(language_code),
+                qs.extra(where=[LEGACY_SQL['missing']],
+                         params=[language_code]),
+                qs.missing_completed_language(language_code))
+        self.compare('any', qs.extra(where=[LEGACY_SQL['any']]),
+                     qs.any_completed_languages())
+        self.compare('none', qs.extra(where=[LEGACY_SQL['none']]),
+                     qs.no_completed_languages())
+        self.compare(
+            'num completed',
+            qs.extra(select={
+                'num_completed_languages': LEGACY_NUM_COMPLETED_SQL}),
+            qs.add_num_completed_languages())
+
+    def compare(self, label, legacy_qs, new_qs):
+        legacy_time, legacy_count = self.time_listing(legacy_qs)
+        new_time, new_count = self.time_listing(new_qs)
+        self.stdout.write(
+            '{}: subtitlelanguage {:.1f}ms, completed table {:.1f}ms'
+            '{}\n'.format(
+                label, legacy_time * 1000, new_time * 1000,
+                '' if legacy_count == new_count else
+                ' (count mismatch: {} != {})'.format(legacy_count,
+                                                     new_count)))
+
+    def time_listing(self, qs):
+        timings = []
+        for i in xrange(self.rounds):
+            start = time.time()
+            count = qs.count()
+            list(qs.order_by('-id')[:PAGE_SIZE])
+            timings.append(time.time() - start)
+        return min(timings), count
@@ -0,0 +1,104 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Time how long it takes to find the video type for a batch of URLs.
+
+Compares VideoTypeRegistrar.find_video_type() with checking every type in
+turn, which is how we used to do it.
+"""
+
+from optparse import make_option
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from videos.types import video_type_registrar
+
+# (weight, template) pairs, roughly matching the mix of URLs we see
+URL_TEMPLATES = [
+    (40, 'http://www.youtube.com/watch?v={id}'),
+    (10, 'https://youtu.be/{id}'),
+    (10, 'http://vimeo.com/{num}'),
+    (5, 'http://www.dailymotion.com/video/{id}_some-title'),
+    (3, 'http://fast.wistia.net/embed/iframe/{id}'),
+    (3, 'http://cdnbakmi.kaltura.com/p/{num}/sp/{num}/serveFlavor/'
+        'entryId/1_{id}/flavorId/1_{id}/name/a.mp4'),
+    (12, 'http://media.example.org/videos/{id}.mp4'),
+    (4, 'http://media.example.org/videos/{id}.webm'),
+    (3, 'http://cdn.example.com/audio/{id}.mp3'),
+    (2, 'http://cdn.example.com/legacy/{id}.flv'),
+    (2, 'http://link.brightcove.com/services/player/bcpid{num}?bctid={num}'),
+    (6, 'http://www.example.com/blog/{id}'),
+]
+
+def make_corpus(count, seed=0):
+    rng = random.Random(seed)
+    templates = []
+    for weight, template in URL_TEMPLATES:
+        templates.extend([template] * weight)
+    def random_id():
+        return ''.join(rng.choice(string.ascii_letters + string.digits)
+                       for i in xrange(11))
+    return [
+        rng.choice(templates).format(id=random_id(),
+                                     num=rng.randint(1000, 9999999))
+        for i in xrange(count)
+    ]
+
+def find_video_type_linear(url):
+    for video_type in video_type_registrar.type_list:
+        if video_type.matches_video_url(url):
+            return video_type
+    return None
+
+class Command(BaseCommand):
+    help = u'Benchmark finding the video type for URLs'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--count', '-c', dest='count', type='int', default=10000,
+                    help='Number of URLs'),
+        make_option('--rounds', '-r', dest='rounds', type='int', default=3,
+                    help='Number of times to run each benchmark'),
+    )
+
+    def handle(self, count, rounds, *args, **kwargs):
+        corpus = make_corpus(count)
+        mismatches = [
+            url for url in corpus
+            if (video_type_registrar.find_video_type(url) !=
+                find_video_type_linear(url))
+        ]
+        for url in mismatches:
+            self.stdout.write('mismatch: {}\n'.format(url))
+        self.time_func('linear scan', find_video_type_linear, corpus,
+                       rounds)
+        self.time_func('indexed', video_type_registrar.find_video_type,
+                       corpus, rounds)
+
+    def time_func(self, label, func, corpus, rounds):
+        timings = []
+        for i in xrange(rounds):
+            start = time.time()
+            for url in corpus:
+                func(url)
+            timings.append(time.time() - start)
+        best = min(timings)
+        self.stdout.write('{}: {:.3f}s for {} URLs ({:.1f} usec/URL)\n'.format(
+            label, best, len(corpus), best * 1000000 / len(corpus)))
@@ -18,6 +18,7 @@
 
 from collections import defaultdict
 from datetime import datetime, date, timedelta
+import hashlib
 import logging
 import json
 import string
@@ -53,7 +54,9 @@ from videos.feed_parser import VideoImporter
 from comments.models import Comment
 from widget import video_cache
 from utils import codes
+from utils.chunkediter import iter_chunks
 from utils import dates
+from utils.debounce import DebouncedUpdate
 from utils import translation
 from utils.amazon import S3EnabledImageField
 from utils.panslugify import pan_slugify
@@ -164,41 +167,41 @@ EXISTS(
         query = u' '.join(u'+"{}"'.format(t) for t in terms)
         return self.filter(index__text__search=query)
 
+    # The completed language methods use the narrow
+    # subtitles_completedsubtitlelanguage table (see
+    # subtitles.models.CompletedSubtitleLanguage).  The unique index on
+    # (video_id, language_code) covers all of these subqueries.
+
     def add_num_completed_languages(self):
         sql = ("""
-               (SELECT COUNT(*) FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.subtitles_complete)""")
+               (SELECT COUNT(*) FROM subtitles_completedsubtitlelanguage cl
+               WHERE cl.video_id=videos_video.id)""")
         return self.extra(select={
             'num_completed_languages': sql
         })
 
     def any_completed_languages(self):
         sql = ("""
-               EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.subtitles_complete)""")
+               EXISTS (SELECT * FROM subtitles_completedsubtitlelanguage cl
+               WHERE cl.video_id=videos_video.id)""")
         return self.extra(where=[sql])
 
     def no_completed_languages(self):
         sql = ("""
-               NOT EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.subtitles_complete)""")
+               NOT EXISTS (SELECT * FROM subtitles_completedsubtitlelanguage cl
+               WHERE cl.video_id=videos_video.id)""")
         return self.extra(where=[sql])
 
     def has_completed_language(self, language_code):
         sql = ("""
-               EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.language_code=%s AND sl.subtitles_complete)""")
+               EXISTS (SELECT * FROM subtitles_completedsubtitlelanguage cl
+               WHERE cl.video_id=videos_video.id AND cl.language_code=%s)""")
         return self.extra(where=[sql], params=[language_code])
 
     def missing_completed_language(self, language_code):
         sql = ("""
-               NOT EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.language_code=%s AND sl.subtitles_complete)""")
+               NOT EXISTS (SELECT * FROM subtitles_completedsubtitlelanguage cl
+               WHERE cl.video_id=videos_video.id AND cl.language_code=%s)""")
         return self.extra(where=[sql], params=[language_code])
 
 class SubtitleLanguageFetcher(object):
@@ -304,6 +307,7 @@ class VideoFieldMonitor(object):
         'title': signals.title_changed,
         'duration': signals.duration_changed,
         'primary_audio_language_code': signals.language_changed,
+        'is_public': signals.public_changed,
     }
 
     def __init__(self, video):
@@ -393,6 +397,9 @@ class Video(models.Model):
 
     objects = VideoManager()
 
+    # Number of videos to insert at once in add_many()
+    BULK_ADD_CHUNK_SIZE = 500
+
     class UrlAlreadyAdded(Exception):
         """
         Video.add() was called with a URL that already exists in amara
@@ -721,6 +728,205 @@ class Video(models.Model):
 
         return (video, video_url)
 
+    @staticmethod
+    def add_many(urls, user, setup_callback=None, team=None):
+        """
+        Add several new Videos at once
+
+        This works like calling add() for each URL, but the Videos, VideoUrls,
+        TeamVideos and search index rows are created with bulk inserts inside
+        a single transaction.  Rather than sending video_added and
+        video_url_added for each video, we send a single videos_added signal
+        for the batch.
+
+        If the bulk insert fails because another process added one of the
+        URLs at the same time, we fall back to calling add() for each URL.
+
+        Args:
+            urls: list of URLs to add (either strings or VideoTypes)
+            user: User adding the videos
+            setup_callback: callback function to do extra setup on each video.
+              It will be passed 3 args: a Video, VideoUrl, and TeamVideo (or
+              None if team is None).  The objects get saved after, so
+              setup_callback() shouldn't save them.
+            team: Team to add the videos to
+
+        Raises:
+            VideoTypeError: One of the video URLs is invalid
+
+        Returns:
+            (added, existing) tuple.  added is a list of (video, video_url)
+            tuples for the videos we created.  existing is a list of
+            VideoUrls for the URLs that were already added, either before the
+            call or earlier in the list.
+        """
+        video_types = []
+        for url in urls:
+            if isinstance(url, basestring):
+                vt = video_type_registrar.video_type_for_url(url)
+                if vt is None:
+                    raise VideoTypeError(url)
+            else:
+                vt = url
+            video_types.append(vt)
+        keys = [(vt.convert_to_video_url(), vt.abbreviation)
+                for vt in video_types]
+        existing_video_urls = {}
+        for chunk in iter_chunks(list(set(url for url, type in keys))):
+            for video_url in (VideoUrl.objects.filter(url__in=chunk)
+                              .select_related('video')):
+                existing_video_urls[video_url.url, video_url.type] = video_url
+
+        new_types = []
+        new_keys = set()
+        for vt, key in zip(video_types, keys):
+            if key not in existing_video_urls and key not in new_keys:
+                new_types.append(vt)
+                new_keys.add(key)
+        try:
+            with transaction.commit_on_success():
+                added, index_texts = Video._bulk_add(new_types, user,
+                                                     setup_callback, team)
+        except IntegrityError:
+            # Most likely another process added some of the same URLs.  Go
+            # through them one at a time, so that we can tell which ones.
+            return Video._add_many_one_by_one(video_types, user,
+                                              setup_callback, team)
+
+        added_video_urls = dict(((video_url.url, video_url.type), video_url)
+                                for video, video_url in added)
+        existing = []
+        seen = set()
+        for key in keys:
+            if key in existing_video_urls:
+                existing.append(existing_video_urls[key])
+            elif key in seen:
+                existing.append(added_video_urls[key])
+            seen.add(key)
+
+        # Run post-creation code.  The videos are brand new, so there are no
+        # cache entries to invalidate.
+        if added:
+            signals.videos_added.send(
+                sender=Video, videos=[video for video, _ in added],
+                video_urls=[video_url for _, video_url in added])
+            # Wait until now to update the search backends, so that they
+            # never see videos from a rolled back transaction.
+            signals.video_index_updated.send(
+                sender=VideoIndex, videos=[video for video, _ in added],
+                texts=index_texts)
+        return added, existing
+
+    @staticmethod
+    def _bulk_add(video_types, user, setup_callback, team):
+        # Low-level bulk insert code for add_many()
+        from teams.models import Team, TeamVideo
+        if team is not None:
+            project = team.default_project
+            moderated_by = team if team.moderates_videos() else None
+
+        added = []
+        index_texts = []
+        for vt in video_types:
+            video = Video(user=user, created=dates.now())
+            create_video_id(Video, video)
+            video.set_values(vt)
+            video_url = VideoUrl(url=vt.convert_to_video_url(),
+                                 type=vt.abbreviation, added_by=user,
+                                 primary=True, original=True,
+                                 videoid=vt.video_id if vt.video_id else '',
+                                 owner_username=vt.owner_username(),
+                                 created=datetime.now())
+            if team is not None:
+                video.moderated_by = moderated_by
+                team_video = TeamVideo(team=team, project=project,
+                                       added_by=user,
+                                       created=datetime.now())
+            else:
+                team_video = None
+            if setup_callback:
+                setup_callback(video, video_url, team_video)
+            if not video.title:
+                video.title = make_title_from_url(video_url.url)
+            added.append((video, video_url, team_video))
+
+        # bulk_create() doesn't set the primary keys, so look them up after
+        # each insert using a unique column.
+        for chunk in iter_chunks(added, Video.BULK_ADD_CHUNK_SIZE):
+            Video.objects.bulk_create([video for video, _, _ in chunk])
+            video_ids = dict(Video.objects
+                             .filter(video_id__in=[v.video_id
+                                                   for v, _, _ in chunk])
+                             .values_list('video_id', 'id'))
+            for video, video_url, team_video in chunk:
+                video.id = video_ids[video.video_id]
+                video.monitor.on_save(video, True)
+                video_url.video = video
+                video._cached_teamvideo = team_video
+                if team_video is not None:
+                    team_video.video = video
+
+            VideoUrl.objects.bulk_create([vurl for _, vurl, _ in chunk])
+            video_url_ids = dict(
+                ((url, type), id) for url, type, id in VideoUrl.objects
+                .filter(video__in=[video.id for video, _, _ in chunk])
+                .values_list('url', 'type', 'id'))
+            for video, video_url, team_video in chunk:
+                video_url.id = video_url_ids[video_url.url, video_url.type]
+
+            team_videos = [tv for _, _, tv in chunk if tv is not None]
+            if team_videos:
+                TeamVideo.objects.bulk_create(team_videos)
+                team_video_ids = dict(
+                    TeamVideo.objects
+                    .filter(video__in=[tv.video_id for tv in team_videos])
+                    .values_list('video_id', 'id'))
+                for team_video in team_videos:
+                    team_video.id = team_video_ids[team_video.video_id]
+
+            if user and user.notify_by_message:
+                # Video.followers.add() also adds the video to user.videos
+                # (see User.video_followers_change_handler())
+                Video.followers.through.objects.bulk_create([
+                    Video.followers.through(video_id=video.id,
+                                            customuser_id=user.id)
+                    for video, _, _ in chunk
+                ])
+                User.videos.through.objects.bulk_create([
+                    User.videos.through(video_id=video.id,
+                                        customuser_id=user.id)
+                    for video, _, _ in chunk
+                ])
+
+            index_texts.extend(VideoIndex.index_new_videos(
+                [(video, video_url) for video, video_url, _ in chunk]))
+        if team is not None:
+            Team.cache.invalidate_by_pk(team.id)
+        return ([(video, video_url) for video, video_url, _ in added],
+                index_texts)
+
+    @staticmethod
+    def _add_many_one_by_one(video_types, user, setup_callback, team):
+        from teams.models import TeamVideo
+        added = []
+        existing = []
+        for vt in video_types:
+            def setup_video(video, video_url):
+                if team is not None:
+                    team_video = TeamVideo(video=video, team=team,
+                                           added_by=user)
+                else:
+                    team_video = None
+                if setup_callback:
+                    setup_callback(video, video_url, team_video)
+                if team_video is not None:
+                    team_video.save()
+            try:
+                added.append(Video.add(vt, user, setup_video))
+            except Video.UrlAlreadyAdded, e:
+                existing.append(e.video_url)
+        return added, existing
+
     def set_values(self, video_type):
         video_type.set_values(self)
         self.title = self.re_unicode.sub(u'\uFFFD', self.title)
@@ -919,16 +1125,19 @@ class Video(models.Model):
 
     def get_merged_dfxp(self):
         """Get a DFXP file containing subtitles for all languages."""
+        from subtitles.models import fetch_subtitle_sets
         self.prefetch_languages(with_public_tips=True)
 
-        subtitle_sets = []
+        tips = []
         for language in self.all_subtitle_languages():
             tip = language.get_public_tip()
             if tip is not None:
                 if language.is_primary_audio_language():
-                    subtitle_sets.insert(0, tip.get_subtitles())
+                    tips.insert(0, tip)
                 else:
-                    subtitle_sets.append(tip.get_subtitles())
+                    tips.append(tip)
+        subtitle_set_map = fetch_subtitle_sets(tips)
+        subtitle_sets = [subtitle_set_map[tip.id] for tip in tips]
 
         if len(subtitle_sets) > 0:
             return dfxp_merge(subtitle_sets)
@@ -1202,29 +1411,141 @@ models.signals.pre_delete.connect(video_delete_handler, sender=Video)
 models.signals.m2m_changed.connect(User.video_followers_change_handler, sender=Video.followers.through)
 
 class VideoIndex(models.Model):
+    """Search index text for a video
+
+    The text is built from segments: one for the video fields and URLs, and
+    one for each language with a public tip.  The segments are stored in
+    VideoIndexSegment so that when one source changes we can recalculate
+    just that segment.  text_hash lets us skip writing the (potentially
+    huge) text when it hasn't changed.
+    """
     video = models.OneToOneField(Video, primary_key=True, related_name='index')
     text = models.TextField()
+    text_hash = models.CharField(max_length=40, blank=True, default='')
 
     MAX_TEXT_LENGTH = 10 * 1000 * 1000
+    VIDEO_SEGMENT = 'video'
 
     @classmethod
-    def index_video(cls, video):
-        # Run calc_text inside a transaction.  It does a bunch of queries on
-        # the regular InnoDB tables and we want to avoid any issues with
-        # deadlocking.  For example, if we need to wait on a table lock to
-        # update the row in the index table, we don't want to have a bunch of
-        # innodb locks still open.
+    def index_video(cls, video, language_codes=None):
+        """Update the index for a video.
+
+        Args:
+            video: Video to index
+            language_codes: If given, only these languages have changed, and
+                we can reuse the stored segments for the other languages.  If
+                None, we recalculate all segments.
+        """
+        # Run the calculations inside a transaction.  They do a bunch of
+        # queries on the regular InnoDB tables and we want to avoid any issues
+        # with deadlocking.  For example, if we need to wait on a table lock
+        # to update the row in the index table, we don't want to have a bunch
+        # of innodb locks still open.
         with transaction.commit_on_success():
-            text = cls.calc_text(video, max_length=cls.MAX_TEXT_LENGTH)
-        index, created = cls.objects.get_or_create(video=video,
-                                                   defaults={'text': text})
-        if not created:
+            segments = cls._update_segments(video, language_codes)
+        text = cls.join_segments(segments, max_length=cls.MAX_TEXT_LENGTH)
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        try:
+            index = cls.objects.only('text_hash').get(video=video)
+        except cls.DoesNotExist:
+            index = cls.objects.create(video=video, text=text,
+                                       text_hash=text_hash)
+        else:
+            if index.text_hash != text_hash:
+                cls.objects.filter(video=video).update(text=text,
+                                                       text_hash=text_hash)
             index.text = text
-            index.save()
+            index.text_hash = text_hash
+        # Send the signal even if the text is the same, since the video
+        # fields that search backends filter on may have changed.
+        signals.video_index_updated.send(sender=cls, videos=[video],
+                                         texts=[text])
         return index
 
-    @staticmethod
-    def calc_text(video, max_length=None):
+    @classmethod
+    def _update_segments(cls, video, language_codes):
+        stored = dict(VideoIndexSegment.objects
+                      .filter(video=video)
+                      .values_list('key', 'text'))
+        if language_codes is None or cls.VIDEO_SEGMENT not in stored:
+            segments = cls.calc_segments(video)
+        else:
+            segments = dict(stored)
+            for language_code in language_codes:
+                segments.pop(cls.language_segment_key(language_code), None)
+            segments.update(cls.calc_segments(video, language_codes))
+        VideoIndexSegment.save_changes(video, stored, segments)
+        return segments
+
+    @classmethod
+    def language_segment_key(cls, language_code):
+        return u'language-' + language_code
+
+    @classmethod
+    def index_new_videos(cls, videos_and_urls):
+        """Create the index for a batch of newly added videos
+
+        New videos don't have any subtitles, so we only need the video
+        segment and we can calculate it without any queries.
+
+        This doesn't send video_index_updated, since it runs inside
+        add_many()'s transaction.  add_many() sends it after the commit.
+
+        Args:
+            videos_and_urls: list of (video, video_url) tuples
+
+        Returns:
+            list of the index texts for the videos
+        """
+        segments = []
+        indexes = []
+        for video, video_url in videos_and_urls:
+            segment_text = cls._calc_video_segment(video, [video_url])
+            segments.append(VideoIndexSegment(video=video,
+                                              key=cls.VIDEO_SEGMENT,
+                                              text=segment_text))
+            text = cls.join_segments({cls.VIDEO_SEGMENT: segment_text},
+                                     max_length=cls.MAX_TEXT_LENGTH)
+            indexes.append(cls(
+                video=video, text=text,
+                text_hash=hashlib.sha1(text.encode('utf-8')).hexdigest()))
+        VideoIndexSegment.objects.bulk_create(segments)
+        cls.objects.bulk_create(indexes)
+        return [index.text for index in indexes]
+
+    @classmethod
+    def calc_segments(cls, video, language_codes=None):
+        """Calculate index segments for a video
+
+        The video segment is always calculated, since it's cheap and the
+        video title can depend on the language titles.
+
+        Args:
+            video: Video to calculate segments for
+            language_codes: Only calculate segments for these languages.  If
+                None, we calculate segments for all languages.
+
+        Returns:
+            dict mapping segment keys to text
+        """
+        segments = {
+            cls.VIDEO_SEGMENT: cls._calc_video_segment(
+                video, video.get_video_urls()),
+        }
+        tips = video.newsubtitleversion_set.public_tips()
+        if language_codes is not None:
+            tips = tips.filter(language_code__in=language_codes)
+        for tip in tips:
+            segments[cls.language_segment_key(tip.language_code)] = \
+                    cls._join_parts([
+                        tip.title, tip.description,
+                        tip.meta_1_content, tip.meta_2_content,
+                        tip.meta_3_content,
+                    ])
+        return segments
+
+    @classmethod
+    def _calc_video_segment(cls, video, video_urls):
         parts = [
             video.title_display(),
             video.description,
@@ -1232,18 +1553,84 @@ class VideoIndex(models.Model):
             video.meta_2_content,
             video.meta_3_content,
         ]
-        parts.extend(vurl.url for vurl in video.get_video_urls())
-        for tip in video.newsubtitleversion_set.public_tips():
-            parts.extend([
-                tip.title, tip.description,
-                tip.meta_1_content, tip.meta_2_content, tip.meta_3_content,
-            ])
-
-        text = '\n'.join(p for p in parts if p is not None)
+        parts.extend(vurl.url for vurl in video_urls)
+        return cls._join_parts(parts)
+
+    @staticmethod
+    def _join_parts(parts):
+        return u'\n'.join(p for p in parts if p is not None)
+
+    @classmethod
+    def join_segments(cls, segments, max_length=None):
+        # video segment first, then languages in a consistent order
+        keys = sorted(k for k in segments if k != cls.VIDEO_SEGMENT)
+        if cls.VIDEO_SEGMENT in segments:
+            keys.insert(0, cls.VIDEO_SEGMENT)
+        text = u'\n'.join(segments[k] for k in keys)
         if max_length is not None:
             text = text[:max_length]
         return text
 
+    @classmethod
+    def calc_text(cls, video, max_length=None):
+        return cls.join_segments(cls.calc_segments(video), max_length)
+
+    _updates = DebouncedUpdate('video-index', 'VIDEO_INDEX_UPDATE_DELAY')
+
+    @classmethod
+    def schedule_update(cls, video_id, language_code=None):
+        """Schedule an index update for a video
+
+        Updates are debounced: if several updates come in for the same video
+        within VIDEO_INDEX_UPDATE_DELAY seconds, then we only update the
+        index once.
+
+        Args:
+            video_id: pk of the video to update
+            language_code: If given, only this language has changed.
+        """
+        from videos.tasks import update_video_index
+        if language_code is None:
+            cls._updates.schedule(update_video_index, video_id)
+        else:
+            cls._updates.schedule(update_video_index, video_id,
+                                  [language_code])
+
+    @classmethod
+    def run_scheduled_update(cls, video):
+        """Run an update scheduled with schedule_update()."""
+        pending_languages = cls._updates.get_pending(video.pk)
+        if pending_languages is None:
+            cls.index_video(video)
+        elif pending_languages:
+            cls.index_video(video, pending_languages)
+
+class VideoIndexSegment(models.Model):
+    """Stores the text for part of a VideoIndex."""
+    video = models.ForeignKey(Video, related_name='index_segments')
+    key = models.CharField(max_length=32)
+    text = models.TextField()
+
+    class Meta:
+        unique_together = [
+            ('video', 'key'),
+        ]
+
+    @classmethod
+    def save_changes(cls, video, old_segments, new_segments):
+        """Save changes to a video's segments
+
+        We only touch the rows for segments that have changed.
+        """
+        deleted = [k for k in old_segments if k not in new_segments]
+        if deleted:
+            cls.objects.filter(video=video, key__in=deleted).delete()
+        for key, text in new_segments.items():
+            if key not in old_segments:
+                cls.objects.create(video=video, key=key, text=text)
+            elif old_segments[key] != text:
+                cls.objects.filter(video=video, key=key).update(text=text)
+
 # VideoMetadata
 #
 # TODO: remove this this class.  We use this class for a couple things:
@@ -2228,8 +2615,20 @@ class VideoFeed(models.Model):
     user = models.ForeignKey(User, blank=True, null=True)
     team = models.ForeignKey("teams.Team", blank=True, null=True)
     last_update = models.DateTimeField(null=True)
+    # Validators from the last response, for conditional GETs
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=255, blank=True, default='')
+    # Link to the latest entry from the last update.  We only look at entries
+    # newer than this one.
+    last_link = models.URLField(max_length=512, blank=True, default='')
+    # Seconds to wait between updates.  This adapts to how often the feed
+    # changes, see schedule_next_update().
+    update_interval = models.IntegerField(default=60 * 60)
+    next_update = models.DateTimeField(null=True, blank=True, db_index=True)
 
     YOUTUBE_PAGE_SIZE = 25
+    MIN_UPDATE_INTERVAL = 60 * 60
+    MAX_UPDATE_INTERVAL = 24 * 60 * 60
 
     def __unicode__(self):
         return self.url
@@ -2242,11 +2641,18 @@ class VideoFeed(models.Model):
         return urlparse.urlparse(self.url).netloc
 
     def update(self):
-        importer = VideoImporter(self.url, self.user, self.team)
+        importer = VideoImporter(self.url, self.user, self.team,
+                                 etag=self.etag or None,
+                                 modified=self.last_modified or None,
+                                 last_link=self.last_link)
         new_videos = importer.import_videos(
             import_next=self.last_update is None)
 
+        self.etag = importer.etag or ''
+        self.last_modified = importer.modified or ''
+        self.last_link = importer.last_link or ''
         self.last_update = VideoFeed.now()
+        self.schedule_next_update(bool(new_videos))
         self.save()
         # create videos last-to-first so that the latest video is at the top
         # of the list when viewing the imported videos
@@ -2255,6 +2661,21 @@ class VideoFeed(models.Model):
         signals.feed_imported.send(sender=self, new_videos=new_videos)
         return new_videos
 
+    def schedule_next_update(self, changed):
+        """Set next_update based on how often the feed changes
+
+        If the last update found new videos, we check again after
+        MIN_UPDATE_INTERVAL.  Each update that finds nothing new doubles the
+        interval, up to MAX_UPDATE_INTERVAL.
+        """
+        if changed:
+            self.update_interval = self.MIN_UPDATE_INTERVAL
+        else:
+            self.update_interval = min(self.update_interval * 2,
+                                       self.MAX_UPDATE_INTERVAL)
+        self.next_update = (self.last_update +
+                            timedelta(seconds=self.update_interval))
+
 class ImportedVideo(models.Model):
     feed = models.ForeignKey(VideoFeed)
     video = models.OneToOneField(Video)
@@ -50,3 +50,8 @@ def on_video_followers_changed(instance, reverse, **kwargs):
 @receiver(signals.video_added)
 def on_video_added(sender, video_url, **kwargs):
     tasks.save_thumbnail_in_s3.delay(sender.pk)
+
+@receiver(signals.videos_added)
+def on_videos_added(sender, videos, **kwargs):
+    for video in videos:
+        tasks.save_thumbnail_in_s3.delay(video.pk)
@@ -23,8 +23,15 @@ title_changed = dispatch.Signal(providing_args=['old_title'])
 duration_changed = dispatch.Signal(providing_args=['old_duration'])
 language_changed = dispatch.Signal(
     providing_args=['old_primary_audio_language_code'])
+public_changed = dispatch.Signal(providing_args=['old_is_public'])
 video_added = dispatch.Signal(providing_args=['video_url'])
 video_url_added = dispatch.Signal(providing_args=['video', 'new_video'])
+# Sent by Video.add_many() instead of video_added/video_url_added.  videos
+# and video_urls are parallel lists.
+videos_added = dispatch.Signal(providing_args=['videos', 'video_urls'])
+# Sent by VideoIndex after it updates the index for videos.  videos and texts
+# are parallel lists.
+video_index_updated = dispatch.Signal(providing_args=['videos', 'texts'])
 video_url_made_primary = dispatch.Signal(providing_args=['old_url', 'user'])
 video_url_deleted = dispatch.Signal(providing_args=['user'])
 video_deleted = dispatch.Signal(providing_args=['user'])
@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
-from datetime import datetime, timedelta
+from datetime import timedelta
 import logging
 
 from celery.schedules import crontab, timedelta
@@ -23,7 +23,7 @@ from celery.task import task
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.files.base import ContentFile
-from django.db.models import ObjectDoesNotExist
+from django.db.models import ObjectDoesNotExist, Q
 import requests
 
 from babelsubs.storage import diff as diff_subtitles
@@ -73,18 +73,25 @@ def save_thumbnail_in_s3(video_id):
 
 @task
 def update_from_feed():
-    qs = VideoFeed.objects.exclude(last_update__gt=datetime.now()-
-                                   timedelta(hours=1))
-    for feed in qs:
+    now = VideoFeed.now()
+    feed_ids = list(VideoFeed.objects
+                    .filter(Q(next_update__isnull=True) |
+                            Q(next_update__lte=now))
+                    .values_list('id', flat=True))
+    # Push next_update back so that we don't queue the feeds again while
+    # they're waiting in the queue.  VideoFeed.update() sets the real value.
+    VideoFeed.objects.filter(id__in=feed_ids).update(
+        next_update=now + timedelta(seconds=VideoFeed.MIN_UPDATE_INTERVAL))
+    for feed_id in feed_ids:
         update_video_feed_with_rate_limit.apply_async(
-            args=(feed.pk,), queue='feeds')
+            args=(feed_id,), queue='feeds')
 
 @task
 def update_video_feed(video_feed_id):
     try:
         video_feed = VideoFeed.objects.get(pk=video_feed_id)
         video_feed.update()
-    except VideoFeed:
+    except VideoFeed.DoesNotExist:
         logging.warn(
             '**update_video_feed**. VideoFeed does not exist. ID: %s',
             video_feed_id)
@@ -111,7 +118,6 @@ def test_task(n):
 @task()
 def video_changed_tasks(video_pk, new_version_id=None):
     from videos import metadata_manager
-    from videos.models import Video
     from teams.models import TeamVideo, BillingRecord
 
     metadata_manager.update_metadata(video_pk)
@@ -125,8 +131,25 @@ def video_changed_tasks(video_pk, new_version_id=None):
                 "version_pk": new_version_id,
                 "exception": str(e)})
 
-    video = Video.objects.get(pk=video_pk)
-    video.update_search_index()
+    # If we know which version changed, then we only need to update the
+    # index for that language
+    language_code = None
+    if new_version_id is not None:
+        language_codes = (SubtitleVersion.objects
+                          .filter(pk=new_version_id)
+                          .values_list('language_code', flat=True))
+        if language_codes:
+            language_code = language_codes[0]
+    VideoIndex.schedule_update(video_pk, language_code)
+
+@task
+def update_video_index(video_pk):
+    """Run an index update scheduled by VideoIndex.schedule_update()."""
+    try:
+        video = Video.objects.get(pk=video_pk)
+    except Video.DoesNotExist:
+        return
+    VideoIndex.run_scheduled_update(video)
 
 @task
 def subtitles_complete_changed(language_pk):
@@ -138,6 +161,8 @@ def subtitles_complete_changed(language_pk):
     """
     from teams.models import TeamVideo, BillingRecord
     language = SubtitleLanguage.objects.get(pk=language_pk)
+    # The search backends filter on the completed languages
+    VideoIndex.schedule_update(language.video_id, language.language_code)
     version = language.get_tip()
     try:
         BillingRecord.objects.insert_record(version)
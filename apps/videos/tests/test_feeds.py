@@ -17,17 +17,24 @@
 # along with this program. If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-import feedparser
+from datetime import datetime, timedelta
 from StringIO import StringIO
+import BaseHTTPServer
+import threading
+
+import feedparser
 
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from nose.tools import *
 import mock
 
 from utils import test_utils
 from utils.factories import *
+from videos import tasks
 from videos.feed_parser import FeedParser
 from videos.models import Video, VideoFeed
+from videos.types import video_type_registrar
 from videos.types.vimeo import VimeoVideoType
 from videos.types.dailymotion import DailymotionVideoType
 from videos.types.youtube import YoutubeVideoType
@@ -156,6 +163,175 @@ class EntryDataTest(FeedImportTest):
                           'http://example.com/itunes-thumb.jpg')
 
 
+class FeedServer(object):
+    """Local HTTP server that serves a feed and handles conditional GETs."""
+    def __init__(self):
+        self.feed_data = ''
+        self.etag = None
+        self.last_modified = None
+        self.request_headers = []
+        self.httpd = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                               self.make_handler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    def make_handler(self):
+        server = self
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_headers.append(self.headers)
+                if server.not_modified(self.headers):
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/rss+xml')
+                if server.etag:
+                    self.send_header('ETag', server.etag)
+                if server.last_modified:
+                    self.send_header('Last-Modified', server.last_modified)
+                self.end_headers()
+                self.wfile.write(server.feed_data)
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+    def not_modified(self, headers):
+        if self.etag:
+            return headers.get('If-None-Match') == self.etag
+        if self.last_modified:
+            return headers.get('If-Modified-Since') == self.last_modified
+        return False
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/feed.rss'.format(
+            self.httpd.server_address[1])
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class IncrementalFeedUpdateTest(TestCase):
+    def setUp(self):
+        self.server = FeedServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.server.feed_data = make_feed_xml('video1', 'video2')
+        self.server.etag = '"v1"'
+        self.feed = VideoFeed.objects.create(url=self.server.url)
+
+    def video_urls(self):
+        return set(v.get_video_url() for v in Video.objects.all())
+
+    def test_stores_validators(self):
+        self.server.last_modified = 'Mon, 03 Oct 2016 12:00:00 GMT'
+        self.feed.update()
+        assert_equal(self.feed.etag, '"v1"')
+        assert_equal(self.feed.last_modified, self.server.last_modified)
+        assert_equal(self.feed.last_link, 'http://example.com/video2.mp4')
+        assert_equal(self.video_urls(), set([
+            'http://example.com/video1.mp4',
+            'http://example.com/video2.mp4',
+        ]))
+
+    def test_not_modified(self):
+        self.feed.update()
+        assert_equal(self.feed.update(), [])
+        assert_equal(self.server.request_headers[-1].get('If-None-Match'),
+                     '"v1"')
+        assert_equal(Video.objects.count(), 2)
+
+    def test_last_modified(self):
+        self.server.etag = None
+        self.server.last_modified = 'Mon, 03 Oct 2016 12:00:00 GMT'
+        self.feed.update()
+        assert_equal(self.feed.update(), [])
+        assert_equal(
+            self.server.request_headers[-1].get('If-Modified-Since'),
+            self.server.last_modified)
+
+    def test_only_parse_new_entries(self):
+        self.feed.update()
+        self.server.feed_data = make_feed_xml('video1', 'video2', 'video3')
+        self.server.etag = '"v2"'
+        with mock.patch.object(
+                video_type_registrar, 'video_type_for_url',
+                wraps=video_type_registrar.video_type_for_url) as mock_for_url:
+            new_videos = self.feed.update()
+        assert_equal([v.get_video_url() for v in new_videos],
+                     ['http://example.com/video3.mp4'])
+        assert_equal(mock_for_url.call_args_list, [
+            mock.call('http://example.com/video3.mp4'),
+        ])
+        assert_equal(self.feed.etag, '"v2"')
+        assert_equal(self.feed.last_link, 'http://example.com/video3.mp4')
+
+    def test_last_link_missing(self):
+        # If the last link dropped off the feed, we should parse all entries
+        self.feed.last_link = 'http://example.com/old-video.mp4'
+        self.feed.save()
+        self.feed.update()
+        assert_equal(Video.objects.count(), 2)
+
+    def test_update_interval(self):
+        self.feed.update()
+        assert_equal(self.feed.update_interval, VideoFeed.MIN_UPDATE_INTERVAL)
+        assert_equal(self.feed.next_update, self.feed.last_update +
+                     timedelta(seconds=VideoFeed.MIN_UPDATE_INTERVAL))
+        # Each time the feed is unchanged, we should wait twice as long
+        self.feed.update()
+        assert_equal(self.feed.update_interval,
+                     VideoFeed.MIN_UPDATE_INTERVAL * 2)
+        for i in range(10):
+            self.feed.update()
+        assert_equal(self.feed.update_interval, VideoFeed.MAX_UPDATE_INTERVAL)
+        # Once the feed changes, we should check it often again
+        self.server.feed_data = make_feed_xml('video1', 'video2', 'video3')
+        self.server.etag = '"v2"'
+        self.feed.update()
+        assert_equal(self.feed.update_interval, VideoFeed.MIN_UPDATE_INTERVAL)
+
+    @test_utils.patch_for_test(
+        'videos.tasks.update_video_feed_with_rate_limit')
+    def test_update_from_feed(self, mock_update_task):
+        now = datetime.now()
+        due = VideoFeed.objects.create(url='http://example.com/due',
+                                       next_update=now - timedelta(minutes=1))
+        not_due = VideoFeed.objects.create(
+            url='http://example.com/not-due',
+            next_update=now + timedelta(minutes=1))
+        tasks.update_from_feed()
+        queued_ids = [c[1]['args'][0]
+                      for c in mock_update_task.apply_async.call_args_list]
+        assert_items_equal(queued_ids, [self.feed.id, due.id])
+        assert_false(not_due.id in queued_ids)
+        # Feeds shouldn't get queued again while they wait in the queue
+        mock_update_task.reset_mock()
+        tasks.update_from_feed()
+        assert_equal(mock_update_task.apply_async.call_count, 0)
+
+def make_feed_xml(*names):
+    """Make an RSS feed with one entry per name, latest name first."""
+    items = ''.join("""
+  <item>
+    <title>{name}</title>
+    <link>http://example.com/{name}.mp4</link>
+  </item>""".format(name=name) for name in reversed(names))
+    return """\
+<?xml version="1.0" encoding="ISO-8859-1" ?>
+<rss version="2.0">
+<channel>
+  <title>Test Feed</title>
+  <link>http://example.com/</link>
+  <description>Test Feed</description>{items}
+</channel>
+</rss>""".format(items=items)
+
 # feed data for the tests
 EXAMPLE_FEED_XML = """\
 <?xml version="1.0" encoding="ISO-8859-1" ?>
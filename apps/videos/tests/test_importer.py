@@ -59,6 +59,7 @@ class VideoImporterTestCase(TestCase):
         return.
         """
         self.feed_parser = mock.Mock()
+        self.feed_parser.not_modified = False
         self.feed_parser.feed.entries = [self.entry(name)
                                     for (name, extra) in item_info]
         self.feed_parser.feed.feed = {}
@@ -94,7 +95,7 @@ class VideoImporterTestCase(TestCase):
         ])
         self.run_import_videos()
         self.feed_parser.items.assert_called_with(
-            ignore_error=True,
+            since='', ignore_error=True,
         )
         self.check_videos('item-1', 'item-2', 'item-3')
 
@@ -20,6 +20,7 @@ from contextlib import contextmanager
 from datetime import datetime, timedelta
 from django.test import TestCase
 from nose.tools import *
+import mock
 
 from utils.test_utils import *
 from utils.factories import *
@@ -27,25 +28,35 @@ from subtitles import pipeline
 from videos.models import VideoIndex
 
 class VideoIndexingTest(TestCase):
-    @patch_for_test('videos.models.VideoIndex.calc_text')
-    def test_index_new_video(self, mock_calc_text):
-        mock_calc_text.return_value = 'test text'
+    @patch_for_test('videos.models.VideoIndex.calc_segments')
+    def test_index_new_video(self, mock_calc_segments):
+        mock_calc_segments.return_value = {'video': 'test text'}
         v = VideoFactory()
         assert_false(VideoIndex.objects.filter(video=v).exists())
 
         index = VideoIndex.index_video(v)
         assert_equal(VideoIndex.objects.get(video=v).text, 'test text')
 
-    @patch_for_test('videos.models.VideoIndex.calc_text')
-    def test_update_index(self, mock_calc_text):
-        mock_calc_text.return_value = 'old text'
+    @patch_for_test('videos.models.VideoIndex.calc_segments')
+    def test_update_index(self, mock_calc_segments):
+        mock_calc_segments.return_value = {'video': 'old text'}
         v = VideoFactory()
         VideoIndex.index_video(v)
 
-        mock_calc_text.return_value = 'new text'
+        mock_calc_segments.return_value = {'video': 'new text'}
         VideoIndex.index_video(v)
         assert_equal(VideoIndex.objects.get(video=v).text, 'new text')
 
+    @patch_for_test('videos.models.VideoIndex.calc_segments')
+    def test_skip_write_if_unchanged(self, mock_calc_segments):
+        mock_calc_segments.return_value = {'video': 'text'}
+        v = VideoFactory()
+        VideoIndex.index_video(v)
+        # The second time, we should fetch the segments and the hash, then
+        # skip the update.
+        with self.assertNumQueries(2):
+            VideoIndex.index_video(v)
+
     def test_index_text(self):
         video = VideoFactory(title='video_title',
                              description='video_description',
@@ -86,6 +97,76 @@ class VideoIndexingTest(TestCase):
         index_text = VideoIndex.calc_text(video, max_length=100)
         assert_equal(len(index_text), 100)
 
+    def test_update_single_language(self):
+        video = VideoFactory(title='video_title')
+        pipeline.add_subtitles(video, 'en', SubtitleSetFactory(),
+                               title='en_title', visibility='public')
+        pipeline.add_subtitles(video, 'fr', SubtitleSetFactory(),
+                               title='fr_title', visibility='public')
+        VideoIndex.index_video(video)
+        pipeline.add_subtitles(video, 'fr', SubtitleSetFactory(),
+                               title='fr_title2', visibility='public')
+        index_text = VideoIndex.index_video(video, ['fr']).text
+        assert_true('video_title' in index_text)
+        assert_true('en_title' in index_text)
+        assert_true('fr_title2' in index_text)
+        assert_equal(index_text, VideoIndex.calc_text(video))
+        assert_equal(VideoIndex.objects.get(video=video).text, index_text)
+
+    def test_remove_language(self):
+        video = VideoFactory()
+        version = pipeline.add_subtitles(video, 'en', SubtitleSetFactory(),
+                                         title='en_title',
+                                         visibility='public')
+        VideoIndex.index_video(video)
+        version.visibility_override = 'private'
+        version.save()
+        index_text = VideoIndex.index_video(video, ['en']).text
+        assert_false('en_title' in index_text)
+
+    @patch_for_test('videos.models.VideoIndex.index_video')
+    def test_schedule_update(self, mock_index_video):
+        video = VideoFactory()
+        # Use apply_async as a mock to stop the task from running right away
+        with mock.patch('videos.tasks.update_video_index.apply_async') as \
+                mock_apply_async:
+            VideoIndex.schedule_update(video.pk, 'en')
+            VideoIndex.schedule_update(video.pk, 'fr')
+        # We should only schedule 1 update task for both changes
+        assert_equal(mock_apply_async.call_count, 1)
+        VideoIndex.run_scheduled_update(video)
+        assert_equal(mock_index_video.call_args, mock.call(
+            video, set(['en', 'fr'])))
+
+    @patch_for_test('videos.models.VideoIndex.index_video')
+    def test_schedule_update_all_languages(self, mock_index_video):
+        video = VideoFactory()
+        with mock.patch('videos.tasks.update_video_index.apply_async'):
+            VideoIndex.schedule_update(video.pk, 'en')
+            VideoIndex.schedule_update(video.pk)
+        VideoIndex.run_scheduled_update(video)
+        assert_equal(mock_index_video.call_args, mock.call(video))
+
+    @patch_for_test('videos.models.VideoIndex.index_video')
+    def test_schedule_update_while_running(self, mock_index_video):
+        # Simulate another process scheduling an update while the update task
+        # is running.  That change should get its own task rather than being
+        # dropped.
+        video = VideoFactory()
+        with mock.patch('videos.tasks.update_video_index.apply_async') as \
+                mock_apply_async:
+            VideoIndex.schedule_update(video.pk, 'en')
+            mock_index_video.side_effect = \
+                    lambda *args: VideoIndex.schedule_update(video.pk, 'fr')
+            VideoIndex.run_scheduled_update(video)
+            assert_equal(mock_index_video.call_args,
+                         mock.call(video, set(['en'])))
+            assert_equal(mock_apply_async.call_count, 2)
+            mock_index_video.side_effect = None
+            VideoIndex.run_scheduled_update(video)
+        assert_equal(mock_index_video.call_args,
+                     mock.call(video, set(['fr'])))
+
     # FIXME we should have searching tests, but we can't since we use sqlite
     # databases for our unittests and it has a different matching syntax then
     # MySQL
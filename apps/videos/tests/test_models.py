@@ -29,7 +29,8 @@ from auth.models import CustomUser as User
 from subtitles import pipeline
 from subtitles.models import SubtitleLanguage
 from videos import signals
-from videos.models import Video, VideoUrl, VideoTypeUrlPattern
+from videos.models import (Video, VideoUrl, VideoTypeUrlPattern,
+                           VideoIndex, make_title_from_url)
 from videos.tasks import video_changed_tasks
 from videos.tests.data import (
     get_video, make_subtitle_language, make_subtitle_version, make_rollback_to
@@ -179,6 +180,18 @@ class TestChangedSignals(TestCase):
             video.save()
             assert_equal(mock_handler.call_count, 1)
 
+    def test_public_changed_signal(self):
+        video = VideoFactory(is_public=True)
+        with test_utils.mock_handler(signals.public_changed) as mock_handler:
+            video.save()
+            assert_equal(mock_handler.call_count, 0)
+            video.is_public = False
+            video.save()
+            assert_equal(mock_handler.call_count, 1)
+            assert_equal(mock_handler.call_args,
+                         mock.call(signal=signals.public_changed,
+                                   sender=video, old_is_public=True))
+
     def test_no_changed_signals_on_initial_created(self):
         cm1 = test_utils.mock_handler(signals.title_changed)
         cm2 = test_utils.mock_handler(signals.duration_changed)
@@ -432,6 +445,54 @@ class TestSelectHasPublicVersion(TestCase):
             assert_true(videos[0].has_public_version())
             assert_false(videos[1].has_public_version())
 
+class CompletedLanguageFilterTest(TestCase):
+    def setUp(self):
+        self.video_en = VideoFactory()
+        make_version(self.video_en, 'en')
+        self.video_en_fr = VideoFactory()
+        make_version(self.video_en_fr, 'en')
+        make_version(self.video_en_fr, 'fr')
+        self.video_incomplete = VideoFactory()
+        make_version(self.video_incomplete, 'en', subtitles_complete=False)
+        self.video_none = VideoFactory()
+
+    def test_has_completed_language(self):
+        assert_items_equal(Video.objects.has_completed_language('en'),
+                           [self.video_en, self.video_en_fr])
+        assert_items_equal(Video.objects.has_completed_language('fr'),
+                           [self.video_en_fr])
+
+    def test_missing_completed_language(self):
+        assert_items_equal(Video.objects.missing_completed_language('fr'),
+                           [self.video_en, self.video_incomplete,
+                            self.video_none])
+
+    def test_any_and_no_completed_languages(self):
+        assert_items_equal(Video.objects.any_completed_languages(),
+                           [self.video_en, self.video_en_fr])
+        assert_items_equal(Video.objects.no_completed_languages(),
+                           [self.video_incomplete, self.video_none])
+
+    def test_num_completed_languages(self):
+        qs = Video.objects.add_num_completed_languages()
+        assert_equal(dict((v.id, v.num_completed_languages) for v in qs), {
+            self.video_en.id: 1,
+            self.video_en_fr.id: 2,
+            self.video_incomplete.id: 0,
+            self.video_none.id: 0,
+        })
+
+    def test_subtitles_complete_changes(self):
+        language = self.video_incomplete.subtitle_language('en')
+        language.subtitles_complete = True
+        language.save()
+        assert_true(Video.objects.has_completed_language('en')
+                    .filter(id=self.video_incomplete.id).exists())
+        language.subtitles_complete = False
+        language.save()
+        assert_false(Video.objects.has_completed_language('en')
+                     .filter(id=self.video_incomplete.id).exists())
+
 class TestGetMergedDFXP(TestCase):
     def test_get_merged_dfxp(self):
         video = VideoFactory(primary_audio_language_code='en')
@@ -568,6 +629,133 @@ class AddVideoTest(TestCase):
                      mock.call(signal=signals.video_url_added,
                                sender=video_url, video=video, new_video=True))
 
+class AddManyVideosTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.urls = ['http://example.com/video{}.mp4'.format(i)
+                     for i in range(3)]
+
+    def test_add_many(self):
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user)
+        assert_equal([video_url.url for video, video_url in added],
+                     self.urls)
+        assert_equal(existing, [])
+        for video, video_url in added:
+            assert_equal(test_utils.reload_obj(video).get_video_url(),
+                         video_url.url)
+            assert_equal(video_url.video_id, video.id)
+            assert_equal(video_url.primary, True)
+            assert_equal(video_url.added_by, self.user)
+            assert_equal(video.user, self.user)
+            assert_equal(video.title, make_title_from_url(video_url.url))
+            assert_equal(video.get_team_video(), None)
+
+    @test_utils.with_mock_video_type_registrar
+    def test_string_urls(self, mock_registrar):
+        added, existing = Video.add_many(self.urls, self.user)
+        assert_equal(mock_registrar.video_type_for_url.call_args_list,
+                     [mock.call(url) for url in self.urls])
+        assert_equal(len(added), 3)
+
+    def test_existing_urls(self):
+        video = VideoFactory(video_url__url=self.urls[0])
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls + [self.urls[1]]],
+            self.user)
+        assert_equal([video_url.url for video, video_url in added],
+                     self.urls[1:])
+        # The 2nd copy of urls[1] should be listed as existing too, since it
+        # was added earlier in the call
+        assert_equal(existing, [video.get_primary_videourl_obj(),
+                                added[0][1]])
+        assert_equal(Video.objects.count(), 3)
+
+    def test_setup_callback(self):
+        def setup_callback(video, video_url, team_video):
+            video.title = 'title for ' + video_url.url
+            assert_equal(team_video, None)
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user,
+            setup_callback)
+        for video, video_url in added:
+            assert_equal(test_utils.reload_obj(video).title,
+                         'title for ' + video_url.url)
+
+    def test_team(self):
+        team = TeamFactory()
+        project = ProjectFactory(team=team)
+        def setup_callback(video, video_url, team_video):
+            if video_url.url == self.urls[0]:
+                team_video.project = project
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user,
+            setup_callback, team=team)
+        for video, video_url in added:
+            team_video = test_utils.reload_obj(video).get_team_video()
+            assert_equal(team_video.team, team)
+            assert_equal(team_video.added_by, self.user)
+            if video_url.url == self.urls[0]:
+                assert_equal(team_video.project, project)
+            else:
+                assert_equal(team_video.project, team.default_project)
+
+    def test_search_index(self):
+        def setup_callback(video, video_url, team_video):
+            video.description = 'searchable description'
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user,
+            setup_callback)
+        for video, video_url in added:
+            index = VideoIndex.objects.get(video=video)
+            assert_equal(index.text, VideoIndex.calc_text(video))
+            assert_true('searchable description' in index.text)
+
+    def test_notify_by_message(self):
+        self.user.notify_by_message = True
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user)
+        for video, video_url in added:
+            assert_true(video.followers.filter(id=self.user.id).exists())
+
+    @test_utils.mock_handler(signals.video_added)
+    @test_utils.mock_handler(signals.videos_added)
+    def test_signals(self, on_videos_added, on_video_added):
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user)
+        assert_equal(on_video_added.call_count, 0)
+        assert_equal(on_videos_added.call_count, 1)
+        assert_equal(on_videos_added.call_args, mock.call(
+            signal=signals.videos_added, sender=Video,
+            videos=[video for video, video_url in added],
+            video_urls=[video_url for video, video_url in added]))
+
+    @test_utils.mock_handler(signals.video_index_updated)
+    def test_index_signal_sent_after_commit(self, on_video_index_updated):
+        # If the bulk insert gets rolled back, the search backends shouldn't
+        # see the videos from it
+        bulk_add = Video._bulk_add
+        def bulk_add_then_fail(*args):
+            bulk_add(*args)
+            raise IntegrityError()
+        with mock.patch('videos.models.Video._bulk_add',
+                        side_effect=bulk_add_then_fail):
+            with mock.patch('videos.models.Video._add_many_one_by_one'):
+                Video.add_many([MockVideoType(url) for url in self.urls],
+                               self.user)
+        assert_equal(on_video_index_updated.call_count, 0)
+
+    @test_utils.mock_handler(signals.video_index_updated)
+    def test_index_signal(self, on_video_index_updated):
+        added, existing = Video.add_many(
+            [MockVideoType(url) for url in self.urls], self.user)
+        assert_equal(on_video_index_updated.call_count, 1)
+        assert_equal(on_video_index_updated.call_args, mock.call(
+            signal=signals.video_index_updated, sender=VideoIndex,
+            videos=[video for video, video_url in added],
+            texts=[VideoIndex.objects.get(video=video).text
+                   for video, video_url in added]))
+
 class AddVideoTestWithTransactions(TransactionTestCase):
     # These tests is split off from the others because it needs to be inside a
     # TransactionTestCase.  TransactionTestCase is not needed for the other
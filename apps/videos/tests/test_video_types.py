@@ -232,6 +232,50 @@ class VideoTypeRegistrarTest(TestCase):
         self.assertRaises(VideoTypeError, video_type_registrar.video_type_for_url,
                           'http://youtube.com/v=100500')
 
+    def test_find_video_type(self):
+        def check(url, video_type):
+            self.assertEqual(video_type_registrar.find_video_type(url),
+                             video_type)
+        check('http://www.youtube.com/watch?v=woobL2yAxD4', YoutubeVideoType)
+        check('http://youtu.be/woobL2yAxD4', YoutubeVideoType)
+        check('http://player.vimeo.com/15786066', VimeoVideoType)
+        check('http://www.dailymotion.com/video/x7u2ww_juliette-drums_news',
+              DailymotionVideoType)
+        check('http://example.com/video.MP4', HtmlFiveVideoType)
+        check('http://example.com/video.flv', FLVVideoType)
+        check('http://example.com/audio.mp3', Mp3VideoType)
+        check('http://example.com/video.mp4/page', None)
+        check('http://example.com/vimeo.com/15786066', None)
+        # Kaltura URLs end with .mp4 too, but Kaltura is registered first
+        check('http://cdnbakmi.kaltura.com/p/1492321/sp/149232100/'
+              'serveFlavor/entryId/1_zr7niumr/flavorId/1_djpnqf7y/name/a.mp4',
+              KalturaVideoType)
+
+    def test_find_video_type_matches_linear_scan(self):
+        from videos.management.commands.benchmark_video_types import (
+            make_corpus, find_video_type_linear)
+        for url in make_corpus(200):
+            self.assertEqual(video_type_registrar.find_video_type(url),
+                             find_video_type_linear(url), url)
+
+    def test_types_without_hints_are_always_checked(self):
+        registrar = VideoTypeRegistrar()
+
+        class MockupVideoType(VideoType):
+            abbreviation = 'mockup'
+            name = 'MockUp'
+
+            @classmethod
+            def matches_video_url(cls, url):
+                return url.endswith('/mockup')
+
+        registrar.register(HtmlFiveVideoType)
+        registrar.register(MockupVideoType)
+        self.assertEqual(registrar.find_video_type('http://example.com/mockup'),
+                         MockupVideoType)
+        self.assertEqual(registrar.find_video_type('http://example.com/a.ogv'),
+                         HtmlFiveVideoType)
+
 class BrightcoveVideoTypeTest(TestCase):
     player_id = '1234'
     video_id = '5678'
@@ -17,6 +17,7 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from urlparse import urlparse
+import re
 
 from django.core.exceptions import ValidationError
 import subprocess, sys, uuid, os
@@ -32,6 +33,16 @@ class VideoType(object):
 
     CAN_IMPORT_SUBTITLES = False
 
+    # Hints for VideoTypeRegistrar, which uses them to avoid calling
+    # matches_video_url() for types that can't possibly match.
+    #   - url_hostnames: we only match URLs for these hosts and their
+    #     subdomains
+    #   - url_extensions: we only match URLs whose path ends with one of
+    #     these extensions
+    # Types that set neither get checked for every URL.
+    url_hostnames = None
+    url_extensions = None
+
     def __init__(self, url):
         self.url = url
 
@@ -144,6 +155,15 @@ class VideoType(object):
         return url.strip()
     
 class VideoTypeRegistrar(dict):
+    """Keeps track of our video types and finds the one to use for an URL
+
+    Calling matches_video_url() for each type in turn is slow, since most
+    types run a regex and some parse the URL again.  Instead we index the
+    types by their url_hostnames/url_extensions hints, parse the URL once,
+    and only check the types that could match it.  Candidates are still
+    checked in registration order, so the first registered type that matches
+    wins, like before.
+    """
     
     domains = []
     
@@ -151,18 +171,67 @@ class VideoTypeRegistrar(dict):
         super(VideoTypeRegistrar, self).__init__(*args, **kwargs)
         self.choices = []
         self.type_list = []
+        self._order = {}
+        self._host_index = {}
+        self._extension_index = {}
+        self._extension_re = None
+        self._unindexed_types = []
         
     def register(self, video_type):
         self[video_type.abbreviation] = video_type
+        self._order[video_type] = len(self.type_list)
         self.type_list.append(video_type)
         self.choices.append((video_type.abbreviation, video_type.name))
         domain = getattr(video_type, 'site', None)
         domain and self.domains.append(domain)
+        self._index_type(video_type)
+
+    def _index_type(self, video_type):
+        if not (video_type.url_hostnames or video_type.url_extensions):
+            self._unindexed_types.append(video_type)
+            return
+        for hostname in video_type.url_hostnames or ():
+            self._host_index.setdefault(hostname.lower(), []).append(
+                video_type)
+        for extension in video_type.url_extensions or ():
+            self._extension_index.setdefault(extension.lower(), []).append(
+                video_type)
+        if self._extension_index:
+            # One regex for all the extension-based types
+            self._extension_re = re.compile(r'\.(%s)\Z' % '|'.join(
+                re.escape(ext) for ext in sorted(self._extension_index)),
+                re.IGNORECASE)
+
+    def _candidate_types(self, url):
+        parsed = urlparse(url.strip())
+        candidates = set(self._unindexed_types)
+        if parsed.hostname:
+            parts = parsed.hostname.split('.')
+            for i in xrange(len(parts)):
+                candidates.update(
+                    self._host_index.get('.'.join(parts[i:]), ()))
+        if self._extension_re is not None:
+            match = self._extension_re.search(parsed.path)
+            if match:
+                candidates.update(
+                    self._extension_index[match.group(1).lower()])
+        return sorted(candidates, key=self._order.get)
+
+    def find_video_type(self, url):
+        """Find the VideoType class that handles an URL
+
+        Returns:
+            VideoType subclass or None if no types match
+        """
+        for video_type in self._candidate_types(url):
+            if video_type.matches_video_url(url):
+                return video_type
+        return None
         
     def video_type_for_url(self, url):
-        for video_type in self.type_list:
-            if video_type.matches_video_url(url):
-                return video_type(url)
+        video_type = self.find_video_type(url)
+        if video_type is not None:
+            return video_type(url)
             
 class VideoTypeError(Exception):
     pass
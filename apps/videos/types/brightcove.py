@@ -74,8 +74,11 @@ class BrightcoveVideoType(VideoType):
             for r in BRIGHTCOVE_REGEXES:
                 if bool(r.match(url)):
                     return True
+            if url.find('bctid') <= 0:
+                # Skip the pattern lookup, since it hits the cache
+                return False
             from videos.models import VideoTypeUrlPattern
             for pattern in VideoTypeUrlPattern.objects.patterns_for_type(cls.abbreviation):
-                if url.find(pattern.url_pattern) == 0 and url.find('bctid') > 0:
+                if url.find(pattern.url_pattern) == 0:
                     return True
         return False
@@ -34,6 +34,7 @@ class DailymotionVideoType(VideoType):
 
     abbreviation = 'D'
     name = 'dailymotion.com'
+    url_hostnames = ('dailymotion.com',)
     site = 'dailymotion.com'
 
     def __init__(self, url):
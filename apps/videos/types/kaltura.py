@@ -35,6 +35,7 @@ class KalturaVideoType(VideoType):
 
     abbreviation = 'K'
     name = 'Kaltura'   
+    url_hostnames = ('kaltura.com',)
     
     @classmethod
     def matches_video_url(cls, url):
@@ -26,6 +26,7 @@ class Mp3VideoType(VideoType):
 
     abbreviation = 'M'
     name = 'MP3'
+    url_extensions = ('mp3',)
 
     def __init__(self, url):
         self.url = url
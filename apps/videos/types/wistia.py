@@ -29,6 +29,7 @@ class WistiaVideoType(VideoType):
 
     abbreviation = 'W'
     name = 'Wistia.com'   
+    url_hostnames = ('wistia.com', 'wi.st', 'wistia.net')
     site = 'wistia.com'
     linkurl = None
 
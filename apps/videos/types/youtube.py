@@ -29,6 +29,7 @@ class YoutubeVideoType(VideoType):
     ]]
 
     HOSTNAMES = ( "youtube.com", "youtu.be", "www.youtube.com",)
+    url_hostnames = HOSTNAMES
 
     abbreviation = 'Y'
     name = 'Youtube'
@@ -53,6 +53,10 @@ class NullRpc(BaseRpc):
         return_value['my_languages'] = ['en'];
         return return_value
 
+    def show_widgets(self, request, widgets, is_remote):
+        return [self.show_widget(request, video_url, is_remote, base_state)
+                for video_url, base_state in widgets]
+
     def fetch_start_dialog_contents(self, request, video_id):
         my_languages = get_user_languages_from_request(request)
         my_languages.extend([l[:l.find('-')] for l in my_languages if l.find('-') > -1])
@@ -102,11 +102,26 @@ class Rpc(BaseRpc):
         """Return an error if the user cannot see the widget, None otherwise."""
 
         visibility_policy = video_cache.get_visibility_policies(video_id)
+        return self._check_visibility_policy(request, visibility_policy)
 
-        if not visibility_policy.get("is_public", True):
-            team = Team.objects.get(id=visibility_policy['team_id'])
+    def _check_visibility_policy(self, request, visibility_policy,
+                                 team_cache=None):
+        """Check a visibility policy dict from video_cache
 
-            if not team.is_member(request.user):
+        Args:
+            team_cache: dict to store the Team objects we load in.  Pass the
+                same dict for multiple checks to avoid loading a team more
+                than once.
+        """
+        if not visibility_policy.get("is_public", True):
+            if team_cache is None:
+                team_cache = {}
+            team_id = visibility_policy['team_id']
+            if team_id not in team_cache:
+                team = Team.objects.get(id=team_id)
+                team_cache[team_id] = team.is_member(request.user)
+
+            if not team_cache[team_id]:
                 return {"error_msg": _("Video embedding disabled by owner")}
 
     def _get_video_urls_for_widget(self, video_url, video_id):
@@ -198,6 +213,71 @@ class Rpc(BaseRpc):
                                                            video_id, is_remote)
         return resp
 
+    def show_widgets(self, request, widgets, is_remote):
+        """Batch version of show_widget()
+
+        Pages that embed many widgets can use this to set them all up with a
+        single request.  Video ids and the cached widget data are fetched for
+        all videos together.
+
+        Args:
+            widgets: list of [video_url, base_state] pairs
+
+        Returns:
+            list of show_widget() responses, in the same order as widgets
+        """
+        video_urls = [video_url for video_url, base_state in widgets]
+        video_ids = video_cache.get_video_ids(video_urls)
+        errors = {}
+        for video_url in video_urls:
+            if video_url in video_ids or video_url in errors:
+                continue
+            # Unknown URL, let get_video_id() add the video
+            try:
+                video_ids[video_url] = video_cache.get_video_id(video_url)
+            except Exception as e:
+                errors[video_url] = {"error_msg": unicode(e)}
+        widget_info = video_cache.get_widget_info_many(
+            set(video_id for video_id in video_ids.values() if video_id))
+
+        general_settings = get_general_settings(request)
+        my_languages = get_user_languages_from_request(request)
+        team_cache = {}
+        responses = []
+        for video_url, base_state in widgets:
+            if video_url in errors:
+                responses.append(errors[video_url])
+                continue
+            video_id = video_ids[video_url]
+            if video_id is None:
+                responses.append(None)
+                continue
+            info = widget_info.get(video_id)
+            if info is None:
+                # The cached video id is out of date, fall back to
+                # show_widget() to sort it out.
+                responses.append(self.show_widget(request, video_url,
+                                                  is_remote, base_state))
+                continue
+            error = self._check_visibility_policy(
+                request, info['visibility_policy'], team_cache)
+            if error:
+                responses.append(error)
+                continue
+            resp = {
+                'video_id' : video_id,
+                'video_urls': info['video_urls'],
+                'is_moderated': info['is_moderated'],
+                'filename': info['filename'],
+                'drop_down_contents': info['drop_down_contents'],
+                'my_languages': my_languages,
+            }
+            resp.update(general_settings)
+            resp['subtitles'] = self._get_subtitles_for_widget(
+                request, base_state, video_id, is_remote)
+            responses.append(resp)
+        return responses
+
     def track_subtitle_play(self, request, video_id):
         # NOTE: we used to use this method to track when subtitles were
         # played from amara or other sites, however it wasn't very useful
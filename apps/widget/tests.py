@@ -0,0 +1,136 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+from nose.tools import *
+import mock
+
+from utils import test_utils
+from utils.factories import *
+from widget import video_cache
+from widget.rpc import Rpc
+
+class VideoCacheInvalidationTest(TestCase):
+    def setUp(self):
+        test_utils.invalidate_widget_video_cache.run_original_for_test()
+        self.team = TeamFactory()
+        self.video = VideoFactory(team=self.team)
+        self.video_id = self.video.video_id
+        self.team_video_id = self.video.get_team_video().id
+
+    def fill_cache(self):
+        video_cache.get_video_urls(self.video_id)
+        video_cache.get_is_moderated(self.video_id)
+        video_cache.get_visibility_policies(self.video_id)
+        video_cache.get_download_filename(self.video_id)
+        video_cache.get_video_completed_languages(self.team_video_id)
+
+    def count_round_trips(self, func, *args):
+        wrapper = mock.Mock(wraps=cache)
+        with mock.patch('widget.video_cache.cache', wrapper):
+            func(*args)
+        return len(wrapper.method_calls)
+
+    def test_invalidate(self):
+        self.fill_cache()
+        with self.assertNumQueries(0):
+            self.fill_cache()
+        video_cache.invalidate_cache(self.video_id)
+        version = cache.get(video_cache._video_version_key(self.video_id))
+        for key in (video_cache._video_urls_key(self.video_id),
+                    video_cache._video_is_moderated_key(self.video_id),
+                    video_cache._video_visibility_policy_key(self.video_id),
+                    video_cache._video_filename_key(self.video_id)):
+            assert_equal(video_cache._versioned_get(self.video_id, key),
+                         (version, None))
+        assert_equal(cache.get(video_cache._video_completed_languages(
+            self.team_video_id)), None)
+
+    def test_invalidate_video_id(self):
+        video_url = self.video.get_video_url()
+        video_cache.get_video_id(video_url)
+        assert_not_equal(cache.get(video_cache._video_id_key(video_url)),
+                         None)
+        video_cache.invalidate_cache(self.video_id)
+        assert_equal(cache.get(video_cache._video_id_key(video_url)), None)
+
+    def test_invalidate_changes_values(self):
+        assert_equal(len(video_cache.get_video_urls(self.video_id)), 1)
+        VideoURLFactory(video=self.video)
+        assert_equal(len(video_cache.get_video_urls(self.video_id)), 1)
+        video_cache.invalidate_cache(self.video_id)
+        assert_equal(len(video_cache.get_video_urls(self.video_id)), 2)
+
+    def test_invalidate_round_trips(self):
+        # Invalidation should be a version bump and a single delete_many()
+        # call, no matter how many languages and URLs the video has.
+        self.fill_cache()
+        assert_equal(
+            self.count_round_trips(video_cache.invalidate_cache,
+                                   self.video_id), 2)
+        for language_code in ('en', 'fr', 'de'):
+            make_version(self.video, language_code)
+        VideoURLFactory(video=self.video)
+        assert_equal(
+            self.count_round_trips(video_cache.invalidate_cache,
+                                   self.video_id), 2)
+
+    def test_get_is_single_round_trip(self):
+        self.fill_cache()
+        assert_equal(
+            self.count_round_trips(video_cache.get_video_urls, self.video_id),
+            1)
+
+class ShowWidgetsTest(TestCase):
+    def setUp(self):
+        test_utils.invalidate_widget_video_cache.run_original_for_test()
+        self.rpc = Rpc()
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+        team = TeamFactory()
+        self.videos = [VideoFactory(team=team) for i in range(3)]
+        self.videos.extend(VideoFactory() for i in range(3))
+        self.widgets = [[v.get_video_url(), None] for v in self.videos]
+
+    def test_matches_show_widget(self):
+        assert_equal(self.rpc.show_widgets(self.request, self.widgets, False),
+                     [self.rpc.show_widget(self.request, url, False,
+                                           base_state)
+                      for url, base_state in self.widgets])
+
+    def test_queries(self):
+        self.rpc.show_widgets(self.request, self.widgets, False)
+        # Once everything is cached, we shouldn't need any queries, no
+        # matter how many videos there are
+        with self.assertNumQueries(0):
+            responses = self.rpc.show_widgets(self.request, self.widgets,
+                                              False)
+        assert_equal([r['video_id'] for r in responses],
+                     [v.video_id for v in self.videos])
+
+    def test_private_team(self):
+        team = TeamFactory(is_visible=False)
+        video = VideoFactory(team=team)
+        responses = self.rpc.show_widgets(
+            self.request, [[video.get_video_url(), None]] + self.widgets,
+            False)
+        assert_equal(responses[0].keys(), ['error_msg'])
+        assert_equal(len(responses), len(self.widgets) + 1)
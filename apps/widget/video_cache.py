@@ -15,21 +15,81 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
+import collections
 import datetime
 import hashlib
 
-from django.conf import settings
 from django.core.cache import cache
 from django.utils.translation import (
     ugettext_lazy as _
 )
 
+from utils import codes
 from videos.types import video_type_registrar
 from videos.types.base import VideoTypeError
 import unilangs
 
 TIMEOUT = 60 * 60 * 24 * 5 # 5 days
 
+# Most values in this module are stored in a per-video namespace, using the
+# same trick as caching.cachegroup.  We store a random version string for each
+# video and pack it together with the values that we store.  If a value's
+# version doesn't match the video's current version, then it's considered
+# invalid.  This makes invalidating all of those values a single cache.set()
+# call.
+
+def _versioned_get(video_id, cache_key):
+    """Get a value stored in a video's namespace
+
+    The version and the value are fetched together with get_many(), so this
+    is a single round trip.
+
+    Returns:
+        (version, value) tuple.  value is None if it's not set for the current
+        version.  Pass version to _versioned_set() when storing the value, so
+        that we don't store stale data if the video is invalidated in the
+        meantime.
+    """
+    return _versioned_get_many([(video_id, cache_key)])[cache_key]
+
+def _versioned_get_many(lookups):
+    """Get values from several video namespaces in one round trip
+
+    Args:
+        lookups: list of (video_id, cache_key) tuples
+
+    Returns:
+        dict mapping cache keys to (version, value) tuples, like
+        _versioned_get() returns.
+    """
+    keys_to_fetch = set()
+    for video_id, cache_key in lookups:
+        keys_to_fetch.add(_video_version_key(video_id))
+        keys_to_fetch.add(cache_key)
+    result = cache.get_many(list(keys_to_fetch))
+    new_versions = {}
+    rv = {}
+    for video_id, cache_key in lookups:
+        version_key = _video_version_key(video_id)
+        version = result.get(version_key) or new_versions.get(version_key)
+        if version is None:
+            version = new_versions[version_key] = codes.make_code()
+            rv[cache_key] = (version, None)
+            continue
+        try:
+            value_version, value = result[cache_key]
+        except (KeyError, TypeError, ValueError):
+            value_version = value = None
+        if value_version != version:
+            value = None
+        rv[cache_key] = (version, value)
+    if new_versions:
+        cache.set_many(new_versions, TIMEOUT)
+    return rv
+
+def _versioned_set(cache_key, version, value):
+    cache.set(cache_key, (version, value), TIMEOUT)
+
 
 def get_video_id(video_url, public_only=False, referer=None):
     """
@@ -52,6 +112,34 @@ def get_video_id(video_url, public_only=False, referer=None):
         cache.set(cache_key, video_id, TIMEOUT)
         return video_id
 
+def get_video_ids(video_urls):
+    """Get the cache video_ids for several URLs at once
+
+    This uses one get_many() call and a single query for the URLs that
+    aren't cached.  Unlike get_video_id(), we don't add videos for unknown
+    URLs.
+
+    Returns:
+        dict mapping video URLs to video ids.  URLs that we can't find a
+        video for are not included.
+    """
+    keys = dict((_video_id_key(url), url) for url in video_urls)
+    rv = dict((keys[key], value)
+              for key, value in cache.get_many(keys.keys()).items()
+              if value)
+    missing = [url for url in video_urls if url not in rv]
+    if missing:
+        from videos.models import VideoUrl
+        found = dict(VideoUrl.objects
+                     .filter(url__in=missing)
+                     .values_list('url', 'video__video_id'))
+        if found:
+            cache.set_many(dict((_video_id_key(url), video_id)
+                                for url, video_id in found.items()),
+                           TIMEOUT)
+        rv.update(found)
+    return rv
+
 def associate_extra_url(video_url, video_id):
     cache_key = _video_id_key(video_url)
     value = cache.get(cache_key)
@@ -69,40 +157,26 @@ def associate_extra_url(video_url, video_id):
 
 # Invalidation
 def invalidate_cache(video_id):
-    cache.delete(_video_urls_key(video_id))
-
-    try:
-        from videos.models import Video
-        video = Video.objects.get(video_id=video_id)
-        for l in video.newsubtitlelanguage_set.all():
-            cache.delete(_subtitles_dict_key(video_id, l.pk))
-    except Video.DoesNotExist:
-        pass
-
-    for language in settings.ALL_LANGUAGES:
-        cache.delete(_subtitle_language_pk_key(video_id, language[0]))
-
-    cache.delete(_subtitle_language_pk_key(video_id, None))
-    cache.delete(_subtitles_dict_key(video_id, None))
-    cache.delete(_subtitles_count_key(video_id))
-    cache.delete(_video_languages_key(video_id))
-    cache.delete(_video_languages_verbose_key(video_id))
-    cache.delete(_video_is_moderated_key(video_id))
-    cache.delete(_video_visibility_policy_key(video_id))
-    cache.delete(_video_filename_key(video_id))
+    # Changing the version invalidates everything in the video's namespace
+    cache.set(_video_version_key(video_id), codes.make_code(), TIMEOUT)
 
+    # The video ID and completed languages keys are looked up by URL and team
+    # video, so they live outside of the namespace.  Delete those in one
+    # round trip.
     from videos.models import Video
     try:
         video = Video.objects.get(video_id=video_id)
-        for url in video.videourl_set.all():
-            cache.delete(_video_id_key(url.url))
-
-        team_video = video.get_team_video()
-
-        if team_video:
-            cache.delete(_video_completed_languages(team_video.id))
     except Video.DoesNotExist:
-        pass
+        return
+    keys_to_delete = [
+        _video_id_key(url)
+        for url in video.videourl_set.values_list('url', flat=True)
+    ]
+    team_video = video.get_team_video()
+    if team_video:
+        keys_to_delete.append(_video_completed_languages(team_video.id))
+    if keys_to_delete:
+        cache.delete_many(keys_to_delete)
 
 def invalidate_video_id(video_url):
     cache.delete(_video_id_key(video_url))
@@ -117,6 +191,9 @@ def on_video_url_delete(sender, instance, **kwargs):
     if instance.video and instance.video.video_id:
         invalidate_cache(instance.video.video_id)
 
+def _video_version_key(video_id):
+    return 'widget_video_version_{0}'.format(video_id)
+
 def _video_id_key(video_url):
     return 'video_id_{0}'.format(hashlib.sha1(video_url).hexdigest())
 
@@ -126,9 +203,6 @@ def _video_urls_key(video_id):
 def _subtitles_dict_key(video_id, language_pk, version_no=None):
     return 'widget_subtitles_{0}{1}{2}'.format(video_id, language_pk, version_no)
 
-def _subtitles_count_key(video_id):
-    return "subtitle_count_{0}".format(video_id)
-
 def _video_languages_key(video_id):
     return "widget_video_languages_{0}".format(video_id)
 
@@ -159,34 +233,36 @@ def pk_for_default_language(video_id, language_code):
     # don't ask me why
     language_code = language_code or None
     cache_key = _subtitle_language_pk_key(video_id, language_code)
-    value = cache.get(cache_key)
+    version, value = _versioned_get(video_id, cache_key)
 
     if value is None:
         from videos.models import Video
         sl = Video.objects.get(video_id=video_id).subtitle_language(
             language_code)
         value = None if sl is None else sl.pk
-        cache.set(cache_key, value, TIMEOUT)
+        _versioned_set(cache_key, version, value)
 
     return value
 
 def get_video_urls(video_id):
     cache_key = _video_urls_key(video_id)
-    video_urls = cache.get(cache_key)
+    version, video_urls = _versioned_get(video_id, cache_key)
 
     if video_urls is None:
         from videos.models import Video
-        video_urls = [vu.effective_url for vu
-                 in Video.objects.get(video_id=video_id).videourl_set.all()]
-        cache.set(cache_key, video_urls, TIMEOUT)
+        video_urls = _calc_video_urls(Video.objects.get(video_id=video_id))
+        _versioned_set(cache_key, version, video_urls)
 
     return video_urls
 
+def _calc_video_urls(video):
+    return [vu.effective_url for vu in video.videourl_set.all()]
+
 def get_subtitles_dict(video_id, language_pk, version_number, 
                        subtitles_dict_fn, is_remote=False):
 
     cache_key = _subtitles_dict_key(video_id, language_pk, version_number)
-    cached_value = cache.get(cache_key)
+    cache_version, cached_value = _versioned_get(video_id, cache_key)
 
     if cached_value is None:
         from videos.models import Video
@@ -209,30 +285,32 @@ def get_subtitles_dict(video_id, language_pk, version_number,
             else:
                 cached_value = None
 
-            cache.set(cache_key, cached_value, TIMEOUT)
+            _versioned_set(cache_key, cache_version, cached_value)
 
     return cached_value
 
 def get_video_languages(video_id):
-    from widget.rpc import language_summary
-
     cache_key = _video_languages_key(video_id)
-    value = cache.get(cache_key)
+    version, value = _versioned_get(video_id, cache_key)
 
     if value is None:
         from videos.models import Video
-        video = Video.objects.get(video_id=video_id)
-        languages = video.newsubtitlelanguage_set.having_nonempty_versions()
+        value = _calc_video_languages(Video.objects.get(video_id=video_id))
+        _versioned_set(cache_key, version, value)
 
-        team_video = video.get_team_video()
+    return value
 
-        if team_video:
-            languages = languages.filter(language_code__in=team_video.team.get_readable_langs())
+def _calc_video_languages(video):
+    from widget.rpc import language_summary
 
-        value = [language_summary(l) for l in languages]
-        cache.set(cache_key, value, TIMEOUT)
+    languages = video.newsubtitlelanguage_set.having_nonempty_versions()
 
-    return value
+    team_video = video.get_team_video()
+
+    if team_video:
+        languages = languages.filter(language_code__in=team_video.team.get_readable_langs())
+
+    return [language_summary(l, team_video) for l in languages]
 
 def get_video_completed_languages(team_video_id):
     cache_key = _video_completed_languages(team_video_id)
@@ -251,7 +329,7 @@ def get_video_languages_verbose(video_id, max_items=6):
     # FIXME: we should probably merge a better method with get_video_languages
     # maybe accepting a 'verbose' param?
     cache_key = _video_languages_verbose_key(video_id)
-    data = cache.get(cache_key)
+    version, data = _versioned_get(video_id, cache_key)
 
     if data is None:
         from videos.models import Video
@@ -279,37 +357,41 @@ def get_video_languages_verbose(video_id, max_items=6):
                     'is_complete': lang.is_complete,
                     'language_url': lang.get_absolute_url(),
                 })
-        cache.set(cache_key, data, TIMEOUT)
+        _versioned_set(cache_key, version, data)
 
     return data
 
 def get_is_moderated(video_id):
     cache_key = _video_is_moderated_key(video_id)
-    value = cache.get(cache_key)
+    version, value = _versioned_get(video_id, cache_key)
 
     if value is None:
         from videos.models import Video
-        video = Video.objects.get(video_id=video_id)
-        value = video.is_moderated
-        cache.set(cache_key, value, TIMEOUT)
+        value = _calc_is_moderated(Video.objects.get(video_id=video_id))
+        _versioned_set(cache_key, version, value)
 
     return value
 
+def _calc_is_moderated(video):
+    return video.is_moderated
+
 def get_download_filename(video_id):
     cache_key = _video_filename_key(video_id)
-    value = cache.get(cache_key)
+    version, value = _versioned_get(video_id, cache_key)
 
     if value is None:
         from videos.models import Video
-        video = Video.objects.get(video_id=video_id)
-        value = video.get_download_filename()
-        cache.set(cache_key, value, TIMEOUT)
+        value = _calc_download_filename(Video.objects.get(video_id=video_id))
+        _versioned_set(cache_key, version, value)
 
     return value
 
+def _calc_download_filename(video):
+    return video.get_download_filename()
+
 def get_visibility_policies(video_id):
     cache_key = _video_visibility_policy_key(video_id)
-    value = cache.get(cache_key)
+    version, value = _versioned_get(video_id, cache_key)
 
     if value is None:
         from videos.models import Video
@@ -319,24 +401,102 @@ def get_visibility_policies(video_id):
         except Video.DoesNotExist:
             return {}
 
-        team_video = video.get_team_video()
+        value = _calc_visibility_policies(video)
+        _versioned_set(cache_key, version, value)
 
-        if team_video:
-            team = team_video.team
-            is_public = team.is_visible
-            team_id = team.id
-        else:
-            is_public = True
-            team_id = None
+    return value
 
-        value = {
-            "is_public": is_public,
-            "team_id": team_id
-        }
+def _calc_visibility_policies(video):
+    team_video = video.get_team_video()
 
-        cache.set(cache_key, value, TIMEOUT)
+    if team_video:
+        team = team_video.team
+        is_public = team.is_visible
+        team_id = team.id
+    else:
+        is_public = True
+        team_id = None
+
+    return {
+        "is_public": is_public,
+        "team_id": team_id
+    }
+
+# Values that get_widget_info_many() returns.  Each item is (name, cache key
+# function, function to calculate the value from a Video)
+WIDGET_INFO = [
+    ('visibility_policy', _video_visibility_policy_key,
+     _calc_visibility_policies),
+    ('video_urls', _video_urls_key, _calc_video_urls),
+    ('is_moderated', _video_is_moderated_key, _calc_is_moderated),
+    ('filename', _video_filename_key, _calc_download_filename),
+    ('drop_down_contents', _video_languages_key, _calc_video_languages),
+]
+
+def get_widget_info_many(video_ids):
+    """Get the widget data for several videos at once
+
+    All cached values are fetched with one get_many() call.  Videos with
+    missing values are loaded together with their team videos and URLs in a
+    fixed number of queries, then the new values are stored with one
+    set_many() call.  Calculating the language list still runs queries for
+    each video that's missing it.
+
+    Returns:
+        dict mapping video ids to dicts.  Each dict has a key for every name
+        in WIDGET_INFO.  Videos that don't exist are not included.
+    """
+    lookups = []
+    for video_id in video_ids:
+        for name, key_func, calc_func in WIDGET_INFO:
+            lookups.append((video_id, name, key_func(video_id), calc_func))
+    cached = _versioned_get_many([
+        (video_id, cache_key)
+        for (video_id, name, cache_key, calc_func) in lookups
+    ])
+
+    rv = collections.defaultdict(dict)
+    missing = collections.defaultdict(list)
+    for (video_id, name, cache_key, calc_func) in lookups:
+        version, value = cached[cache_key]
+        if value is None:
+            missing[video_id].append((name, cache_key, calc_func))
+        else:
+            rv[video_id][name] = value
+
+    if missing:
+        videos = _load_videos_for_widget(missing.keys())
+        to_set = {}
+        for video_id, items in missing.items():
+            video = videos.get(video_id)
+            if video is None:
+                rv.pop(video_id, None)
+                continue
+            for name, cache_key, calc_func in items:
+                value = calc_func(video)
+                rv[video_id][name] = value
+                to_set[cache_key] = (cached[cache_key][0], value)
+        cache.set_many(to_set, TIMEOUT)
+    return dict(rv)
+
+def _load_videos_for_widget(video_ids):
+    from django.db.models.query import prefetch_related_objects
+    from teams.models import TeamVideo
+    from videos.models import Video
 
-    return value
+    videos = dict((v.video_id, v)
+                  for v in Video.objects.filter(video_id__in=video_ids))
+    team_videos = dict(
+        (tv.video_id, tv) for tv in
+        TeamVideo.objects.filter(video__in=videos.values())
+        .select_related('team'))
+    for video in videos.values():
+        team_video = team_videos.get(video.id)
+        if team_video is not None:
+            team_video.video = video
+        video._cached_teamvideo = team_video
+    prefetch_related_objects(videos.values(), ['videourl_set'])
+    return videos
 
 # Writelocking
 def _writelocked_store_langs(video_id, langs):
@@ -38,6 +38,8 @@ CACHE_TIMEOUT = 60
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 NOSE_PLUGINS = ['utils.test_utils.plugin.UnisubsTestPlugin']
 CELERY_ALWAYS_EAGER = True
+# Don't share cache pattern keys between tests
+CACHE_PATTERN_SYNC_INTERVAL = None
 
 YOUTUBE_CLIENT_ID = 'test-youtube-id'
 YOUTUBE_CLIENT_SECRET = 'test-youtube-secret'
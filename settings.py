@@ -371,6 +371,75 @@ EMAIL_BCC_LIST = []
 
 CACHE_BACKEND = 'locmem://'
 
+# Number of entries in the per-process cache that CacheGroup keeps in front of
+# memcached.  0 disables it.
+CACHE_GROUP_L1_SIZE = 0
+# How long values stay in that cache.  Invalidations from other processes can
+# take this long to be seen.
+CACHE_GROUP_L1_TIMEOUT = 5
+# How often each process merges the keys it uses for cache patterns into the
+# copy shared by all processes.  None disables sharing.
+CACHE_PATTERN_SYNC_INTERVAL = 60
+# Keys that haven't been used for this long are dropped from the cache
+# patterns
+CACHE_PATTERN_KEY_MAX_AGE = 60 * 60 * 24 * 7
+
+# Max size for the per-process cache of parsed SubtitleSets, measured in bytes
+# of DFXP.  The parsed trees take up a few times more memory than that.
+SUBTITLE_SET_CACHE_SIZE = 32 * 1024 * 1024
+# Directory to store rendered subtitle output in, in addition to the django
+# cache.  Set to None to only use the django cache.
+SUBTITLE_RENDER_CACHE_DIR = None
+# Subtitle formats to render and cache when a new version is published
+SUBTITLE_RENDER_PRECACHE_FORMATS = []
+# How to store SubtitleVersion.serialized_subtitles for new versions:
+#   - 'legacy': base64-encoded zlib-compressed DFXP
+#   - 'compact': utils.compress.compress_dfxp()
+# Both formats can always be read.  Use the convert_subtitle_storage command
+# to convert existing rows.
+SUBTITLE_STORAGE_FORMAT = 'legacy'
+# Number of threads to use when loading subtitles for multiple versions at
+# once (see subtitles.models.fetch_subtitle_sets)
+SUBTITLE_LOAD_THREADS = 4
+
+# Delay before updating the search index after a video changes.  Changes that
+# happen within this window are combined into a single update.
+VIDEO_INDEX_UPDATE_DELAY = 30
+# Search backend class to use, see search.backends
+SEARCH_BACKEND = 'search.backends.fulltext.FulltextBackend'
+# Where search.backends.invertedindex.InvertedIndexBackend stores its index
+# and how many shards it splits the posting lists into.  Changing
+# SEARCH_INDEX_SHARDS requires running the rebuild_search_index command.
+SEARCH_INDEX_DIR = rel('user-data', 'search-index')
+SEARCH_INDEX_SHARDS = 16
+
+# How long to cache the team statistics tabs for
+TEAM_STATS_CACHE_TIMEOUT = 60 * 60 * 24
+# Teams with at least this many videos get their statistics re-computed by a
+# periodic task, so that page views never have to wait for them.
+TEAM_STATS_PRECOMPUTE_MIN_VIDEOS = 1000
+# Delay before updating TeamLanguageCount after subtitles or videos change.
+# Changes that happen within this window are combined into a single update.
+TEAM_LANGUAGE_COUNT_UPDATE_DELAY = 30
+
+# Timeouts, in seconds, for connecting to and reading from team notification
+# endpoints
+NOTIFICATION_CONNECT_TIMEOUT = 5
+NOTIFICATION_READ_TIMEOUT = 20
+# Failed team notifications are retried up to this many attempts in total.
+# The delay before the retry starts at NOTIFICATION_RETRY_DELAY seconds and
+# doubles after each attempt.
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_DELAY = 60
+# Max number of endpoints that we send retried notifications to at once
+NOTIFICATION_DELIVERY_THREADS = 4
+# Max number of failed notifications to retry in one run of the retry task
+NOTIFICATION_RETRY_BATCH_SIZE = 100
+# How long, in seconds, a retry run keeps its claim on the notifications it's
+# sending.  This should be longer than a run can last, so that overlapping
+# runs don't send the same notifications.
+NOTIFICATION_CLAIM_TIMEOUT = 60 * 60
+
 #for unisubs.example.com
 RECAPTCHA_PUBLIC = '6LdoScUSAAAAANmmrD7ALuV6Gqncu0iJk7ks7jZ0'
 RECAPTCHA_SECRET = ' 6LdoScUSAAAAALvQj3aI1dRL9mHgh85Ks2xZH1qc'
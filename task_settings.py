@@ -37,6 +37,14 @@ CELERYBEAT_SCHEDULE = {
         'task': 'auth.tasks.expire_login_tokens',
         'schedule': crontab(minute=10, hour=23),
     },
+    'precompute_team_statistics': {
+        'task': 'teams.tasks.precompute_team_statistics',
+        'schedule': crontab(minute=20, hour='*/6'),
+    },
+    'retry_failed_notifications': {
+        'task': 'notifications.handlers.retry_failed_notifications',
+        'schedule': crontab(),
+    },
     'add_videos_notification_daily': {
         'task': 'teams.tasks.add_videos_notification_daily',
         'schedule': crontab(minute=0, hour=23),
@@ -59,7 +67,7 @@ CELERYBEAT_SCHEDULE = {
     },
     'update_feeds': {
         'task': 'videos.tasks.update_from_feed',
-        'schedule': crontab(minute=0),
+        'schedule': crontab(minute='*/15'),
     },
     'import_from_accounts': {
         'task': 'externalsites.tasks.import_videos_from_accounts',
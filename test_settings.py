@@ -36,6 +36,8 @@ DEFAULT_PROTOCOL = 'https'
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 NOSE_PLUGINS = ['utils.test_utils.plugin.UnisubsTestPlugin']
 CELERY_ALWAYS_EAGER = True
+# Don't share cache pattern keys between tests
+CACHE_PATTERN_SYNC_INTERVAL = None
 
 # Use MD5 password hashing, other algorithms are purposefully slow to increase
 # security.  Also include the SHA1 hasher since some of the tests use it.
@@ -20,7 +20,9 @@ from itertools import chain
 from django.core.paginator import Paginator
 
 
-def chunkediter(objects, chunk_size=200):
+def iter_chunks(objects, chunk_size=200):
     pages = Paginator(objects, chunk_size)
-    return chain.from_iterable(pages.page(i).object_list
-                               for i in pages.page_range)
+    return (pages.page(i).object_list for i in pages.page_range)
+
+def chunkediter(objects, chunk_size=200):
+    return chain.from_iterable(iter_chunks(objects, chunk_size))
@@ -35,3 +35,103 @@ def compress(data):
 def decompress(data):
     """Decompress data created with compress."""
     return zlib.decompress(base64.decodestring(data))
+
+# Compact DFXP storage
+#
+# compress_dfxp() stores DFXP as a raw deflate stream that was primed with
+# _DFXP_DICTIONARY, a sample of the markup that babelsubs writes for every
+# document.  zlib can then encode the <tt>/<head> boilerplate and the
+# <p begin="..." end="..."> framing of the first cues as back-references
+# into the dictionary, which is most of the data for short subtitle sets.
+# We also skip the zlib header/checksum and the line breaks that
+# base64.encodestring() adds.
+#
+# Decoding is a single inflate, like compress(): we prime a decompressor
+# with the dictionary once and copy it for each call.  An earlier version
+# of this format stored the timings as a packed integer array, but
+# formatting them back into the XML in python made reads several times
+# slower than compress(), so we keep the clock strings in the deflate
+# stream.
+#
+# Layout (after the "!" marker, base64 encoded so that we can store it in a
+# text field):
+#
+#   - format version byte
+#   - raw deflate stream of the DFXP, using _DFXP_DICTIONARY as history
+#
+# Changing _DFXP_DICTIONARY makes existing data unreadable, so any change
+# needs a new COMPACT_FORMAT_VERSION.
+#
+# decompress_dfxp() handles both this format and the old compress() format,
+# so rows stored with either can coexist.
+
+COMPACT_MARKER = '!'
+COMPACT_FORMAT_VERSION = 2
+
+# zlib uses the end of the dictionary first, so the most common strings go
+# last.
+_DFXP_DICTIONARY = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<tt xmlns="http://www.w3.org/ns/ttml" '
+    'xmlns:tts="http://www.w3.org/ns/ttml#styling" xml:lang="en">\n'
+    '    <head>\n'
+    '        <metadata xmlns:ttm="http://www.w3.org/ns/ttml#metadata">\n'
+    '            <ttm:title/>\n'
+    '            <ttm:description/>\n'
+    '            <ttm:copyright/>\n'
+    '        </metadata>\n'
+    '        <styling xmlns:tts="http://www.w3.org/ns/ttml#styling">\n'
+    '            <style xml:id="amara-style" tts:color="white" '
+    'tts:fontFamily="proportionalSansSerif" tts:fontSize="18px" '
+    'tts:backgroundColor="transparent" tts:textOutline="black 1px 0px" '
+    'tts:textAlign="center"/>\n'
+    '        </styling>\n'
+    '        <layout xmlns:tts="http://www.w3.org/ns/ttml#styling">\n'
+    '            <region xml:id="bottom" style="amara-style" '
+    'tts:extent="100% 20%" tts:origin="0 80%"/>\n'
+    '            <region xml:id="top" style="amara-style" '
+    'tts:extent="100% 20%" tts:origin="0 0"/>\n'
+    '        </layout>\n'
+    '    </head>\n'
+    '    <body region="bottom">\n'
+    '        <div>\n'
+    '        </div>\n'
+    '    </body>\n'
+    '</tt>\n'
+    '<span tts:textDecoration="underline"></span>'
+    '<span tts:fontWeight="bold"></span>'
+    '<span tts:fontStyle="italic"></span><br/>\n'
+    '            <p begin="00:00:00.000" end="00:00:00.000"></p>\n'
+    '            <p begin="00:00:0'
+)
+
+def _make_dfxp_compressor():
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressor.compress(_DFXP_DICTIONARY)
+    return compressor, compressor.flush(zlib.Z_SYNC_FLUSH)
+
+_dfxp_compressor, _dfxp_dictionary_block = _make_dfxp_compressor()
+_dfxp_decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+_dfxp_decompressor.decompress(_dfxp_dictionary_block)
+
+def is_compact(data):
+    """Check if data was created with compress_dfxp()."""
+    return data.startswith(COMPACT_MARKER)
+
+def compress_dfxp(dfxp):
+    """Compress a DFXP bytestring using the compact storage format."""
+    compressor = _dfxp_compressor.copy()
+    return COMPACT_MARKER + base64.b64encode(
+        chr(COMPACT_FORMAT_VERSION) + compressor.compress(dfxp) +
+        compressor.flush())
+
+def decompress_dfxp(data):
+    """Decompress DFXP created with either compress() or compress_dfxp()."""
+    if not is_compact(data):
+        return decompress(data)
+    payload = base64.b64decode(str(data[len(COMPACT_MARKER):]))
+    version = ord(payload[0])
+    if version != COMPACT_FORMAT_VERSION:
+        raise ValueError("Unknown compact format version: %s" % version)
+    decompressor = _dfxp_decompressor.copy()
+    return decompressor.decompress(payload[1:]) + decompressor.flush()
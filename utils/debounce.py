@@ -0,0 +1,130 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""utils.debounce -- Combine updates that come in over a short time
+
+DebouncedUpdate is used when several changes to an object tend to come in at
+once, for example the signals that get sent when a subtitle version is saved.
+schedule() records which parts of the object changed and queues a task to
+run after a delay.  Further calls to schedule() before the task runs just add
+to the changes.  The task calls get_pending() to find out what it needs to
+update.
+
+Changes are stored in the cache.  Each schedule() call gets its own slot,
+numbered by an atomic counter, so concurrent calls can't overwrite each
+other and get_pending() only needs to fetch the slots that were filled since
+the last run.  If we lose track of any changes, get_pending() returns None,
+which means that the task should update everything.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+# How long to keep the changes for a scheduled update
+PENDING_TIMEOUT = 60 * 60
+# How long to keep the slot counters for
+COUNTER_TIMEOUT = 60 * 60 * 24
+
+class DebouncedUpdate(object):
+    """Debounce updates for a type of object
+
+    Args:
+        name: prefix for our cache keys
+        delay_setting: name of the setting that holds the delay, in seconds,
+            between the first change and running the task
+    """
+    def __init__(self, name, delay_setting):
+        self.name = name
+        self.delay_setting = delay_setting
+
+    def schedule(self, task, obj_id, items=None):
+        """Schedule an update
+
+        Args:
+            task: celery task to run.  It gets called with obj_id as its only
+                argument and should call get_pending().
+            obj_id: id of the object to update
+            items: iterable of the parts of the object that changed.  If
+                None, then everything should be updated.
+        """
+        if items is None:
+            value = True
+        else:
+            value = list(items)
+            if not value:
+                return
+        counter_key = self._counter_key(obj_id)
+        cache.add(counter_key, 0, COUNTER_TIMEOUT)
+        try:
+            slot = cache.incr(counter_key)
+        except ValueError:
+            # The counter expired right after we added it.  Starting over
+            # makes the next get_pending() call return None, which is safe.
+            slot = 1
+            cache.set(counter_key, slot, COUNTER_TIMEOUT)
+        cache.set(self._slot_key(obj_id, slot), value, PENDING_TIMEOUT)
+        if cache.add(self._scheduled_key(obj_id), True, PENDING_TIMEOUT):
+            task.apply_async(args=(obj_id,),
+                             countdown=getattr(settings, self.delay_setting))
+
+    def get_pending(self, obj_id):
+        """Get the changes scheduled for an object and clear them
+
+        Returns:
+            set of items that changed, or None if everything should be
+            updated.  An empty set means that another task already handled
+            the changes.
+        """
+        # Clear the scheduled flag before reading the slots.  If schedule()
+        # runs after this point, it will queue a new task, so we can't drop
+        # any changes.
+        cache.delete(self._scheduled_key(obj_id))
+        count = cache.get(self._counter_key(obj_id))
+        if count is None:
+            return None
+        done = cache.get(self._done_key(obj_id)) or 0
+        lost_track = count < done
+        if lost_track:
+            # The counter expired and started over
+            done = 0
+        slot_keys = [self._slot_key(obj_id, slot)
+                     for slot in xrange(done + 1, count + 1)]
+        values = cache.get_many(slot_keys)
+        cache.set(self._done_key(obj_id), count, COUNTER_TIMEOUT)
+        cache.delete_many(values.keys())
+        # Slots can be missing if they expired or if schedule() has
+        # incremented the counter but not filled the slot yet.
+        if (lost_track or len(values) < len(slot_keys) or
+                True in values.values()):
+            return None
+        pending = set()
+        for items in values.values():
+            pending.update(items)
+        return pending
+
+    def _counter_key(self, obj_id):
+        return '{}-{}-count'.format(self.name, obj_id)
+
+    def _done_key(self, obj_id):
+        return '{}-{}-done'.format(self.name, obj_id)
+
+    def _slot_key(self, obj_id, slot):
+        return '{}-{}-slot-{}'.format(self.name, obj_id, slot)
+
+    def _scheduled_key(self, obj_id):
+        return '{}-{}-scheduled'.format(self.name, obj_id)
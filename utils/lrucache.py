@@ -0,0 +1,117 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""lrucache -- process-local, size-bounded LRU caches."""
+
+from collections import OrderedDict
+import threading
+import time
+
+class LRUCache(object):
+    """Size-bounded least-recently-used cache.
+
+    The cache lives in the current process only, so it's only suitable for
+    data that never changes once it's been computed, or where callers can
+    tolerate stale values.
+
+    Args:
+        max_size: maximum total size of the entries.  Once we go over this,
+            we evict the least recently used entries.
+        sizeof: function that calculates the size of an entry given its
+            value.  By default every entry has size 1, which makes max_size a
+            limit on the number of entries.
+        ttl: if given, entries expire this many seconds after they're set.
+
+    Attributes:
+        hits: number of get() calls that found a value
+        misses: number of get() calls that didn't
+    """
+    def __init__(self, max_size, sizeof=None, ttl=None):
+        self.max_size = max_size
+        self.sizeof = sizeof if sizeof is not None else lambda value: 1
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.data = OrderedDict()
+            self.current_size = 0
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, size, expires = self.data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.time():
+                self.current_size -= size
+                self.misses += 1
+                return default
+            # re-insert the value to move it to the end of the LRU list
+            self.data[key] = (value, size, expires)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        else:
+            expires = None
+        with self.lock:
+            self._remove(key)
+            if size > self.max_size:
+                # Don't let a single huge entry flush the entire cache
+                return
+            self.data[key] = (value, size, expires)
+            self.current_size += size
+            while self.current_size > self.max_size:
+                old_key, old_entry = self.data.popitem(last=False)
+                self.current_size -= old_entry[1]
+
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        try:
+            value, size, expires = self.data.pop(key)
+        except KeyError:
+            return
+        self.current_size -= size
+
+    def stats(self):
+        """Get a dict of statistics for the cache."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / total if total else 0.0,
+            'entries': len(self.data),
+            'size': self.current_size,
+            'max_size': self.max_size,
+        }
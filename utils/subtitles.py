@@ -22,7 +22,12 @@ This module creates a custom SubtitleLoader which allows us to control the
 styling/layout.
 """
 
+from collections import namedtuple
+from io import BytesIO
+import re
+
 from babelsubs.loader import SubtitleLoader
+from lxml import etree
 
 subtitle_loader = SubtitleLoader()
 subtitle_loader.add_style('amara-style',
@@ -50,3 +55,108 @@ def load_subtitles_from_file(language_code, path):
 
 def dfxp_merge(subtitle_sets):
     return subtitle_loader.dfxp_merge(subtitle_sets)
+
+SubtitleItem = namedtuple('SubtitleItem', 'start_time end_time text meta')
+
+def iter_dfxp(dfxp):
+    """Iterate through the subtitles of a DFXP document
+
+    Unlike loading a SubtitleSet, this doesn't build a tree for the entire
+    document.  We parse it incrementally and throw away each <p> element
+    after we handle it, so memory use is bounded by the size of the largest
+    subtitle rather than the number of them.  Callers can stop early and
+    skip parsing the rest of the document.
+
+    Yields SubtitleItem tuples: (start_time, end_time, text, meta).  Times are
+    in milliseconds, or None for unsynced subtitles.  text is the plain text
+    with <br> tags converted to newlines.  meta is a dict with the
+    new_paragraph and region keys.
+    """
+    new_paragraph = False
+    context = etree.iterparse(BytesIO(dfxp), events=('start', 'end'),
+                              huge_tree=True)
+    for event, elt in context:
+        tag = _localname(elt)
+        if event == 'start':
+            if tag == 'div':
+                new_paragraph = True
+            continue
+        if tag != 'p':
+            continue
+        yield SubtitleItem(
+            _parse_time_expression(elt.get('begin')),
+            _parse_time_expression(elt.get('end')),
+            u''.join(_iter_text(elt)),
+            {'new_paragraph': new_paragraph, 'region': elt.get('region')})
+        new_paragraph = False
+        # Drop the element and anything before it so the tree doesn't grow
+        elt.clear()
+        parent = elt.getparent()
+        while elt.getprevious() is not None:
+            del parent[0]
+
+def calc_timing(subtitles):
+    """Find the times of the first and last subtitles
+
+    Args:
+        subtitles: SubtitleSet or any other iterable of items with start_time
+            and end_time attributes, for example the SubtitleItems from
+            iter_dfxp()
+
+    Returns:
+        (first_timing, last_timing) tuple.  first_timing is the start time of
+        the first synced subtitle and last_timing is the end time of the last
+        one.  If a subtitle is missing one of its times we use the other.  If
+        no subtitles are synced, both are None.
+    """
+    first_timing = last_timing = None
+    for sub in subtitles:
+        if first_timing is None:
+            if sub.start_time is not None:
+                first_timing = sub.start_time
+            else:
+                first_timing = sub.end_time
+        if sub.end_time is not None:
+            last_timing = sub.end_time
+        elif sub.start_time is not None:
+            last_timing = sub.start_time
+    return first_timing, last_timing
+
+def _localname(elt):
+    if not isinstance(elt.tag, basestring):
+        # comments and processing instructions
+        return None
+    return etree.QName(elt).localname
+
+def _iter_text(elt):
+    if elt.text:
+        yield elt.text
+    for child in elt:
+        if _localname(child) == 'br':
+            yield u'\n'
+        else:
+            for text in _iter_text(child):
+                yield text
+        if child.tail:
+            yield child.tail
+
+_clock_time_re = re.compile(r'^(\d+):(\d\d):(\d\d(?:\.\d+)?)$')
+_offset_time_re = re.compile(r'^(\d+(?:\.\d+)?)(h|m|s|ms)$')
+_offset_time_multipliers = {
+    'h': 3600000, 'm': 60000, 's': 1000, 'ms': 1,
+}
+
+def _parse_time_expression(value):
+    """Convert a DFXP time expression to milliseconds."""
+    if not value:
+        return None
+    match = _clock_time_re.match(value)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return int(round((int(hours) * 3600 + int(minutes) * 60 +
+                          float(seconds)) * 1000))
+    match = _offset_time_re.match(value)
+    if match:
+        amount, unit = match.groups()
+        return int(round(float(amount) * _offset_time_multipliers[unit]))
+    return None
@@ -29,6 +29,8 @@ from django.core.cache import cache
 from nose.plugins import Plugin
 
 from utils.test_utils import monkeypatch
+import caching.cachegroup
+import subtitles.cache
 from utils.test_utils import xvfb
 import optionalapps
 
@@ -83,6 +85,10 @@ class UnisubsTestPlugin(Plugin):
     def afterTest(self, test):
         self.patcher.reset_mocks()
         cache.clear()
+        # object ids get reused between tests, so clear out process-local
+        # caches too
+        subtitles.cache.subtitle_set_cache.clear()
+        caching.cachegroup._l1_cache.clear()
 
     def wantDirectory(self, dirname):
         if dirname in self.directories_to_skip:
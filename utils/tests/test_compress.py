@@ -18,11 +18,13 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from string import printable as chars
+import base64
 from random import randint, choice
 
 from django.test import TestCase
 
-from utils.compress import compress, decompress
+from utils.compress import (compress, decompress, compress_dfxp,
+                            decompress_dfxp, is_compact)
 
 class CompressTest(TestCase):
     def test_compression(self):
@@ -53,3 +55,73 @@ class CompressTest(TestCase):
             round_tripped = decompress(compress(encoded_data)).decode('utf-8')
 
             self.assertEqual(data, round_tripped)
+
+class CompactDFXPTest(TestCase):
+    DFXP = (
+        '<tt xmlns="http://www.w3.org/ns/ttml"><head/><body><div>'
+        '<p begin="00:00:01.000" end="00:00:02.500" region="bottom">a</p>'
+        '<p begin="00:00:00.500" end="01:02:03.004">b begin=""</p>'
+        '<p end="00:00:03.000" begin="100ms">c</p>'
+        '<p>d</p>'
+        '</div></body></tt>'
+    )
+
+    def test_round_trip(self):
+        data = compress_dfxp(self.DFXP)
+        self.assertTrue(is_compact(data))
+        self.assertEqual(self.DFXP, decompress_dfxp(data))
+        self.assertEqual('', decompress_dfxp(compress_dfxp('')))
+
+    def test_unicode(self):
+        dfxp = (u'<tt><body><p begin="00:00:01.000" end="00:00:02.000">'
+                u'\u2603\u0ca0_\u0ca0</p></body></tt>').encode('utf-8')
+        self.assertEqual(dfxp, decompress_dfxp(compress_dfxp(dfxp)))
+
+    def test_legacy_format(self):
+        # decompress_dfxp() should also handle data created with compress()
+        data = compress(self.DFXP)
+        self.assertFalse(is_compact(data))
+        self.assertEqual(self.DFXP, decompress_dfxp(data))
+
+    def test_unicode_input(self):
+        # django returns TextField data as unicode
+        data = unicode(compress_dfxp(self.DFXP))
+        self.assertEqual(self.DFXP, decompress_dfxp(data))
+
+    def test_unknown_version(self):
+        data = compress_dfxp(self.DFXP)
+        payload = base64.b64decode(data[1:])
+        data = '!' + base64.b64encode(chr(1) + payload[1:])
+        self.assertRaises(ValueError, decompress_dfxp, data)
+
+    def test_smaller_than_legacy(self):
+        dfxp = '<tt><body><div>{}</div></body></tt>'.format(''.join(
+            '<p begin="00:00:{0:02}.000" end="00:00:{0:02}.500">'
+            'line {0}</p>'.format(i)
+            for i in xrange(60)))
+        self.assertLess(len(compress_dfxp(dfxp)), len(compress(dfxp)))
+
+    def test_short_document(self):
+        # Short documents are mostly the boilerplate that babelsubs writes,
+        # which the compact format stores almost for free
+        dfxp = (
+            '<tt xmlns="http://www.w3.org/ns/ttml" '
+            'xmlns:tts="http://www.w3.org/ns/ttml#styling" xml:lang="fr">\n'
+            '    <head>\n'
+            '        <metadata '
+            'xmlns:ttm="http://www.w3.org/ns/ttml#metadata">\n'
+            '            <ttm:title/>\n'
+            '            <ttm:description/>\n'
+            '            <ttm:copyright/>\n'
+            '        </metadata>\n'
+            '    </head>\n'
+            '    <body region="bottom">\n'
+            '        <div>\n'
+            '            <p begin="00:00:01.250" end="00:00:03.000">'
+            'Bonjour</p>\n'
+            '        </div>\n'
+            '    </body>\n'
+            '</tt>\n')
+        data = compress_dfxp(dfxp)
+        self.assertEqual(dfxp, decompress_dfxp(data))
+        self.assertLess(len(data), len(compress(dfxp)) / 2)
@@ -0,0 +1,79 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from nose.tools import *
+import mock
+
+from utils.debounce import DebouncedUpdate
+
+@override_settings(TEST_DEBOUNCE_DELAY=30)
+class DebouncedUpdateTest(TestCase):
+    def setUp(self):
+        self.updates = DebouncedUpdate('test-debounce', 'TEST_DEBOUNCE_DELAY')
+        self.task = mock.Mock()
+
+    def test_schedule(self):
+        self.updates.schedule(self.task, 1, ['en'])
+        self.updates.schedule(self.task, 1, ['fr', 'unknown-code'])
+        # We should only queue 1 task for both changes
+        assert_equal(self.task.apply_async.call_args_list, [
+            mock.call(args=(1,), countdown=30),
+        ])
+        assert_equal(self.updates.get_pending(1),
+                     set(['en', 'fr', 'unknown-code']))
+        # Once the changes are handled, there's nothing left to do
+        assert_equal(self.updates.get_pending(1), set())
+
+    def test_objects_are_separate(self):
+        self.updates.schedule(self.task, 1, ['en'])
+        self.updates.schedule(self.task, 2, ['fr'])
+        assert_equal(self.task.apply_async.call_count, 2)
+        assert_equal(self.updates.get_pending(1), set(['en']))
+        assert_equal(self.updates.get_pending(2), set(['fr']))
+
+    def test_update_everything(self):
+        self.updates.schedule(self.task, 1, ['en'])
+        self.updates.schedule(self.task, 1)
+        assert_equal(self.updates.get_pending(1), None)
+
+    def test_schedule_while_running(self):
+        self.updates.schedule(self.task, 1, ['en'])
+        assert_equal(self.updates.get_pending(1), set(['en']))
+        # Changes after get_pending() get a new task
+        self.updates.schedule(self.task, 1, ['fr'])
+        assert_equal(self.task.apply_async.call_count, 2)
+        assert_equal(self.updates.get_pending(1), set(['fr']))
+
+    def test_lost_changes(self):
+        # If any changes get evicted from the cache, we should update
+        # everything
+        self.updates.schedule(self.task, 1, ['en'])
+        self.updates.schedule(self.task, 1, ['fr'])
+        cache.delete(self.updates._slot_key(1, 1))
+        assert_equal(self.updates.get_pending(1), None)
+
+    def test_counter_reset(self):
+        self.updates.schedule(self.task, 1, ['en'])
+        self.updates.schedule(self.task, 1, ['fr'])
+        self.updates.get_pending(1)
+        cache.delete(self.updates._counter_key(1))
+        self.updates.schedule(self.task, 1, ['de'])
+        assert_equal(self.updates.get_pending(1), None)
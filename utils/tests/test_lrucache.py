@@ -0,0 +1,96 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from utils.lrucache import LRUCache
+
+class LRUCacheTest(TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache(10)
+        cache.set('a', 1)
+        assert_equal(cache.get('a'), 1)
+        assert_equal(cache.get('b'), None)
+        assert_equal(cache.get('b', 'default'), 'default')
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        # access a, which makes b the least recently used entry
+        cache.get('a')
+        cache.set('d', 4)
+        assert_equal(cache.get('b'), None)
+        assert_equal(cache.get('a'), 1)
+        assert_equal(cache.get('c'), 3)
+        assert_equal(cache.get('d'), 4)
+
+    def test_sizeof(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.set('a', 'x' * 4)
+        cache.set('b', 'x' * 4)
+        assert_equal(cache.current_size, 8)
+        cache.set('c', 'x' * 4)
+        assert_equal(cache.current_size, 8)
+        assert_false('a' in cache)
+        # replacing a value should update the size
+        cache.set('b', 'x')
+        assert_equal(cache.current_size, 5)
+
+    def test_skip_entries_larger_than_max_size(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.set('a', 'x' * 4)
+        cache.set('b', 'x' * 11)
+        assert_false('b' in cache)
+        assert_true('a' in cache)
+
+    def test_delete(self):
+        cache = LRUCache(10)
+        cache.set('a', 1)
+        cache.delete('a')
+        cache.delete('b')
+        assert_equal(cache.get('a'), None)
+        assert_equal(cache.current_size, 0)
+
+    @mock.patch('time.time')
+    def test_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        cache = LRUCache(10, ttl=5)
+        cache.set('a', 1)
+        mock_time.return_value = 1005
+        assert_equal(cache.get('a'), 1)
+        mock_time.return_value = 1006
+        assert_equal(cache.get('a'), None)
+        assert_false('a' in cache)
+        assert_equal(cache.current_size, 0)
+
+    def test_stats(self):
+        cache = LRUCache(10)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        assert_equal(stats['hits'], 3)
+        assert_equal(stats['misses'], 1)
+        assert_equal(stats['hit_rate'], 0.75)
+        assert_equal(stats['entries'], 1)